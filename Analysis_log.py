@@ -0,0 +1,242 @@
+"""Analysis_log.py
+
+	Music.explainの分析過程をログファイルに書き出すモジュール
+
+	* Author: Naohiko Yamaguchi
+	* Copyright (c) 2024 Naohiko Yamaguchi,IPUT in Tokyo, Japan.
+	* License: New BSD License
+
+"""
+
+# 事前に必要な外部モジュールをインポートする
+import os
+import queue
+import threading
+
+class AnalysisLog:
+	"""AnalysisLogクラス
+
+		分析過程のログを、別スレッドの書き込み処理を通してファイルに書き出す。
+		呼び出し側は和音間距離行列などをそのままキューに積むだけで、
+		文字列への整形とファイルへの書き込みは書き込みスレッドが行う。
+
+		ログの詳細度はLEVELSから選択する。ファイルの大きさがmax_bytesを超えると、
+		logging.handlers.RotatingFileHandlerと同じ要領で"path.1", "path.2", ...に退避して新しいファイルに切り替える。
+
+		Args:
+			path (str): ログファイルのパス（Noneならログを残さない）
+			level (str): ログの詳細度（LEVELSのいずれか。省略時は"summary"）
+			max_bytes (Int): ログファイルの大きさの上限[バイト]（Noneなら上限なし）
+			backup_count (Int): 退避しておく古いログファイルの数（0なら上限を超えた時点で空にする）
+			buffer_size (Int): ファイルの書き込みバッファの大きさ[バイト]
+			max_queue (Int): 書き込みスレッドのキューに積めるログの上限数（超えると書き込みが追いつくまで登録側が待つ。0なら上限なし）
+
+		Attributes:
+			path (str): ログファイルのパス
+			level (str): ログの詳細度
+			max_bytes (Int): ログファイルの大きさの上限[バイト]
+			backup_count (Int): 退避しておく古いログファイルの数
+			buffer_size (Int): ファイルの書き込みバッファの大きさ[バイト]
+			max_queue (Int): 書き込みスレッドのキューに積めるログの上限数
+			error (Exception): 書き込みスレッドで発生した例外（closeで送出される）
+
+	"""
+
+	LEVELS = ["off", "summary", "full"]
+	"""LEVELS
+
+		選択できるログの詳細度
+
+		* off: ログを残さない
+		* summary: 和音列と探索結果（最短路）のみを書き出す
+		* full: summaryに加えて、全ての枝の和音間距離とその内訳を書き出す
+
+	"""
+
+	def __init__(self, path="Test_log.txt", level="summary", max_bytes=None, backup_count=0, buffer_size=1 << 16, max_queue=1024):
+		if level not in self.LEVELS:
+			raise ValueError("Unknown log level: " + str(level))
+		if max_bytes is not None and max_bytes <= 0:
+			raise ValueError("max_bytes must be more than 0")
+		if backup_count < 0:
+			raise ValueError("backup_count must be 0 or more")
+		if max_queue < 0:
+			raise ValueError("max_queue must be 0 or more")
+		self.path = path
+		self.level = level if path is not None else "off"
+		self.max_bytes = max_bytes
+		self.backup_count = backup_count
+		self.buffer_size = buffer_size
+		self.max_queue = max_queue
+		self.error = None
+		self._queue = None
+		self._thread = None
+		self._file = None
+		self._size = 0
+
+	def is_enabled(self, level="summary"):
+		"""指定した詳細度のログが書き出されるか判定する
+
+			Args:
+				level (str): ログの詳細度（"summary"又は"full"）
+
+			Returns:
+				enabled (Bool): 書き出されるならTrue
+
+		"""
+		return self.LEVELS.index(self.level) >= self.LEVELS.index(level)
+
+	def summary(self, text):
+		"""summary以上の詳細度で書き出す文字列を登録する
+
+			Args:
+				text (str): 書き出す文字列
+
+		"""
+		if self.level != "off":
+			self._put(("text", text))
+
+	def transition(self, nodes_a, nodes_b, matrix):
+		"""2つの和音の間の全ての枝の和音間距離を登録する（fullのみ）
+
+			nodes_aのa番目からnodes_bのb番目への枝を1行ずつ、最後に空行を書き出す。
+
+			Args:
+				nodes_a (List): 遷移元の和音候補のリスト
+				nodes_b (List): 遷移先の和音候補のリスト
+				matrix (Tuple): matrix[a][b]は(和音間距離, コード距離, 調間距離, ベーシックスペース距離)
+
+		"""
+		if self.level == "full":
+			self._put(("transition", nodes_a, nodes_b, matrix))
+
+	def edge(self, node_a, cell, node_b):
+		"""1本の枝の和音間距離を登録する（fullのみ）
+
+			Args:
+				node_a (List): 遷移元の和音候補
+				cell (Tuple): (和音間距離, コード距離, 調間距離, ベーシックスペース距離)
+				node_b (List): 遷移先の和音候補
+
+		"""
+		if self.level == "full":
+			self._put(("edge", node_a, cell, node_b))
+
+	def flush(self):
+		"""登録済みのログがすべてファイルに書き出されるまで待つ
+
+		"""
+		if self._queue is not None:
+			self._queue.put(("flush",))
+			self._queue.join()
+
+	def close(self):
+		"""登録済みのログを書き出して書き込みスレッドを終了する
+
+			書き込みスレッドで例外が発生していた場合はここで送出する。
+			closeした後も、次にログを登録した時点で書き込みスレッドが再び起動する。
+
+		"""
+		if self._thread is not None:
+			self._queue.put(None)
+			self._thread.join()
+			self._queue = None
+			self._thread = None
+		if self.error is not None:
+			error = self.error
+			self.error = None
+			raise error
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def _put(self, item):
+		"""書き込みスレッドのキューに登録する（スレッドが無ければ起動する）
+
+		"""
+		if self._thread is None:
+			self._queue = queue.Queue(self.max_queue)
+			self._thread = threading.Thread(target=self._run, name="AnalysisLog", daemon=True)
+			self._thread.start()
+		self._queue.put(item)
+
+	def _run(self):
+		"""書き込みスレッドの本体
+
+			キューから取り出したものを整形して書き出す。Noneを受け取ったらファイルを閉じて終了する。
+
+		"""
+		#例外が発生した後もキューからは取り出し続け、flushやcloseで待つ側が止まらないようにする
+		while True:
+			item = self._queue.get()
+			try:
+				if item is None:
+					break
+				if self.error is None:
+					self._write(item)
+			except Exception as e:
+				self.error = e
+			finally:
+				self._queue.task_done()
+		if self._file is not None:
+			try:
+				self._file.close()
+			except Exception as e:
+				if self.error is None:
+					self.error = e
+			self._file = None
+
+	def _write(self, item):
+		"""キューから取り出したものを整形して書き出す
+
+		"""
+		if self._file is None:
+			self._open('a')
+		kind = item[0]
+		if kind == "text":
+			text = item[1]
+		elif kind == "transition":
+			_, nodes_a, nodes_b, matrix = item
+			lines = []
+			for j, row in zip(nodes_a, matrix):
+				head = str(j) + "\t"
+				for k, cell in zip(nodes_b, row):
+					lines.append(f"{head}{cell[0]}(C:{cell[1]} R:{cell[2]} B:{cell[3]})\t{k}\n")
+			lines.append("\n")
+			text = "".join(lines)
+		elif kind == "edge":
+			_, j, cell, k = item
+			text = f"{j}\t{cell[0]}(C:{cell[1]} R:{cell[2]} B:{cell[3]})\t{k}\n"
+		else:
+			self._file.flush()
+			return
+
+		if self.max_bytes is not None:
+			size = len(text.encode())
+			if self._size > 0 and self._size + size > self.max_bytes:
+				self._rotate()
+			self._size += size
+		self._file.write(text)
+
+	def _open(self, mode):
+		"""ログファイルを開き、現在の大きさを記録する
+
+		"""
+		self._file = open(self.path, mode, buffering=self.buffer_size)
+		self._size = os.path.getsize(self.path) if mode == 'a' else 0
+
+	def _rotate(self):
+		"""ログファイルを退避して新しいファイルに切り替える
+
+		"""
+		self._file.close()
+		if self.backup_count > 0:
+			for i in range(self.backup_count - 1, 0, -1):
+				source = f"{self.path}.{i}"
+				if os.path.exists(source):
+					os.replace(source, f"{self.path}.{i + 1}")
+			os.replace(self.path, f"{self.path}.1")
+		self._open('w')
@@ -9,8 +9,9 @@
 """
 
 # 事前に必要な外部モジュールをインポートする
-from Modint import Modint
-from Pitchclass import Pitchclass
+from Pitchclass import PITCHCLASS_NAMES
+from Basicspace_kernel import BasicspaceKernel
+from Basicspace_bitmask import BasicspaceBitmask
 
 class Basicspace:
 	"""Basicspaceクラス
@@ -21,13 +22,33 @@ class Basicspace:
 			chordname (str): コードネーム
 			root (int): 調のルート
 			is_minor (Boolean): 長調/短調フラグ(True->短調,False->長調)
+			backend (str): ベーシックスペースの表現（BACKENDSのいずれか。省略時は"list"）
 		
 		Attributes:
-			bs (List): ベーシックスペース
+			bs (List): ベーシックスペース（backendが"bitmask"の場合はNone）
+			masks (Tuple): ベーシックスペースのマスクの組（backendが"bitmask"の場合のみ）
+			backend (str): ベーシックスペースの表現
 
 	"""
-	def __init__(self, chordname, root, is_minor):
+
+	BACKENDS = ["list", "bitmask"]
+	"""BACKENDS
+
+		選択できるベーシックスペースの表現
+		
+		* list: 12要素の整数リスト
+		* bitmask: 5つのレベルの12ビットのマスクのタプル（Basicspace_bitmask.py）
+
+	"""
+
+	__slots__ = ("backend", "bs", "masks")
+
+	def __init__(self, chordname, root, is_minor, backend="list"):
+		if backend not in self.BACKENDS:
+			raise ValueError("Unknown backend: " + str(backend))
+		self.backend = backend
 		self.bs = []
+		self.masks = None
 		self.gen_bs(chordname, root, is_minor)
 
 	def gen_bs(self, chordname, root, is_minor):
@@ -41,14 +62,13 @@ class Basicspace:
 				is_minor (Boolean): 長調/短調フラグ(True->短調,False->長調)
 
 		"""
-		# 配列の初期化（初期値はすべて1）
-		self.bs = [1] * 12
-
-		# 調構成音の重みを1レベル増やす
-		self.gen_bs_keyconstructnote(root, is_minor)
-
-		# コードネームから和音を構成する
-		self.gen_bs_chordstructnote(chordname)
+		# 24調分まとめて生成済みの表から該当する調の行を取り出す
+		# （各レベルの決め方はBasicspaceKernel.get_key_levels, get_chord_levelsにまとめてある）
+		if self.backend == "bitmask":
+			self.bs = None
+			self.masks = BasicspaceBitmask.get_masks(chordname, root, is_minor)
+		else:
+			self.bs = list(BasicspaceKernel.get_bs(chordname, root, is_minor))
 
 	def gen_bs_keyconstructnote(self, root, is_minor):
 		"""ベーシックスペースの調構成音レベルを決定
@@ -60,13 +80,9 @@ class Basicspace:
 				is_minor (Boolean): 長調/短調フラグ(True->短調,False->長調)
 
 		"""
-	
-		nowpc = Modint(root, 12)
-
-		steps = [2, 1, 2, 2, 1, 2, 2] if is_minor else [2, 2, 1, 2, 2, 2, 1]
-		for step in steps:
-			nowpc.add(step)
-			self.bs[nowpc.get()] += 1
+		#調構成音レベルまでの表は全音に1が入っているので、その差分（調構成音の+1）だけを加える
+		for pc, level in enumerate(BasicspaceKernel.get_key_levels(root, is_minor)):
+			self.bs[pc] += level - 1
 
 	def gen_bs_chordstructnote(self, chordname):
 		"""ベーシックスペースの和音構成音レベルを決定
@@ -101,28 +117,9 @@ class Basicspace:
 						* [@7sus4] セブンス・サスペンデッド・フォー
 
 		"""
-		chord = chordname.split(" ")
-		rootpc = Modint(Pitchclass(chord[0]).get(), 12)
-		nowpc = Modint(rootpc.get(), 12)
-		self.bs[nowpc.get()] = 6  # ルート音
-
-		# 第3音と第5音がセットされたかどうかのフラグ
-		setno3 = False
-		setno5 = False
-
-		# 各和音に対する処理は、Rubyのコードを参考に適宜実装
-		# ここでは省略しますが、具体的な和音に応じた処理を行う必要があります。
-
-		# 第3音と第5音の標準設定
-		if not setno3:
-			nowpc = Modint(rootpc.get(), 12)
-			nowpc.add(4)
-			self.bs[nowpc.get()] = 4
-
-		if not setno5:
-			nowpc = Modint(rootpc.get(), 12)
-			nowpc.add(7)
-			self.bs[nowpc.get()] = 5
+		#不正な音名はChordTokenizer（Pitchclass）と同じ例外を送出する
+		for pc, level in BasicspaceKernel.get_chord_levels(chordname):
+			self.bs[pc] = level
 
 	def get_bs(self):
 		"""ベーシックスペースのゲッタ（アクセサ）
@@ -133,9 +130,23 @@ class Basicspace:
 				bs (List): ベーシックスペース
 
 		"""
-
+		if self.bs is None:
+			return BasicspaceBitmask.to_bs(self.masks)
 		return self.bs
 
+	def get_masks(self):
+		"""ベーシックスペースのマスクの組のゲッタ（アクセサ）
+
+			ベーシックスペースを5つのレベルの12ビットのマスクのタプルとして返す（ハッシュ可能）
+
+			Returns:
+				masks (Tuple): 各レベルのマスク（BasicspaceBitmask.LEVEL_THRESHOLDSの順）
+
+		"""
+		if self.masks is None:
+			return BasicspaceBitmask.from_bs(self.bs)
+		return self.masks
+
 	def __str__(self):
 		"""クラスの文字列化処理
 		
@@ -143,10 +154,10 @@ class Basicspace:
 
 		"""
 		print("\tfedcba\n--------------")
+		bs = self.get_bs()
 		for i in range(12):
-			buf = Pitchclass(i)
-			print(f"{buf.getname()}\t", end="")
-			for _ in range(self.bs[i]):
+			print(f"{PITCHCLASS_NAMES[i]}\t", end="")
+			for _ in range(bs[i]):
 				print("*", end="")
 			print()
 		return None
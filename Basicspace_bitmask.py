@@ -0,0 +1,136 @@
+"""Basicspace_bitmask.py
+
+	TPSのBasicspaceを12ビットのマスクの組で表すモジュール
+
+	* Author: Naohiko Yamaguchi
+	* Copyright (c) 2024 Naohiko Yamaguchi,IPUT in Tokyo, Japan.
+	* License: New BSD License
+
+	Note:
+		int.bit_countを使うためPython 3.10以降が必要。
+
+"""
+
+# 事前に必要な外部モジュールをインポートする
+from Chord import KEY_INDEX
+from Chord_tokenizer import ChordTokenizer
+from Basicspace_kernel import BasicspaceKernel
+
+class BasicspaceBitmask:
+	"""BasicspaceBitmaskクラス
+
+		ベーシックスペースを、入れ子になった5つのピッチクラス集合
+		（ルート, 第5音, 三和音, 調構成音, 半音階）それぞれを12ビットのマスクにしたタプルとして表す。
+		ピッチクラスpcはマスクの第pcビットに対応する。
+		タプルはハッシュ可能なので、そのままキャッシュのキーとして使える。
+
+		ベーシックスペースの各要素の値は、その音を含むレベルのLEVEL_WEIGHTSの和に等しい。
+		レベルは入れ子になっているので、要素ごとの差の正の部分の和・負の部分の和は
+		レベルごとのXOR/ANDとビット数（int.bit_count）の重み付き和で求められる。
+
+	"""
+
+	LEVEL_THRESHOLDS = (6, 5, 4, 2, 1)
+	"""LEVEL_THRESHOLDS
+
+		各レベル（ルート, 第5音, 三和音, 調構成音, 半音階）に含まれる音のベーシックスペース上の最小値
+
+	"""
+
+	LEVEL_WEIGHTS = (1, 1, 2, 1, 1)
+	"""LEVEL_WEIGHTS
+
+		各レベルが1つの音のベーシックスペース上の値に加える重み（隣のレベルとの最小値の差）
+
+	"""
+
+	_masks_cache = {}	#コードID -> 24調分のマスクの組
+
+	@classmethod
+	def from_bs(cls, bs):
+		"""ベーシックスペース（12要素）をマスクの組に変換する
+
+			Args:
+				bs (List): ベーシックスペース（12要素）
+
+			Returns:
+				masks (Tuple): 各レベルの12ビットのマスク（LEVEL_THRESHOLDSの順）
+
+		"""
+		return tuple(sum(1 << pc for pc, level in enumerate(bs) if level >= threshold) for threshold in cls.LEVEL_THRESHOLDS)
+
+	@classmethod
+	def to_bs(cls, masks):
+		"""マスクの組をベーシックスペース（12要素）に戻す
+
+			Args:
+				masks (Tuple): 各レベルの12ビットのマスク（LEVEL_THRESHOLDSの順）
+
+			Returns:
+				bs (List): ベーシックスペース（12要素）
+
+		"""
+		return [sum(weight for mask, weight in zip(masks, cls.LEVEL_WEIGHTS) if mask >> pc & 1) for pc in range(12)]
+
+	@classmethod
+	def get_rows(cls, chord):
+		"""コードに対する24調分のマスクの組を返す
+
+			Args:
+				chord (int or str): コードID又はコードネーム
+
+			Returns:
+				rows (Tuple): KEY_LISTの各調で解釈したマスクの組
+
+		"""
+		chord_id = ChordTokenizer.to_id(chord)
+		rows = cls._masks_cache.get(chord_id)
+		if rows is None:
+			rows = tuple(cls.from_bs(bs) for bs in BasicspaceKernel.get_rows(chord_id))
+			cls._masks_cache[chord_id] = rows
+		return rows
+
+	@classmethod
+	def get_masks(cls, chord, root, is_minor):
+		"""1つの調で解釈したマスクの組を返す
+
+			Args:
+				chord (int or str): コードID又はコードネーム
+				root (int): 調のルート
+				is_minor (Boolean): 長調/短調フラグ(True->短調,False->長調)
+
+			Returns:
+				masks (Tuple): 各レベルの12ビットのマスク（LEVEL_THRESHOLDSの順）
+
+		"""
+		return cls.get_rows(chord)[KEY_INDEX[(root, is_minor)]]
+
+	@staticmethod
+	def delta(masks_a, masks_b):
+		"""2つのマスクの組からベーシックスペース距離を算出する
+
+			BasicspaceKernel.deltaと同じく、差の正の部分の和と負の部分の和のうち大きい方を距離とする。
+
+			Args:
+				masks_a (Tuple): 算出元のマスクの組
+				masks_b (Tuple): 算出先のマスクの組
+
+			Returns:
+				delta (Int): ベーシックスペース距離
+
+		"""
+		#レベルごとにXORで異なる音を求め、AND（どちら側にある音か）でビット数を数える
+		#（重みはLEVEL_WEIGHTS。呼び出しが多いのでループを展開している）
+		a0, a1, a2, a3, a4 = masks_a
+		b0, b1, b2, b3, b4 = masks_b
+		d0, d1, d2, d3, d4 = a0 ^ b0, a1 ^ b1, a2 ^ b2, a3 ^ b3, a4 ^ b4
+		delta_pos = (d0 & a0).bit_count() + (d1 & a1).bit_count() + 2 * (d2 & a2).bit_count() + (d3 & a3).bit_count() + (d4 & a4).bit_count()
+		delta_neg = (d0 & b0).bit_count() + (d1 & b1).bit_count() + 2 * (d2 & b2).bit_count() + (d3 & b3).bit_count() + (d4 & b4).bit_count()
+		return delta_neg if delta_pos < delta_neg else delta_pos
+
+	@classmethod
+	def clear_cache(cls):
+		"""マスクの組のキャッシュを消去する
+
+		"""
+		cls._masks_cache.clear()
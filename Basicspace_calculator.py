@@ -12,13 +12,19 @@
 from Chord import Chord
 from Basicspace import Basicspace
 from Pitchclass import Pitchclass
+from Basicspace_kernel import BasicspaceKernel
+from Basicspace_bitmask import BasicspaceBitmask
 
 class BasicspaceCalculator:
 	"""BasicspaceCalculatorクラス
 
 		TPSのベーシックスペース距離を算出する
+
+		Args:
+			backend (str): ベーシックスペースの表現（Basicspace.BACKENDSのいずれか。省略時は"list"）
 				
 		Attributes:
+			backend (str): ベーシックスペースの表現
 			chord_a (Chord): 算出元のコードクラス
 			chord_b (Chord): 算出元のコードクラス
 			a_bs(Basicspace): chord_aのベーシックスペースクラス
@@ -26,7 +32,13 @@ class BasicspaceCalculator:
 			delta(Int): ベーシックスペース距離
 
 	"""
-	def __init__(self):
+
+	__slots__ = ("backend", "chord_a", "chord_b", "a_bs", "b_bs", "delta")
+
+	def __init__(self, backend="list"):
+		if backend not in Basicspace.BACKENDS:
+			raise ValueError("Unknown backend: " + str(backend))
+		self.backend = backend
 		self.chord_a = None
 		self.chord_b = None
 		self.a_bs = None
@@ -51,8 +63,8 @@ class BasicspaceCalculator:
 		self.chord_b = chord_b
 
 		# ベーシックスペースの生成
-		self.a_bs = Basicspace(chord_a.get_chordname(), chord_a.get_root(), chord_a.get_minorflag())
-		self.b_bs = Basicspace(chord_b.get_chordname(), chord_b.get_root(), chord_b.get_minorflag())
+		self.a_bs = Basicspace(chord_a.get_chordname(), chord_a.get_root(), chord_a.get_minorflag(), self.backend)
+		self.b_bs = Basicspace(chord_b.get_chordname(), chord_b.get_root(), chord_b.get_minorflag(), self.backend)
 
 		# 距離の算出
 		self.delta = self.delta_basicspace()
@@ -68,18 +80,9 @@ class BasicspaceCalculator:
 				delta (Int): ベーシックスペース距離
 
 		"""
-		delta_pos = 0
-		delta_neg = 0
-
-		for i in range(12):
-			sub = self.a_bs.get_bs()[i] - self.b_bs.get_bs()[i]
-
-			if sub < 0:
-				delta_neg += (-1 * sub)
-			else:
-				delta_pos += sub
-
-		return delta_neg if delta_pos < delta_neg else delta_pos
+		if self.backend == "bitmask":
+			return BasicspaceBitmask.delta(self.a_bs.get_masks(), self.b_bs.get_masks())
+		return BasicspaceKernel.delta(self.a_bs.get_bs(), self.b_bs.get_bs())
 
 	def get_last_delta(self):
 		"""ベーシックスペース距離のゲッタ（アクセサ）
@@ -98,7 +101,7 @@ class BasicspaceCalculator:
 			ベーシックスペース距離の算出過程を文字列表示する
 
 		"""
-		print(f"Basicspace( {self.chord_a.get_chord_name()} , {self.chord_b.get_chord_name()} ) = {self.delta}")
+		print(f"Basicspace( {self.chord_a.get_chordname()} , {self.chord_b.get_chordname()} ) = {self.delta}")
 		print("\tfedcba\t   |   \tfedcba\n---------------\t---+---\t-------")
 		for i in range(12):
 			buf = Pitchclass(i)
@@ -0,0 +1,265 @@
+"""Basicspace_kernel.py
+
+	TPSのBasicspaceを24調まとめて生成・比較するベクトル化モジュール
+
+	* Author: Naohiko Yamaguchi
+	* Copyright (c) 2024 Naohiko Yamaguchi,IPUT in Tokyo, Japan.
+	* License: New BSD License
+
+	Note:
+		NumPyがインストールされていれば配列演算で処理する。
+		インストールされていない場合は同じ結果を返す純Python実装で動作する。
+		NumPyは読み込みに時間がかかるので、import時ではなく初めて表を使う時に読み込む。
+
+"""
+
+# 事前に必要な外部モジュールをインポートする
+from Chord import KEY_LIST, KEY_INDEX
+from Chord_tokenizer import ChordTokenizer
+
+np = None
+_numpy_checked = False
+
+def load_numpy():
+	"""NumPyを読み込んで返す（インストールされていなければNone）
+
+		読み込みは初めて呼び出された時の1度だけ行う。
+
+	"""
+	global np, _numpy_checked
+	if not _numpy_checked:
+		_numpy_checked = True
+		try:
+			import numpy
+			np = numpy
+		except ImportError:
+			np = None
+	return np
+
+def _key_levels(root, is_minor):
+	"""調構成音レベルまでのベーシックスペース（12要素）を生成する
+
+		調のルートから音階のステップをたどり、調構成音の重みを1レベル増やす。
+
+	"""
+	row = [1] * 12
+	nowpc = root
+	for step in ([2, 1, 2, 2, 1, 2, 2] if is_minor else [2, 2, 1, 2, 2, 2, 1]):
+		nowpc = (nowpc + step) % 12
+		row[nowpc] += 1
+	return row
+
+class BasicspaceKernel:
+	"""BasicspaceKernelクラス
+
+		コードごとに全24調のベーシックスペースを(24, 12)の表として生成し、
+		ベーシックスペース距離を表単位で一括算出する。
+		生成した表はコードID（ChordTokenizer）をキーとして全インスタンスで共有される。
+		コードはコードIDとコードネームのどちらでも指定できる。
+
+		Attributes:
+			KEY_LEVELS (List): 24調それぞれの調構成音レベルまでのベーシックスペース（KEY_LISTの順）
+
+	"""
+
+	KEY_LEVELS = [_key_levels(root, is_minor) for root, is_minor in KEY_LIST]
+
+	_rows_cache = {}	#コードID -> 24調分のベーシックスペース（整数タプルのタプル）
+	_table_cache = {}	#コードID -> (24, 12)のベーシックスペース表（NumPy配列）
+
+	@classmethod
+	def get_key_levels(cls, root, is_minor):
+		"""調構成音レベルまでのベーシックスペースを返す
+
+			Args:
+				root (int): 調のルート
+				is_minor (Boolean): 長調/短調フラグ(True->短調,False->長調)
+
+			Returns:
+				key_levels (List): 調構成音レベルまでのベーシックスペース（12要素）
+
+		"""
+		return cls.KEY_LEVELS[KEY_INDEX[(root % 12, bool(is_minor))]]
+
+	@classmethod
+	def get_chord_levels(cls, chord):
+		"""和音構成音（ルート・第3音・第5音）のレベルを返す
+
+			和音構成音のレベルは調によらないので、調構成音レベルの同じ位置を上書きする値として使う。
+
+			Args:
+				chord (int or str): コードID又はコードネーム
+
+			Returns:
+				levels (List): (ピッチクラス, レベル)のリスト
+
+		"""
+		rootpc = ChordTokenizer.get_root(ChordTokenizer.to_id(chord))
+		return [(rootpc, 6), ((rootpc + 4) % 12, 4), ((rootpc + 7) % 12, 5)]
+
+	@classmethod
+	def get_rows(cls, chord):
+		"""コードに対する24調分のベーシックスペースを返す
+
+			KEY_LISTの各調でコードを解釈したベーシックスペースを、整数のタプルとして並べて返す。
+
+			Args:
+				chord (int or str): コードID又はコードネーム
+
+			Returns:
+				rows (Tuple): 24調分のベーシックスペース（各12要素）
+
+		"""
+		chord_id = ChordTokenizer.to_id(chord)
+		rows = cls._rows_cache.get(chord_id)
+		if rows is None:
+			overlay = cls.get_chord_levels(chord_id)
+			rows = []
+			for key_levels in cls.KEY_LEVELS:
+				row = list(key_levels)
+				for pc, level in overlay:
+					row[pc] = level
+				rows.append(tuple(row))
+			rows = tuple(rows)
+			cls._rows_cache[chord_id] = rows
+		return rows
+
+	@classmethod
+	def get_table(cls, chord):
+		"""コードに対する24調分のベーシックスペース表を返す
+
+			NumPyが利用できない場合はget_rowsと同じタプルを返す。
+
+			Args:
+				chord (int or str): コードID又はコードネーム
+
+			Returns:
+				table (ndarray or Tuple): (24, 12)のベーシックスペース表
+
+		"""
+		if load_numpy() is None:
+			return cls.get_rows(chord)
+		chord_id = ChordTokenizer.to_id(chord)
+		table = cls._table_cache.get(chord_id)
+		if table is None:
+			table = np.array(cls.get_rows(chord_id), dtype=np.int64)
+			table.setflags(write=False)
+			cls._table_cache[chord_id] = table
+		return table
+
+	@classmethod
+	def get_bs(cls, chord, root, is_minor):
+		"""1つの調で解釈したベーシックスペースを返す
+
+			Args:
+				chord (int or str): コードID又はコードネーム
+				root (int): 調のルート
+				is_minor (Boolean): 長調/短調フラグ(True->短調,False->長調)
+
+			Returns:
+				bs (Tuple): ベーシックスペース（12要素）
+
+		"""
+		return cls.get_rows(chord)[KEY_INDEX[(root, is_minor)]]
+
+	@staticmethod
+	def delta(bs_a, bs_b):
+		"""2つのベーシックスペースの距離を算出する
+
+			要素ごとの差の正の部分の和と負の部分の和のうち、大きい方を距離とする。
+
+			Args:
+				bs_a (List): ベーシックスペース（12要素）
+				bs_b (List): ベーシックスペース（12要素）
+
+			Returns:
+				delta (Int): ベーシックスペース距離
+
+		"""
+		delta_pos = 0
+		delta_neg = 0
+		for a, b in zip(bs_a, bs_b):
+			if a < b:
+				delta_neg += b - a
+			else:
+				delta_pos += a - b
+		return delta_neg if delta_pos < delta_neg else delta_pos
+
+	@classmethod
+	def delta_table(cls, chord_a, chord_b):
+		"""2つのコードの24調×24調のベーシックスペース距離を一括算出する
+
+			Args:
+				chord_a (int or str): 算出元のコードID又はコードネーム
+				chord_b (int or str): 算出先のコードID又はコードネーム
+
+			Returns:
+				deltas (List): deltas[j][k]はchord_aをKEY_LIST[j]、chord_bをKEY_LIST[k]で解釈した時のベーシックスペース距離
+
+		"""
+		if load_numpy() is not None:
+			table_a = cls.get_table(chord_a)
+			table_b = cls.get_table(chord_b)
+			return cls._delta_array(table_a[:, None, :], table_b[None, :, :]).tolist()
+		rows_b = cls.get_rows(chord_b)
+		return [[cls.delta(row_a, row_b) for row_b in rows_b] for row_a in cls.get_rows(chord_a)]
+
+	@classmethod
+	def delta_row(cls, chord_a, key_index, chord_b):
+		"""1つの調で解釈したコードと、もう1つのコードの24調とのベーシックスペース距離を一括算出する
+
+			Args:
+				chord_a (int or str): 算出元のコードID又はコードネーム
+				key_index (int): 算出元の調のKEY_LISTでの番号
+				chord_b (int or str): 算出先のコードID又はコードネーム
+
+			Returns:
+				deltas (List): delta_table(chord_a, chord_b)[key_index]と同じ24個のベーシックスペース距離
+
+		"""
+		if load_numpy() is not None:
+			return cls._delta_array(cls.get_table(chord_a)[key_index], cls.get_table(chord_b)).tolist()
+		row_a = cls.get_rows(chord_a)[key_index]
+		return [cls.delta(row_a, row_b) for row_b in cls.get_rows(chord_b)]
+
+	@classmethod
+	def delta_keywise(cls, chords_per_key, chord):
+		"""調ごとのコード群とコードのベーシックスペース距離を、24調分一括算出する
+
+			KEY_LISTのj番目の調について、chords_per_key[j]の各コードと
+			chordをいずれもその調で解釈した時のベーシックスペース距離を求める。
+			（例:各調のダイアトニックコードと、ピヴォットを探すコードとの距離）
+
+			Args:
+				chords_per_key (List): KEY_LISTの各調に対応するコードID又はコードネームのリスト（24×N）
+				chord (int or str): 比較対象のコードID又はコードネーム
+
+			Returns:
+				deltas (List): deltas[j][i]はchords_per_key[j][i]とchordの、KEY_LIST[j]におけるベーシックスペース距離
+
+		"""
+		rows = cls.get_rows(chord)
+		if load_numpy() is not None:
+			stacked = np.array([[cls.get_rows(other)[j] for other in others] for j, others in enumerate(chords_per_key)], dtype=np.int64)
+			return cls._delta_array(stacked, cls.get_table(chord)[:, None, :]).tolist()
+		return [[cls.delta(cls.get_rows(other)[j], rows[j]) for other in others] for j, others in enumerate(chords_per_key)]
+
+	@staticmethod
+	def _delta_array(bs_a, bs_b):
+		"""ブロードキャスト可能な配列同士のベーシックスペース距離（最終軸が12要素）
+
+			差の総和 = 正の部分の和 - 負の部分の和 なので、負の部分の和は正の部分から求める。
+
+		"""
+		sub = bs_a - bs_b
+		delta_pos = np.where(sub > 0, sub, 0).sum(axis=-1)
+		delta_neg = delta_pos - sub.sum(axis=-1)
+		return np.maximum(delta_pos, delta_neg)
+
+	@classmethod
+	def clear_cache(cls):
+		"""ベーシックスペース表のキャッシュを消去する
+
+		"""
+		cls._rows_cache.clear()
+		cls._table_cache.clear()
@@ -0,0 +1,417 @@
+"""Benchmark.py
+
+	TPSの各距離算出処理と和声進行の分析のマイクロベンチマーク
+
+	* Author: Naohiko Yamaguchi
+	* Copyright (c) 2024 Naohiko Yamaguchi,IPUT in Tokyo, Japan.
+	* License: New BSD License
+
+	Note:
+		"python Benchmark.py --output bench.json"で全てのベンチマークを実行し、結果をJSONで書き出す。
+		"python Benchmark.py --compare bench.json"で、以前に書き出した結果（別のコミットなど）と比較する。
+		"python Benchmark.py --verify"で、計測する各経路（並列算出・保存先・語彙の表・MusicSession）の分析結果が
+		1プロセスで順に求めたMusic.explainと一致するかを確かめる（一致しなければ終了コード1）。
+		入力は固定なので、同じ環境であればコミット間で結果を比較できる。
+
+"""
+
+# 事前に必要な外部モジュールをインポートする
+import argparse
+import datetime
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from Chord import Chord
+from Basicspace import Basicspace
+from Basicspace_calculator import BasicspaceCalculator
+from Region_calculator import RegionCalculator
+from Chord_calculator import ChordCalculator
+from Delta_chord_calculator import Delta_Chord_calculator
+from Music import Music, Search, Trellis, DEMO_CHORDSHEET, compare_modes
+
+DIATONIC_PAIRS = [
+	("D m", (0, False), "G", (0, False)),
+	("G", (0, False), "C", (0, False)),
+	("F", (0, False), "A m", (9, True)),
+	("D m -5", (0, True), "G m", (0, True)),
+]
+"""DIATONIC_PAIRS
+
+	いずれのコードも置かれた調の和音の5度圏に含まれる（ピヴォットの探索が不要な）（コード, 調, コード, 調）の組
+
+"""
+
+PIVOT_PAIRS = [
+	("G 7", (0, False), "C maj7", (0, False)),
+	("D 7", (0, False), "G", (7, False)),
+	("E 7", (9, True), "A m 7", (9, True)),
+	("Bb 7", (3, False), "Eb maj7", (3, False)),
+]
+"""PIVOT_PAIRS
+
+	コードが和音の5度圏に含まれず、ピヴォットの探索が必要になる（コード, 調, コード, 調）の組
+
+"""
+
+STANDARDS = {
+	"fly_me_to_the_moon": DEMO_CHORDSHEET,
+	"autumn_leaves": "C m 7,F 7,Bb maj7,Eb maj7,A m 7 -5,D 7,G m,G m,C m 7,F 7,Bb maj7,Eb maj7,A m 7 -5,D 7,G m,G m",
+	"all_the_things_you_are": "F m 7,Bb m 7,Eb 7,Ab maj7,Db maj7,G 7,C maj7,C maj7,C m 7,F m 7,Bb 7,Eb maj7,Ab maj7,D 7,G maj7,G maj7",
+	"blue_bossa": "C m 7,C m 7,F m 7,F m 7,D m 7 -5,G 7,C m 7,C m 7,Eb m 7,Ab 7,Db maj7,Db maj7,D m 7 -5,G 7,C m 7,D m 7 -5",
+}
+"""STANDARDS
+
+	Music.explainのベンチマークに用いるスタンダード曲のコード進行
+
+"""
+
+ALLOC_CALLS = 50
+"""ALLOC_CALLS
+
+	メモリ割り当てを計測する時の呼び出し回数の上限
+
+"""
+
+def make_chord(chordname, key):
+	"""調を設定したコードクラスを生成する
+
+		Args:
+			chordname (str): コードネーム
+			key (Tuple): 調（調のルート, 長調/短調フラグ）
+
+		Returns:
+			chord (Chord): コードクラス
+
+	"""
+	chord = Chord(chordname)
+	chord.set_key(key[0], key[1])
+	return chord
+
+def make_basicspace(chord, backend):
+	"""コードクラスのベーシックスペースを生成する
+
+	"""
+	return Basicspace(chord.get_chordname(), chord.get_root(), chord.get_minorflag(), backend)
+
+def explain_cold(music, chordsheet):
+	"""和音間距離行列とピヴォット候補のキャッシュを消去してからMusic.explainを実行する
+
+		計測前の準備（setup）はまとめて行われるため、キャッシュの消去は計測する呼び出しの中で行う（消去自体の時間は無視できる）。
+
+	"""
+	Delta_Chord_calculator.clear_matrix_cache()
+	ChordCalculator.clear_pivot_cache()
+	music.explain(chordsheet)
+
+def make_pairs(pairs):
+	"""（コード, 調, コード, 調）の組をコードクラスの組に変換する
+
+	"""
+	return [(make_chord(a, key_a), make_chord(b, key_b)) for a, key_a, b, key_b in pairs]
+
+def build_search(chordsheet):
+	"""コードネーム列からMusic.explainと同じ探索グラフ（Search）を生成する
+
+		和音間距離行列はあらかじめ求めておくので、Search.aStarだけを計測できる
+
+	"""
+	chordnames = chordsheet.split(",")
+	tps_cal = Delta_Chord_calculator()
+	matrices = [tps_cal.calc_chord_delta_matrix(chordnames[i], chordnames[i + 1]) for i in range(len(chordnames) - 1)]
+
+	def setup():
+		graph = Search()
+		layers = [[graph.new_node(f"{i}/{k}", 0) for k in range(24)] for i in range(len(chordnames))]
+		startid = graph.new_node("START", 0)
+		endid = graph.new_node("END", 0)
+		graph.set_start_goal(startid, endid)
+		for node in layers[0]:
+			graph.new_branch(startid, node, 0)
+		for node in layers[-1]:
+			graph.new_branch(node, endid, 0)
+		for i, matrix in enumerate(matrices):
+			for a, j in enumerate(layers[i]):
+				for b, k in enumerate(layers[i + 1]):
+					graph.new_branch(j, k, matrix[a][b][0])
+		return graph
+	return setup
+
+def build_trellis(chordsheet):
+	"""コードネーム列から層状グラフ（Trellis）を生成する関数を返す
+
+	"""
+	chordnames = chordsheet.split(",")
+	tps_cal = Delta_Chord_calculator()
+	costs = [[[cell[0] for cell in row] for row in tps_cal.calc_chord_delta_matrix(chordnames[i], chordnames[i + 1])] for i in range(len(chordnames) - 1)]
+
+	def setup():
+		graph = Trellis()
+		for i in range(len(chordnames)):
+			graph.new_layer([f"{i}/{k}" for k in range(24)])
+		for i, layer_costs in enumerate(costs):
+			graph.set_costs(i, layer_costs)
+		return graph
+	return setup
+
+def cycle(items):
+	"""リストの要素を順に繰り返し返す関数を生成する（入力の組を順番に使うため）
+
+	"""
+	state = {"i": 0}
+	def next_item():
+		item = items[state["i"] % len(items)]
+		state["i"] += 1
+		return item
+	return next_item
+
+def define_benchmarks():
+	"""ベンチマークの一覧を生成する
+
+		Returns:
+			benchmarks (List): （名前, 計測する関数, 計測前の準備を行う関数又はNone）のリスト。
+				準備を行う関数がある場合、その戻り値を引数として計測する関数を呼び出す
+
+	"""
+	benchmarks = []
+	diatonic = make_pairs(DIATONIC_PAIRS)
+	pivot = make_pairs(PIVOT_PAIRS)
+
+	for backend in Basicspace.BACKENDS:
+		next_pair = cycle(diatonic + pivot)
+		benchmarks.append((f"basicspace.build.{backend}", lambda next_pair=next_pair, backend=backend: make_basicspace(next_pair()[0], backend), None))
+		calculator = BasicspaceCalculator(backend)
+		benchmarks.append((f"basicspace.calc.{backend}", lambda next_pair=next_pair, calculator=calculator: calculator.calc_basicspace(*next_pair()), None))
+
+	region_cal = RegionCalculator()
+	next_pair = cycle(diatonic + pivot)
+	benchmarks.append(("region.calc_region", lambda: region_cal.calc_region(*next_pair()), None))
+
+	chord_cal = ChordCalculator()
+	delta_cal = Delta_Chord_calculator()
+	for kind, pairs in (("diatonic", diatonic), ("pivot", pivot)):
+		next_chord = cycle([chord for pair in pairs for chord in pair])
+		benchmarks.append((f"chord.pickup_pivotlist.{kind}", lambda next_chord=next_chord: chord_cal.pickup_pivotlist(next_chord()), None))
+		next_pair = cycle(pairs)
+		benchmarks.append((f"chord.calc_chord.{kind}", lambda next_pair=next_pair: chord_cal.calc_chord(*next_pair()), None))
+		next_args = cycle([(chord_cal.pickup_pivotlist(a), (a.get_root(), a.get_minorflag()), chord_cal.pickup_pivotlist(b), (b.get_root(), b.get_minorflag())) for a, b in pairs])
+		benchmarks.append((f"chord.chord_distance.{kind}", lambda next_args=next_args: ChordCalculator.chord_distance(*next_args()), None))
+		next_pair = cycle(pairs)
+		benchmarks.append((f"delta.calc_chord_delta.{kind}", lambda next_pair=next_pair: delta_cal.calc_chord_delta(*next_pair()), None))
+
+	next_names = cycle([(a, b) for a, _, b, _ in DIATONIC_PAIRS + PIVOT_PAIRS])
+	def matrix_cold():
+		Delta_Chord_calculator.clear_matrix_cache()
+		return delta_cal.calc_chord_delta_matrix(*next_names())
+	benchmarks.append(("delta.calc_chord_delta_matrix.cold", matrix_cold, None))
+	benchmarks.append(("delta.calc_chord_delta_matrix.warm", lambda: delta_cal.calc_chord_delta_matrix(*next_names()), None))
+
+	for name, chordsheet in STANDARDS.items():
+		benchmarks.append((f"search.aStar.{name}", lambda graph: graph.aStar(), build_search(chordsheet)))
+		benchmarks.append((f"trellis.viterbi.{name}", lambda graph: graph.viterbi(), build_trellis(chordsheet)))
+
+	for engine in Music.ENGINES:
+		for name, chordsheet in STANDARDS.items():
+			music = Music(engine, loglevel="off", quiet=True)
+			#warmは同じ曲を繰り返し分析するのでキャッシュのヒットのみ、coldは毎回キャッシュが空の状態から分析する
+			benchmarks.append((f"music.explain.{engine}.{name}.warm", lambda music=music, chordsheet=chordsheet: music.explain(chordsheet), None))
+			benchmarks.append((f"music.explain.{engine}.{name}.cold", lambda music=music, chordsheet=chordsheet: explain_cold(music, chordsheet), None))
+
+	return benchmarks
+
+def run_batch(func, setup, number):
+	"""計測する関数をnumber回呼び出した時間[秒]を返す（準備の時間は含まない）
+
+	"""
+	states = [setup() for _ in range(number)] if setup is not None else None
+	gcold = gc.isenabled()
+	gc.disable()
+	try:
+		if states is None:
+			start = time.perf_counter()
+			for _ in range(number):
+				func()
+			return time.perf_counter() - start
+		start = time.perf_counter()
+		for state in states:
+			func(state)
+		return time.perf_counter() - start
+	finally:
+		if gcold:
+			gc.enable()
+
+def measure(func, setup=None, min_time=0.2, repeat=5):
+	"""1つのベンチマークを計測する
+
+		1回の計測がmin_time/repeat秒以上になるように呼び出し回数を決め、repeat回計測した最良値から1秒あたりの呼び出し回数を求める。
+		メモリ割り当ては、tracemallocで1回の呼び出し中に増えたメモリの最大量（ピーク）と、
+		呼び出しの前後で増えたメモリブロック数（sys.getallocatedblocks。キャッシュへの登録など、呼び出し後も残るもの）を求める。
+
+		Args:
+			func (function): 計測する関数
+			setup (function): 計測前の準備を行う関数（戻り値を引数としてfuncを呼び出す。Noneなら引数なしで呼び出す）
+			min_time (Float): 計測にかける時間の目安[秒]
+			repeat (Int): 計測の繰り返し回数
+
+		Returns:
+			result (Dict): 計測結果
+
+	"""
+	#1度呼び出してキャッシュなどを温めておく
+	run_batch(func, setup, 1)
+
+	number = 1
+	while True:
+		elapsed = run_batch(func, setup, number)
+		if elapsed >= min_time / repeat:
+			break
+		number = number * 10 if elapsed <= 0 else max(number + 1, int(number * (min_time / repeat) / elapsed * 1.2))
+	best = min(run_batch(func, setup, number) for _ in range(repeat))
+
+	alloc_number = min(number, ALLOC_CALLS)
+	states = [setup() for _ in range(alloc_number)] if setup is not None else [None] * alloc_number
+	gc.collect()
+	blocks = sys.getallocatedblocks()
+	for state in states:
+		func() if setup is None else func(state)
+	blocks = sys.getallocatedblocks() - blocks
+
+	states = [setup() for _ in range(alloc_number)] if setup is not None else [None] * alloc_number
+	peaks = []
+	tracemalloc.start()
+	try:
+		for state in states:
+			current = tracemalloc.get_traced_memory()[0]
+			tracemalloc.reset_peak()
+			func() if setup is None else func(state)
+			peaks.append(tracemalloc.get_traced_memory()[1] - current)
+	finally:
+		tracemalloc.stop()
+
+	return {
+		"ops_per_sec": number / best if best > 0 else float("inf"),
+		"sec_per_op": best / number,
+		"number": number,
+		"repeat": repeat,
+		"peak_bytes_per_call": sum(peaks) / len(peaks),
+		"blocks_per_call": blocks / alloc_number,
+	}
+
+def get_metadata():
+	"""計測環境の情報を返す
+
+	"""
+	try:
+		commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		commit = None
+	from Basicspace_kernel import load_numpy
+	return {
+		"python": platform.python_version(),
+		"implementation": platform.python_implementation(),
+		"platform": platform.platform(),
+		"numpy": load_numpy() is not None,
+		"commit": commit,
+		"timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+	}
+
+def run(filters=None, min_time=0.2, repeat=5, stream=sys.stdout):
+	"""ベンチマークを実行する
+
+		Args:
+			filters (List): 名前にいずれかの文字列を含むベンチマークだけを実行する（Noneなら全て）
+			min_time (Float): 1つのベンチマークの計測にかける時間の目安[秒]
+			repeat (Int): 計測の繰り返し回数
+			stream (file): 途中経過の出力先（Noneなら出力しない）
+
+		Returns:
+			report (Dict): {"meta": 計測環境, "results": ベンチマーク名 -> 計測結果}
+
+	"""
+	results = {}
+	for name, func, setup in define_benchmarks():
+		if filters and not any(f in name for f in filters):
+			continue
+		results[name] = measure(func, setup, min_time, repeat)
+		if stream is not None:
+			result = results[name]
+			stream.write(f"{name:<52}{result['ops_per_sec']:>14.1f} ops/s{result['peak_bytes_per_call']:>12.0f} B peak{result['blocks_per_call']:>10.1f} blocks\n")
+	return {"meta": get_metadata(), "results": results}
+
+def compare(report, baseline, stream=sys.stdout):
+	"""2つの計測結果を比較する
+
+		Args:
+			report (Dict): 今回の計測結果
+			baseline (Dict): 比較対象の計測結果
+
+		Returns:
+			ratios (Dict): ベンチマーク名 -> 1秒あたりの呼び出し回数の比（今回/比較対象。1より大きければ速くなった）
+
+		途中経過には、1回の呼び出しのメモリ割り当てのピークの変化も合わせて出力する。
+
+	"""
+	ratios = {}
+	for name, result in report["results"].items():
+		old = baseline["results"].get(name)
+		if old is None or old["ops_per_sec"] == 0:
+			continue
+		ratios[name] = result["ops_per_sec"] / old["ops_per_sec"]
+		if stream is not None:
+			stream.write(f"{name:<52}{old['ops_per_sec']:>14.1f} ->{result['ops_per_sec']:>14.1f} ops/s  x{ratios[name]:.2f}{old['peak_bytes_per_call']:>12.0f} ->{result['peak_bytes_per_call']:>10.0f} B peak\n")
+	return ratios
+
+def verify(workers=2, stream=sys.stdout):
+	"""スタンダード曲と探索エンジンの全ての組で、和音間距離の求め方による分析結果の違いが無いかを確かめる
+
+		Args:
+			workers (Int): 並列算出で使うプロセス数
+			stream (file): 途中経過の出力先（Noneなら出力しない）
+
+		Returns:
+			results (Dict): "エンジン.曲名" -> compare_modesの結果
+
+	"""
+	results = {}
+	for engine in Music.ENGINES:
+		for name, chordsheet in STANDARDS.items():
+			result = compare_modes(chordsheet, engine, workers=workers)
+			results[f"{engine}.{name}"] = result
+			if stream is not None:
+				stream.write(f"{engine + '.' + name:<40}" + "  ".join(f"{mode}:{'ok' if value['match'] else 'MISMATCH'}" for mode, value in result.items() if mode != "reference") + "\n")
+	return results
+
+def main(argv=None):
+	"""コマンドラインからベンチマークを実行する
+
+	"""
+	parser = argparse.ArgumentParser(description="TPSのマイクロベンチマーク")
+	parser.add_argument("filters", nargs="*", help="名前にいずれかの文字列を含むベンチマークだけを実行する")
+	parser.add_argument("--output", help="結果を書き出すJSONファイルのパス")
+	parser.add_argument("--compare", help="比較対象の結果のJSONファイルのパス")
+	parser.add_argument("--min-time", type=float, default=0.2, help="1つのベンチマークの計測にかける時間の目安[秒]")
+	parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数")
+	parser.add_argument("--verify", action="store_true", help="計測せずに、各経路の分析結果が1プロセスで順に求めた結果と一致するかを確かめる")
+	args = parser.parse_args(argv)
+
+	if args.verify:
+		results = verify()
+		return 0 if all(mode["match"] for result in results.values() for mode in result.values()) else 1
+
+	report = run(args.filters, args.min_time, args.repeat)
+	if args.output is not None:
+		with open(args.output, "w") as f:
+			json.dump(report, f, indent=1, sort_keys=True)
+	if args.compare is not None:
+		with open(args.compare) as f:
+			baseline = json.load(f)
+		print()
+		compare(report, baseline)
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -9,7 +9,23 @@
 """
 
 # 事前に必要な外部モジュールをインポートする
-from Pitchclass import Pitchclass
+from Pitchclass import Pitchclass, PITCHCLASS_NAMES
+from Chord_tokenizer import ChordTokenizer
+
+KEY_LIST = [(root, is_minor) for root in range(12) for is_minor in (False, True)]
+"""KEY_LIST
+
+	24の調（調のルート, 長調/短調フラグ）を並べたリスト。
+	Music.explainが和音候補を生成する順序（ルート0～11それぞれについて長調→短調）に一致する。
+
+"""
+
+KEY_INDEX = {key: i for i, key in enumerate(KEY_LIST)}
+"""KEY_INDEX
+
+	調（調のルート, 長調/短調フラグ）からKEY_LIST上の位置を引く辞書
+
+"""
 
 class Chord:
 	"""Chordクラス
@@ -17,27 +33,34 @@ class Chord:
 		TPSの和音（コード）を表現する
 				
 		Attributes:
-			chordname (str): コードネーム
+			chordname (str): コードネーム（正規化したもの）
+			chord_id (int): コードID
 			root (int): 調のルート
 			is_minor (Boolean): 長調/短調フラグ(True->短調,False->長調)
 
 	"""
+
+	__slots__ = ("chordname", "chord_id", "root", "is_minor")
+
 	def __init__(self, chordname):
 		# コードネームの初期設定
-		self.chordname = chordname
+		self.chordname = None
+		self.chord_id = None
+		self.set_chordname(chordname)
 		self.root = None
 		self.is_minor = None
 
 	def set_chordname(self, chordname):
 		"""コードネームのセッタ（アクセサ）
 
-			与えられたコードネームを記録する
+			与えられたコードネームを正規化し、コードIDとともに記録する
 
 			Args:
 				chordname (str): コードネーム
 
 		"""
-		self.chordname = chordname
+		self.chord_id = ChordTokenizer.intern(chordname)
+		self.chordname = ChordTokenizer.get_name(self.chord_id)
 
 	def set_key(self, root, is_minor):
 		"""調を設定する。
@@ -86,6 +109,17 @@ class Chord:
 		"""
 		return self.chordname
 
+	def get_chord_id(self):
+		"""コードIDのゲッタ（アクセサ）
+
+			コードIDを返す
+
+			Returns:
+				chord_id (int): コードID
+
+		"""
+		return self.chord_id
+
 	def get_keyname(self):
 		"""調を文字列表現する
 
@@ -95,8 +129,7 @@ class Chord:
 				key (str): 調の文字列表現[@ minor / @ major]
 
 		"""
-		buf = Pitchclass(self.root)
-		keyname = buf.getname()
+		keyname = PITCHCLASS_NAMES[self.root]
 		if self.is_minor:
 			return f"{keyname} minor"
 		else:
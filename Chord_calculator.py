@@ -9,9 +9,64 @@
 """
 
 # 事前に必要な外部モジュールをインポートする
-from Modint import Modint
-from Chord import Chord
-from Basicspace_calculator import BasicspaceCalculator
+from collections import OrderedDict
+from Chord import Chord, KEY_LIST, KEY_INDEX
+from Chord_tokenizer import ChordTokenizer
+from Basicspace_kernel import BasicspaceKernel
+
+# 長調の和音の5度圏（調のルートごと）
+# このルックアップテーブルは『コード進行スタイルブック』p.182に基づく．
+MAJOR_CHORDCIRCLES = (
+	("C", "E m", "G", "B m -5", "D m", "F", "A m"),
+	("Db", "F m", "Ab", "C m -5", "Eb m", "Gb", "Bb m"),
+	("D","F# m","A","C# m -5","E m","G","B m"),
+	("Eb","G m","Bb","D m -5","F m","Ab","C m"),
+	("E","G# m","B","D# m -5","F# m","A","C# m"),
+	("F","A m","C","E m -5","G m","Bb","D m"),
+	("Gb","Bb m","Db","F m -5","Ab m","B","Eb m"),
+	("G","B m","D","F# m -5","A m","C","E m"),
+	("Ab","C m","Eb","G m -5","Bb m","Db","F m"),
+	("A","C# m","E","G# m -5","B m","D","F# m"),
+	("Bb","D m","F","A m -5","C m","Eb","G m"),
+	("B","D m","F#","A# m -5","C# m","E","G# m")
+)
+
+# 短調の和音の5度圏（調のルートごと）
+MINOR_CHORDCIRCLES = (
+	("C m", "Eb", "G m", "Bb", "D m -5", "F m", "Ab"),
+	("C# m", "E", "G# m", "B", "D# m -5", "F# m", "A"),
+	("D m","F","A m","C","E m -5","G m","Bb"),
+	("Eb m","Gb","Bb m","Db","F m -5","Ab m","B"),
+	("Eb m","G","B m","D","F# m -5","A m","C"),
+	("F m","Ab","C m","Eb","G m -5","Bb m","Db"),
+	("F# m","A","C# m","E","G# m -5","B m","D"),
+	("G m","Bb","D m","F","A m -5","C m","Eb"),
+	("G# m","B","D# m","F#","A# m -5","C# m","E"),
+	("A m","C","E m","G","B m -5","D m","F"),
+	("Bb m","Db","F m","Ab","C m -5","Eb m","Gb"),
+	("B m","D","F# m","A","C# m -5","E m","G")
+)
+
+CHORDCIRCLE_LENGTH = 7
+"""CHORDCIRCLE_LENGTH
+
+	和音の5度圏に並ぶコードの数
+
+"""
+
+CHORDCIRCLES = {(root, is_minor): (MINOR_CHORDCIRCLES if is_minor else MAJOR_CHORDCIRCLES)[root] for root, is_minor in KEY_LIST}
+"""CHORDCIRCLES
+
+	調（調のルート, 長調/短調フラグ）から和音の5度圏（コードネームのタプル）を引く辞書
+
+"""
+
+CHORDCIRCLE_POSITIONS = {key: {chordname: position for position, chordname in reversed(list(enumerate(circle)))} for key, circle in CHORDCIRCLES.items()}
+"""CHORDCIRCLE_POSITIONS
+
+	調から、コードネーム -> 和音の5度圏上の位置（同じコードネームが複数あれば最初の位置）を引く辞書
+
+"""
 
 class ChordCalculator:
 	"""ChordCalculatorクラス
@@ -21,10 +76,10 @@ class ChordCalculator:
 		Attributes:
 			chord_a (Chord): 算出元のコードクラス
 			chord_b (Chord): 算出元のコードクラス
-			chordcircle_a(list): chord_aの「和音の五度圏」
-			chordcircle_b(list): chord_bの「和音の五度圏」
-			pivot_a(list): chord_aの「ピヴォットコード」
-			pivot_b(list): chord_bの「ピヴォットコード」
+			chordcircle_a(Tuple): chord_aの「和音の五度圏」
+			chordcircle_b(Tuple): chord_bの「和音の五度圏」
+			pivot_a(Tuple): chord_aの「ピヴォットコード」
+			pivot_b(Tuple): chord_bの「ピヴォットコード」
 			delta(Int): コード距離
 
 	"""
@@ -36,6 +91,26 @@ class ChordCalculator:
 
 	"""
 
+	PIVOT_CACHE_SIZE = 4096
+	"""PIVOT_CACHE_SIZE
+
+		ピヴォット候補のキャッシュに保持する項目の上限数
+		（1つのコードにつき、24調分の（コード, 調）の組と、24調分をまとめた2項目を使う）
+
+	"""
+
+	#ピヴォット候補のキャッシュ（LRU。全インスタンスで共有）。キーの形で3種類の項目を保持する
+	#  （コードID, 調のルート, 長調/短調フラグ） -> ピヴォット候補
+	#  （コードID, "pivots"） -> 24調分のピヴォット候補（KEY_LISTの順）
+	#  （コードID, "diatonic"） -> 24調分のダイアトニックコードとのベーシックスペース距離
+	_pivot_cache = OrderedDict()
+	_pivot_cache_hits = 0
+	_pivot_cache_misses = 0
+	_store = None	#ピヴォット候補の保存先（DistanceStore。全インスタンスで共有）
+	_store_loaded = set()	#保存先からピヴォット候補を読み込んだコードID
+
+	__slots__ = ("chord_a", "chord_b", "chordcircle_a", "chordcircle_b", "pivot_a", "pivot_b", "delta")
+
 	def __init__(self):
 		self.chord_a = None
 		self.chord_b = None
@@ -65,181 +140,196 @@ class ChordCalculator:
 
 		#ピヴォット候補配列を求める
 		#ピヴォットが必要ない場合（つまり与えられたコードがダイアトニックの場合）与えられたコード名がそのまま入る
-		
-		#@chord_aのchord circleの中で@chord_aのコードネームを探索する．
+		#ピヴォットが必要な場合は和音の5度圏から外に伸びた枝の分を加える
 		self.pivot_a = self.pickup_pivotlist(self.chord_a)
 		self.pivot_b = self.pickup_pivotlist(self.chord_b)
 		
-		#@chord_bのchord circleの中で@chord_bのコードネームを探索する．
-		self.chordcircle_a = self.make_chordcircle(self.chord_a.get_root(), self.chord_a.get_minorflag())
-		self.chordcircle_b = self.make_chordcircle(self.chord_b.get_root(), self.chord_b.get_minorflag())
-		
-		#結果格納用リストの初期化
-		result = []
-		
-		#@chord_aのchord circleの中に@chord_bのピヴォットコード名が存在するか．
-		#全てのピヴォットコードの組み合わせを探索
-		#現在探索対象となっているchord_aのピヴォットコード名がpivot_a_nowcheck
-		#現在探索対象となっているchord_bのピヴォットコード名がpivot_b_nowcheck
-		for pivot_a_nowcheck in self.pivot_a[0]:
-			for pivot_b_nowcheck in self.pivot_b[0]:
-				if pivot_b_nowcheck in self.chordcircle_a:
-					#見つかった
-					
-					#以下，和音の5度圏上の距離を算出する
-					#chord_aの和音の5度上でpivot_a_nowcheckが存在する位置を，距離測定の起点base_positionとする
-					base_position = Modint(self.chordcircle_a.index(pivot_a_nowcheck), len(self.chordcircle_a))
-					
-					#距離計測カウンタをリセット
-					counter = 0
-					
-					#和音の5度圏を時計回りに数える
-					for i in range(len(self.chordcircle_a)):
-						if self.chordcircle_a[base_position.get()] == pivot_b_nowcheck:
-							#pivot_b_nowcheckと一致したら数えるのをやめる
-							break
-						else:
-							#pivot_b_nowcheckと一致しなかったらもう1ステップ時計回りに進む
-							base_position.add(1)
-							counter += 1
-
-					#もしも得られた距離が和音の5度圏の長さの半分より大きければ，
-					#反時計回りに探索した方が早かった事になるので，反時計回りの距離に修正する
-					if counter > (len(self.chordcircle_a) / 2.0):
-						counter = len(self.chordcircle_a) - counter
-					
-					#和音の5度圏からピヴォットコードとしての場合，外に伸びた枝の分を追加する
-					if self.pivot_a[1]:
-						counter += 1
-					if self.pivot_b[1]:
-						counter += 1
-
-					#得られた距離を結果格納Arrayにプッシュする
-					result.append(counter)
-				else:
-					#見つからなかった→chord距離算出不可
-					#十分に大きな値を結果としてプッシュする
-					result.append(self.CHORD_DISTANCE_UNMEASURABLE)
-		
-		#@chord_bのchord circleの中に@chord_aのピヴォットコード名が存在するか．
-		#全てのピヴォットコードの組み合わせを探索
-		#現在探索対象となっているchord_aのピヴォットコード名がpivot_a_nowcheck
-		#現在探索対象となっているchord_bのピヴォットコード名がpivot_b_nowcheck
-		for pivot_b_nowcheck in self.pivot_b[0]:
-			for pivot_a_nowcheck in self.pivot_a[0]:
-				if pivot_a_nowcheck in self.chordcircle_b:
-					#見つかった
-					
-					#以下，和音の5度圏上の距離を算出する
-					#chord_bの和音の5度上でpivot_b_nowcheckが存在する位置を，距離測定の起点base_positionとする
-					base_position = Modint(self.chordcircle_b.index(pivot_b_nowcheck), len(self.chordcircle_b))
-					
-					#距離計測カウンタをリセット
-					counter = 0
-					
-					#和音の5度圏を時計回りに数える
-					for i in range(len(self.chordcircle_b)):
-						if self.chordcircle_b[base_position.get()] == pivot_a_nowcheck:
-							#pivot_a_nowcheckと一致したら数えるのをやめる
-							break
-						else:
-							#pivot_a_nowcheckと一致しなかったらもう1ステップ時計回りに進む
-							base_position.add(1)
-							counter += 1
-
-					#もしも得られた距離が和音の5度圏の長さの半分より大きければ，
-					#反時計回りに探索した方が早かった事になるので，反時計回りの距離に修正する
-					if counter > (len(self.chordcircle_b) / 2.0):
-						counter = len(self.chordcircle_b) - counter
-
-					#和音の5度圏からピヴォットコードとしての場合，外に伸びた枝の分を追加する
-					if self.pivot_a[1]:
-						counter += 1
-					if self.pivot_b[1]:
-						counter += 1
-
-					#得られた距離を結果格納Arrayにプッシュする
-					result.append(counter)
-				else:
-					#見つからなかった→chord距離算出不可
-					#十分に大きな値を結果としてプッシュする
-					result.append(self.CHORD_DISTANCE_UNMEASURABLE)
-
-		#結果格納用Arrayのうち，最小のものを出力する
-		minimum = result[0]		#初期値として先頭を代入
-		for i in result:
-			if minimum > i:
-				minimum = i
-
-		self.delta = minimum
+		#和音の5度圏を記録し、ピヴォット候補と調から距離を求める
+		key_a = (self.chord_a.get_root(), bool(self.chord_a.get_minorflag()))
+		key_b = (self.chord_b.get_root(), bool(self.chord_b.get_minorflag()))
+		self.chordcircle_a = CHORDCIRCLES[key_a]
+		self.chordcircle_b = CHORDCIRCLES[key_b]
+		self.delta = self.chord_distance(self.pivot_a, key_a, self.pivot_b, key_b)
 		return self.delta
+
+	@classmethod
+	def chord_distance(cls, pivot_a, key_a, pivot_b, key_b):
+		"""ピヴォット候補と調からコード距離を算出する
+
+			calc_chordの本体。Chordオブジェクトを使わず、表の参照と整数演算だけで求める。
+
+			Args:
+				pivot_a (Tuple): 算出元のピヴォット候補（pickup_pivotlistの戻り値）
+				key_a (Tuple): 算出元の調（調のルート, 長調/短調フラグ）
+				pivot_b (Tuple): 算出先のピヴォット候補（pickup_pivotlistの戻り値）
+				key_b (Tuple): 算出先の調（調のルート, 長調/短調フラグ）
+
+			Returns:
+				delta (Int): コード距離
+
+		"""
+		#ピヴォットが必要な場合は和音の5度圏から外に伸びた枝の分を加える
+		branch = pivot_a[1] + pivot_b[1]
+		positions_a = CHORDCIRCLE_POSITIONS[key_a]
+		positions_b = CHORDCIRCLE_POSITIONS[key_b]
+		
+		#全てのピヴォットコードの組み合わせについて、
+		#@chord_aの和音の5度圏上で@chord_bのピヴォットまで，@chord_bの和音の5度圏上で@chord_aのピヴォットまでの距離を求め，最小のものを出力する
+		#（相手のピヴォットが5度圏上に無い組み合わせは算出不可＝CHORD_DISTANCE_UNMEASURABLE）
+		minimum = cls.CHORD_DISTANCE_UNMEASURABLE
+		for pivot_a_nowcheck in pivot_a[0]:
+			for pivot_b_nowcheck in pivot_b[0]:
+				position = positions_a.get(pivot_b_nowcheck)
+				if position is not None:
+					d = (position - positions_a[pivot_a_nowcheck]) % CHORDCIRCLE_LENGTH
+					distance = (d if d <= CHORDCIRCLE_LENGTH - d else CHORDCIRCLE_LENGTH - d) + branch
+					if distance < minimum:
+						minimum = distance
+				position = positions_b.get(pivot_a_nowcheck)
+				if position is not None:
+					d = (position - positions_b[pivot_b_nowcheck]) % CHORDCIRCLE_LENGTH
+					distance = (d if d <= CHORDCIRCLE_LENGTH - d else CHORDCIRCLE_LENGTH - d) + branch
+					if distance < minimum:
+						minimum = distance
+		return minimum
 		
 	def make_chordcircle(self,root, is_minor):
 		"""五度圏を表す配列を生成する
 
 			調のルート、長調/短調フラグから、調の五度圏を生成する。
+			（モジュールのCHORDCIRCLESの複製を返す）
 
 			Args:
 				root (int): 調のルート
 				is_minor (Boolean): 長調/短調フラグ(True->短調,False->長調)
 
 		"""
-		chordcircle = []
-		
-		if is_minor == False:
-			# 長調のとき
-			#このルックアップテーブルは『コード進行スタイルブック』p.182に基づく．
-			major_lookup = [
-				["C", "E m", "G", "B m -5", "D m", "F", "A m"],
-				["Db", "F m", "Ab", "C m -5", "Eb m", "Gb", "Bb m"],
-				["D","F# m","A","C# m -5","E m","G","B m"],
-				["Eb","G m","Bb","D m -5","F m","Ab","C m"],
-				["E","G# m","B","D# m -5","F# m","A","C# m"],
-				["F","A m","C","E m -5","G m","Bb","D m"],
-				["Gb","Bb m","Db","F m -5","Ab m","B","Eb m"],
-				["G","B m","D","F# m -5","A m","C","E m"],
-				["Ab","C m","Eb","G m -5","Bb m","Db","F m"],
-				["A","C# m","E","G# m -5","B m","D","F# m"],
-				["Bb","D m","F","A m -5","C m","Eb","G m"],
-				["B","D m","F#","A# m -5","C# m","E","G# m"]
-			]
-			chordcircle = major_lookup[root]
-		else:
-			# 短調のとき
-			minor_lookup = [
-				["C m", "Eb", "G m", "Bb", "D m -5", "F m", "Ab"],
-				["C# m", "E", "G# m", "B", "D# m -5", "F# m", "A"],
-				["D m","F","A m","C","E m -5","G m","Bb"],
-				["Eb m","Gb","Bb m","Db","F m -5","Ab m","B"],
-				["Eb m","G","B m","D","F# m -5","A m","C"],
-				["F m","Ab","C m","Eb","G m -5","Bb m","Db"],
-				["F# m","A","C# m","E","G# m -5","B m","D"],
-				["G m","Bb","D m","F","A m -5","C m","Eb"],
-				["G# m","B","D# m","F#","A# m -5","C# m","E"],
-				["A m","C","E m","G","B m -5","D m","F"],
-				["Bb m","Db","F m","Ab","C m -5","Eb m","Gb"],
-				["B m","D","F# m","A","C# m -5","E m","G"]
-			]
-			chordcircle = minor_lookup[root]
-		
-		return chordcircle
+		return list(CHORDCIRCLES[(root, bool(is_minor))])
+
+	@staticmethod
+	def circle_distance(position_a, position_b):
+		"""和音の5度圏上の2つの位置の距離を求める
+
+			時計回り・反時計回りのうち近い方の歩数を返す
+
+			Args:
+				position_a (Int): 起点の位置
+				position_b (Int): 終点の位置
+
+			Returns:
+				distance (Int): 距離
+
+		"""
+		d = (position_b - position_a) % CHORDCIRCLE_LENGTH
+		return d if d <= CHORDCIRCLE_LENGTH - d else CHORDCIRCLE_LENGTH - d
 	
 	def pickup_pivotlist(self,chord):
 		"""（ピヴォット）候補配列を求める
 
 			和音の5度圏の中から，ベーシックスペース距離が最も近い和音（ピヴォット）候補配列を求める
+			結果は（コード, 調のルート, 長調/短調フラグ）をキーとする有限サイズのキャッシュにメモ化される
 
 			Args:
 				chord (Code): ピヴォットを求めるコード
 				
 			Return:
-				pivot（List)（戻り値pivot[0]はピヴォット候補コード名リスト，pivot[1]はピヴォットが必要か否かのフラグ）
+				pivot（Tuple)（戻り値pivot[0]はピヴォット候補コード名のタプル，pivot[1]はピヴォットが必要か否かのフラグ）
+
+			Note:
+				結果は（コード, 調）ごとにキャッシュされ、全インスタンスで共有されるので変更しないこと。
+
+		"""
+		key = (chord.get_chord_id(), chord.get_root(), chord.get_minorflag())
+		pivot = self.lookup_pivot_cache(key)
+		if pivot is not None:
+			return pivot
+		return self.load_pivotlist(key, chord)
+
+	def get_pivotlist(self, chord_id, root, is_minor, chord=None):
+		"""コードIDと調から（ピヴォット）候補配列を求める
+
+			pickup_pivotlistと同じキャッシュを使い、キャッシュにあればChordオブジェクトを使わずに返す。
+
+			Args:
+				chord_id (int): ピヴォットを求めるコードのコードID
+				root (int): 調のルート
+				is_minor (Boolean): 長調/短調フラグ(True->短調,False->長調)
+				chord (Chord): 同じコードと調のChord（キャッシュに無い場合の探索に使う。Noneなら生成する）
+
+			Return:
+				pivot（Tuple)（pickup_pivotlistと同じ）
+
+		"""
+		key = (chord_id, root, is_minor)
+		pivot = self.lookup_pivot_cache(key)
+		if pivot is not None:
+			return pivot
+		return self.load_pivotlist(key, chord)
+
+	def get_pivotlists(self, chord_id):
+		"""コードIDから24調分の（ピヴォット）候補配列をまとめて求める
+
+			結果はピヴォット候補のキャッシュに（コードID, "pivots"）をキーとして登録される。
+
+			Args:
+				chord_id (int): ピヴォットを求めるコードのコードID
+
+			Return:
+				pivots (Tuple): KEY_LISTの各調でのピヴォット候補（get_pivotlistと同じ）
+
+		"""
+		key = (chord_id, "pivots")
+		pivots = self.lookup_pivot_cache(key)
+		if pivots is None:
+			pivots = tuple(self.get_pivotlist(chord_id, root, is_minor) for root, is_minor in KEY_LIST)
+			self.store_pivot_cache(key, pivots)
+		return pivots
+
+	def load_pivotlist(self, key, chord=None):
+		"""キャッシュに無い（ピヴォット）候補配列を保存先から読み込むか探索し、キャッシュに登録する
+
+			Args:
+				key (Tuple): （コードID, 調のルート, 長調/短調フラグ）
+				chord (Chord): 同じコードと調のChord（探索に使う。Noneなら生成する）
+
+			Return:
+				pivot（Tuple)（pickup_pivotlistと同じ）
+
+		"""
+		chord_id, root, is_minor = key
+		pivot = None
+		store = ChordCalculator._store
+		if store is not None and key[0] not in ChordCalculator._store_loaded:
+			#保存先からコードの24調分をまとめて読み込む
+			ChordCalculator._store_loaded.add(key[0])
+			stored_pivots = store.get_pivots(ChordTokenizer.get_name(chord_id))
+			for stored_key, stored in stored_pivots.items():
+				self.store_pivot_cache((chord_id,) + stored_key, stored)
+			pivot = stored_pivots.get(key[1:])
+		if pivot is None:
+			if chord is None:
+				chord = Chord(ChordTokenizer.get_name(chord_id))
+				chord.set_key(root, is_minor)
+			pivot = self.search_pivotlist(chord)
+			if store is not None:
+				store.put_pivot(ChordTokenizer.get_name(chord_id), key[1:], pivot)
+		self.store_pivot_cache(key, pivot)
+		return pivot
+
+	def search_pivotlist(self, chord):
+		"""（ピヴォット）候補配列を探索する（キャッシュを使わない）
+
+			Args:
+				chord (Code): ピヴォットを求めるコード
+
+			Return:
+				pivot（Tuple)（戻り値pivot[0]はピヴォット候補コード名のタプル，pivot[1]はピヴォットが必要か否かのフラグ）
 
 		"""
 	
 		#chordのchord circleの中でchordのコードネームを探索する．
 		#chordの置かれた調に対応するchordcircleを生成
-		chordcircle = [self.make_chordcircle(chord.get_root(), chord.get_minorflag()), []]
+		chordcircle = [CHORDCIRCLES[(chord.get_root(), bool(chord.get_minorflag()))], []]
 		
 		#ピヴォット候補格納配列の生成
 		#ピヴォット候補は複数ある可能性があるので配列形式
@@ -255,17 +345,9 @@ class ChordCalculator:
 			#basicspace関数を使ってピヴォットコードを探す．
 			need_pivot_flag = True
 			
-			#ベーシックスペース算出クラス生成
-			bcalc = BasicspaceCalculator()
-
-			#全てのダイアトニックコードとaのコードのベーシックスペース距離を算出する
-			for i, diatonic_chord_name in enumerate(chordcircle[0]):
-				#比較対象コードを取り出してChordクラスを生成
-				diatonic = Chord(diatonic_chord_name)
-				diatonic.set_key(chord.get_root(), chord.get_minorflag())
-
-				#ベーシックスペース距離を算出して格納
-				chordcircle[1].append(bcalc.calc_basicspace(diatonic, chord))
+			#全てのダイアトニックコードとaのコードのベーシックスペース距離を格納する
+			#（24調分をまとめて算出したものから、chordの置かれた調の分を取り出す）
+			chordcircle[1] = self.diatonic_deltas(chord.get_chord_id())[KEY_INDEX[(chord.get_root(), chord.get_minorflag())]]
 
 			#ベーシックスペース距離の最小値を求める
 			minimum = min(chordcircle[1])		#初期値として先頭をベーシックスペース距離を代入
@@ -275,9 +357,121 @@ class ChordCalculator:
 				if distance == minimum:
 					pivot.append(chordcircle[0][i])
 
-		return [pivot, need_pivot_flag]
+		return (tuple(pivot), need_pivot_flag)
+
+	@classmethod
+	def prepopulate_pivot_cache(cls, chordnames):
+		"""コードの語彙の全ての調のピヴォット候補をあらかじめキャッシュに登録する
+
+			通常の参照と同じ経路（キャッシュ・保存先・探索）を通るので、ヒット数・ミス数にも数えられる。
+			語彙の項目数がPIVOT_CACHE_SIZEを超える場合は、古いものから捨てられる。
+
+			Args:
+				chordnames (List): コードネーム（又はコードID）のリスト
+
+		"""
+		calculator = cls()
+		for chordname in chordnames:
+			chord = Chord(chordname if isinstance(chordname, str) else ChordTokenizer.get_name(chordname))
+			chord_id = chord.get_chord_id()
+			for root, is_minor in KEY_LIST:
+				chord.set_key(root, is_minor)
+				calculator.get_pivotlist(chord_id, root, is_minor, chord)
+			calculator.get_pivotlists(chord_id)
+
+	@classmethod
+	def set_store(cls, store):
+		"""ピヴォット候補の保存先を設定する
+
+			キャッシュに無いピヴォット候補は保存先から読み込み、保存先にも無ければ探索して保存先に書き込む。
+
+			Args:
+				store (DistanceStore): ピヴォット候補の保存先（Noneなら保存先を使わない）
+
+		"""
+		cls._store = store
+		cls._store_loaded = set()
+
+	@classmethod
+	def lookup_pivot_cache(cls, key):
+		"""ピヴォット候補のキャッシュを引く
+
+			ヒットすれば最近使用したものとして末尾に移動し、ヒット数・ミス数を数える。
+
+			Args:
+				key (Tuple): キャッシュのキー
+
+			Returns:
+				value: キャッシュされた値（無ければNone）
+
+		"""
+		cache = cls._pivot_cache
+		value = cache.get(key)
+		if value is None:
+			ChordCalculator._pivot_cache_misses += 1
+			return None
+		ChordCalculator._pivot_cache_hits += 1
+		cache.move_to_end(key)
+		return value
+
+	@classmethod
+	def store_pivot_cache(cls, key, value):
+		"""ピヴォット候補のキャッシュに登録し、PIVOT_CACHE_SIZEを超えた分を古いものから捨てる
+
+			Args:
+				key (Tuple): キャッシュのキー
+				value: キャッシュする値
+
+		"""
+		cache = cls._pivot_cache
+		cache[key] = value
+		cache.move_to_end(key)
+		while len(cache) > cls.PIVOT_CACHE_SIZE:
+			cache.popitem(last=False)
+
+	@classmethod
+	def get_pivot_cache_stats(cls):
+		"""ピヴォット候補のキャッシュの利用状況を返す
+
+			Returns:
+				stats (Dict): ヒット数・ミス数・キャッシュに保持している組の数
+
+		"""
+		return {"hits": cls._pivot_cache_hits, "misses": cls._pivot_cache_misses, "size": len(cls._pivot_cache)}
+
+	@classmethod
+	def clear_pivot_cache(cls):
+		"""ピヴォット候補のキャッシュを消去し、ヒット数・ミス数を0に戻す
+
+		"""
+		cls._pivot_cache.clear()
+		cls._pivot_cache_hits = 0
+		cls._pivot_cache_misses = 0
 		
 
+	def diatonic_deltas(self, chord):
+		"""24調それぞれのダイアトニックコードとのベーシックスペース距離を求める
+
+			KEY_LISTの各調について、和音の5度圏に並ぶ7つのダイアトニックコードと
+			その調で解釈したchordとのベーシックスペース距離を一括算出する。
+			結果はピヴォット候補のキャッシュに（コードID, "diatonic"）をキーとして登録される。
+
+			Args:
+				chord (int or str): コードID又はコードネーム
+
+			Return:
+				deltas (List): deltas[j][i]はKEY_LIST[j]の和音の5度圏のi番目のコードとのベーシックスペース距離
+
+		"""
+		chord_id = ChordTokenizer.to_id(chord)
+		cache_key = (chord_id, "diatonic")
+		deltas = self.lookup_pivot_cache(cache_key)
+		if deltas is None:
+			chordcircles = [CHORDCIRCLES[key] for key in KEY_LIST]
+			deltas = BasicspaceKernel.delta_keywise(chordcircles, chord_id)
+			self.store_pivot_cache(cache_key, deltas)
+		return deltas
+
 	def get_lastdelta(self):
 		"""コード距離のゲッタ（アクセサ）
 
@@ -0,0 +1,141 @@
+"""Chord_tokenizer.py
+
+	コードネームを正規化し、整数のコードIDに変換（インターン）するモジュール
+
+	* Author: Naohiko Yamaguchi
+	* Copyright (c) 2024 Naohiko Yamaguchi,IPUT in Tokyo, Japan.
+	* License: New BSD License
+
+"""
+
+# 事前に必要な外部モジュールをインポートする
+from Pitchclass import Pitchclass
+
+class ChordTokenizer:
+	"""ChordTokenizerクラス
+
+		コードネームを正規化して、同じコードネームに同じ整数のコードIDを割り当てる。
+		コードIDごとにルートのピッチクラスとルート以外の部分（種類）をあらかじめ求めておくので、
+		各算出クラスやキャッシュは文字列の比較や分割をせずに小さな整数をキーとして使える。
+		コードIDは全インスタンスで共有され、プロセスの中で変わらない。
+
+		Note:
+			正規化は以下のように行う。
+				* 前後の空白を取り除き、連続する空白を1つにする(例:" F  maj7"->"F maj7")
+				* ルート音の表記を先頭だけ大文字にする(例:"bb 7"->"Bb 7")
+
+	"""
+
+	_ids = {}			#コードネーム（正規化前・正規化後とも） -> コードID
+	_names = []			#コードID -> 正規化したコードネーム
+	_roots = []			#コードID -> ルートのピッチクラス
+	_qualities = []		#コードID -> ルート以外の部分
+
+	@staticmethod
+	def normalize(chordname):
+		"""コードネームを正規化する
+
+			Args:
+				chordname (str): コードネーム
+
+			Returns:
+				chordname (str): 正規化したコードネーム
+
+		"""
+		chord = chordname.split()
+		if len(chord) == 0:
+			raise ValueError("Empty chord name")
+		chord[0] = chord[0][0].upper() + chord[0][1:].lower()
+		return " ".join(chord)
+
+	@classmethod
+	def intern(cls, chordname):
+		"""コードネームのコードIDを返す
+
+			初めて現れたコードネームには新しいコードIDを割り当てる
+
+			Args:
+				chordname (str): コードネーム
+
+			Returns:
+				chord_id (Int): コードID
+
+		"""
+		chord_id = cls._ids.get(chordname)
+		if chord_id is None:
+			normalized = cls.normalize(chordname)
+			chord_id = cls._ids.get(normalized)
+			if chord_id is None:
+				chord = normalized.split(" ")
+				root = Pitchclass(chord[0]).get()
+				chord_id = len(cls._names)
+				cls._names.append(normalized)
+				cls._roots.append(root)
+				cls._qualities.append(" ".join(chord[1:]))
+				cls._ids[normalized] = chord_id
+			cls._ids[chordname] = chord_id
+		return chord_id
+
+	@classmethod
+	def to_id(cls, chord):
+		"""コードIDまたはコードネームをコードIDにそろえる
+
+			Args:
+				chord (Int or str): コードID又はコードネーム
+
+			Returns:
+				chord_id (Int): コードID
+
+		"""
+		if isinstance(chord, int):
+			return chord
+		return cls.intern(chord)
+
+	@classmethod
+	def get_name(cls, chord_id):
+		"""正規化したコードネームを返す
+
+			Args:
+				chord_id (Int): コードID
+
+			Returns:
+				chordname (str): 正規化したコードネーム
+
+		"""
+		return cls._names[chord_id]
+
+	@classmethod
+	def get_root(cls, chord_id):
+		"""ルートのピッチクラスを返す
+
+			Args:
+				chord_id (Int): コードID
+
+			Returns:
+				root (Int): ルートのピッチクラス（0～11）
+
+		"""
+		return cls._roots[chord_id]
+
+	@classmethod
+	def get_quality(cls, chord_id):
+		"""コードネームのルート以外の部分（種類）を返す
+
+			Args:
+				chord_id (Int): コードID
+
+			Returns:
+				quality (str): ルート以外の部分(例:"m 7 -5"。メジャーコードの場合は"")
+
+		"""
+		return cls._qualities[chord_id]
+
+	@classmethod
+	def size(cls):
+		"""割り当て済みのコードIDの数を返す
+
+			Returns:
+				size (Int): コードIDの数
+
+		"""
+		return len(cls._names)
@@ -9,10 +9,135 @@
 """
 
 # 事前に必要な外部モジュールをインポートする
-from Chord import Chord
+import time
+from collections import OrderedDict
+from Chord import Chord, KEY_LIST, KEY_INDEX
+from Chord_tokenizer import ChordTokenizer
 from Basicspace_calculator import BasicspaceCalculator
 from Chord_calculator import ChordCalculator
-from Region_calculator import RegionCalculator
+from Region_calculator import RegionCalculator, REGION_MATRIX
+from Basicspace_kernel import BasicspaceKernel
+
+def _calc_matrix_task(chordnames):
+	"""プロセスプールのワーカーで1つのコード対の和音間距離行列を算出する
+
+		コードIDはプロセスごとに振られるので、コードネームで受け取る。
+
+		Args:
+			chordnames (Tuple): （遷移元のコードネーム, 遷移先のコードネーム）
+
+		Returns:
+			result (Tuple): （和音間距離行列（Delta_Chord_calculator.compute_matrix）, 算出にかかった時間[秒]）
+
+	"""
+	chordname_a, chordname_b = chordnames
+	start = time.perf_counter()
+	matrix = Delta_Chord_calculator().compute_matrix(ChordTokenizer.intern(chordname_a), ChordTokenizer.intern(chordname_b))
+	return (matrix, time.perf_counter() - start)
+
+def _init_matrix_worker():
+	"""プロセスプールのワーカーの初期化
+
+		fork元で設定されていた保存先は使わない（保存先への書き込みは呼び出し元のプロセスがまとめて行う）。
+
+	"""
+	Delta_Chord_calculator.set_store(None)
+
+class DeltaProfile:
+	"""DeltaProfileクラス
+
+		和音間距離の算出処理の内訳（構成要素ごとの呼び出し回数・累積時間・最大時間、ピヴォット探索の発生率）を集計する
+
+		Attributes:
+			components (Dict): 構成要素名 -> [呼び出し回数, 累積時間[秒], 最大時間[秒]]
+			pivot_lookups (Int): コード距離の算出で和音の5度圏を調べたコードの数
+			pivot_hits (Int): そのうちピヴォットの探索が必要になったコードの数
+			matrix_hits (Int): 和音間距離行列がキャッシュにヒットした回数
+			matrix_misses (Int): 和音間距離行列がキャッシュにヒットしなかった回数
+
+	"""
+	def __init__(self):
+		self.reset()
+
+	def reset(self):
+		"""集計をすべて0に戻す
+
+		"""
+		self.components = {}
+		self.pivot_lookups = 0
+		self.pivot_hits = 0
+		self.matrix_hits = 0
+		self.matrix_misses = 0
+
+	def timed(self, name, func, *args):
+		"""関数を呼び出し、かかった時間を構成要素nameに加算する
+
+			Args:
+				name (str): 構成要素名
+				func (function): 呼び出す関数
+				*args: funcに渡す引数
+
+			Returns:
+				result: funcの戻り値
+
+		"""
+		start = time.perf_counter()
+		result = func(*args)
+		self.add(name, time.perf_counter() - start)
+		return result
+
+	def add(self, name, elapsed):
+		"""構成要素nameの呼び出し1回分の時間を加算する
+
+			Args:
+				name (str): 構成要素名
+				elapsed (Float): かかった時間[秒]
+
+		"""
+		record = self.components.get(name)
+		if record is None:
+			self.components[name] = [1, elapsed, elapsed]
+		else:
+			record[0] += 1
+			record[1] += elapsed
+			if record[2] < elapsed:
+				record[2] = elapsed
+
+	def count_pivot(self, chord_cal):
+		"""直前のコード距離の算出でピヴォットの探索が必要になったかを集計する
+
+			Args:
+				chord_cal (ChordCalculator): 直前にcalc_chordを呼び出したコード距離算出クラス
+
+		"""
+		self.count_pivot_flags(chord_cal.pivot_a, chord_cal.pivot_b)
+
+	def count_pivot_flags(self, pivot_a, pivot_b):
+		"""1組のピヴォット候補について、ピヴォットの探索が必要になったかを集計する
+
+			Args:
+				pivot_a (Tuple): 算出元のピヴォット候補（ChordCalculator.pickup_pivotlistの戻り値）
+				pivot_b (Tuple): 算出先のピヴォット候補（ChordCalculator.pickup_pivotlistの戻り値）
+
+		"""
+		self.pivot_lookups += 2
+		self.pivot_hits += int(pivot_a[1]) + int(pivot_b[1])
+
+	def snapshot(self):
+		"""集計結果の複製を返す
+
+			Returns:
+				stats (Dict): 構成要素名 -> {"calls", "total_sec", "max_sec", "mean_sec"}と、
+					"pivot" -> {"lookups", "hits", "hit_rate"}、"matrix_cache" -> {"hits", "misses", "hit_rate"}
+
+		"""
+		stats = {}
+		for name, (calls, total, maximum) in self.components.items():
+			stats[name] = {"calls": calls, "total_sec": total, "max_sec": maximum, "mean_sec": total / calls}
+		stats["pivot"] = {"lookups": self.pivot_lookups, "hits": self.pivot_hits, "hit_rate": self.pivot_hits / self.pivot_lookups if self.pivot_lookups > 0 else 0.0}
+		matrix_calls = self.matrix_hits + self.matrix_misses
+		stats["matrix_cache"] = {"hits": self.matrix_hits, "misses": self.matrix_misses, "hit_rate": self.matrix_hits / matrix_calls if matrix_calls > 0 else 0.0}
+		return stats
 
 class Delta_Chord_calculator:
 	"""Delta_Chord_calculatorクラス
@@ -26,15 +151,44 @@ class Delta_Chord_calculator:
 			chord_a (Chord): 算出元のコードクラス
 			chord_b (Chord): 算出元のコードクラス
 			delta(Int): 和音間距離
+			profile (DeltaProfile): 算出処理の内訳の集計（計測しない場合はNone）
+
+		Args:
+			profile (Bool): 算出処理の内訳を計測するか否か（省略時はFalse。計測しない場合の追加の処理は分岐1つのみ）
 
 	"""
-	def __init__(self):
+
+	__slots__ = ("basicspace_cal", "region_cal", "chord_cal", "chord_a", "chord_b", "delta", "profile")
+
+	MATRIX_CACHE_SIZE = 512
+	"""MATRIX_CACHE_SIZE
+	
+		和音間距離行列のメモ化キャッシュに保持するコードネーム対の上限数
+
+	"""
+
+	ROW_CACHE_SIZE = 4096
+	"""ROW_CACHE_SIZE
+	
+		和音間距離行列の1行（遷移元の1つの調）のメモ化キャッシュに保持する行の上限数
+
+	"""
+
+	_matrix_cache = OrderedDict()	#コードID対 -> 和音間距離行列（全インスタンスで共有）
+	_row_cache = OrderedDict()	#（コードID対, 遷移元の調の番号） -> 和音間距離行列の1行（全インスタンスで共有）
+	_store = None	#和音間距離の保存先（DistanceStore。全インスタンスで共有）
+	_tensor = None	#語彙の和音間距離の表（DistanceTensor。全インスタンスで共有）
+	_executor = None	#和音間距離行列を並列に算出するプロセスプール（全インスタンスで共有）
+	_executor_workers = None	#プロセスプールのプロセス数
+
+	def __init__(self, profile=False):
 		self.basicspace_cal = BasicspaceCalculator()
 		self.region_cal = RegionCalculator()
 		self.chord_cal = ChordCalculator()
 		self.chord_a = None
 		self.chord_b = None
 		self.delta = 0
+		self.profile = DeltaProfile() if profile else None
 
 	def calc_chord_delta(self, chord_1, chord_2):
 		"""和音間距離を算出する
@@ -51,12 +205,439 @@ class Delta_Chord_calculator:
 		"""
 		self.chord_a = chord_1
 		self.chord_b = chord_2
-		result = self.basicspace_cal.calc_basicspace(self.chord_a, self.chord_b)
-		result += self.region_cal.calc_region(self.chord_a, self.chord_b)
-		result += self.chord_cal.calc_chord(self.chord_a, self.chord_b)
+		profile = self.profile
+		if profile is None:
+			result = self.basicspace_cal.calc_basicspace(self.chord_a, self.chord_b)
+			result += self.region_cal.calc_region(self.chord_a, self.chord_b)
+			result += self.chord_cal.calc_chord(self.chord_a, self.chord_b)
+		else:
+			result = profile.timed("basicspace", self.basicspace_cal.calc_basicspace, self.chord_a, self.chord_b)
+			result += profile.timed("region", self.region_cal.calc_region, self.chord_a, self.chord_b)
+			result += profile.timed("chord", self.chord_cal.calc_chord, self.chord_a, self.chord_b)
+			profile.count_pivot(self.chord_cal)
 		self.delta = result
 		return self.delta
 
+	def calc_chord_delta_matrix(self, chord_a, chord_b):
+		"""24調×24調の和音間距離行列を算出する
+
+			2つのコードについて、KEY_LISTの全ての調の組み合わせ（24×24通り）の和音間距離を算出する。
+			結果はコードID対をキーとして有限サイズのキャッシュにメモ化されるため、
+			同じコード進行（例:"G 7"->"C maj7"）が再び現れた場合は辞書の参照のみで済む。
+
+			Args:
+				chord_a (int or str): 遷移元のコードID又はコードネーム
+				chord_b (int or str): 遷移先のコードID又はコードネーム
+			
+			Returns:
+				matrix (Tuple): matrix[j][k]はchord_aをKEY_LIST[j]、chord_bをKEY_LIST[k]で解釈した時の
+					(和音間距離, コード距離, 調間距離, ベーシックスペース距離)
+
+		"""
+		chord_id_a = ChordTokenizer.to_id(chord_a)
+		chord_id_b = ChordTokenizer.to_id(chord_b)
+		key = (chord_id_a, chord_id_b)
+		cache = Delta_Chord_calculator._matrix_cache
+		matrix = cache.get(key)
+		profile = self.profile
+		if matrix is not None:
+			#キャッシュにヒットしたら最近使用したものとして末尾に移動する
+			cache.move_to_end(key)
+			if profile is not None:
+				profile.matrix_hits += 1
+			return matrix
+		if profile is not None:
+			profile.matrix_misses += 1
+
+		#語彙の表にあれば表から取り出してキャッシュに登録する
+		tensor = Delta_Chord_calculator._tensor
+		if tensor is not None:
+			matrix = tensor.get_matrix(chord_id_a, chord_id_b)
+			if matrix is not None:
+				self.cache_matrix(key, matrix)
+				return matrix
+
+		#保存先にあれば読み込んでキャッシュに登録する
+		store = Delta_Chord_calculator._store
+		if store is not None:
+			matrix = store.get_matrix(ChordTokenizer.get_name(chord_id_a), ChordTokenizer.get_name(chord_id_b))
+			if matrix is not None:
+				self.cache_matrix(key, matrix)
+				return matrix
+
+		if profile is not None:
+			matrix_start = time.perf_counter()
+		matrix = self.compute_matrix(chord_id_a, chord_id_b)
+
+		self.cache_matrix(key, matrix)
+		if store is not None:
+			store.put_matrix(ChordTokenizer.get_name(chord_id_a), ChordTokenizer.get_name(chord_id_b), matrix)
+
+		if profile is not None:
+			#行列全体の算出時間（各構成要素の時間と計測自体の時間を含む）
+			profile.add("matrix", time.perf_counter() - matrix_start)
+		return matrix
+
+	def compute_matrix(self, chord_id_a, chord_id_b):
+		"""24調×24調の和音間距離行列を、キャッシュ・保存先・語彙の表を使わずに算出する
+
+			計測する場合、内訳は"basicspace_table"（一括算出）、"region"（REGION_MATRIXの行の参照。行ごとに1回）、
+			"chord"（セルごとに1回）の構成要素として集計する。
+
+			Args:
+				chord_id_a (int): 遷移元のコードID
+				chord_id_b (int): 遷移先のコードID
+
+			Returns:
+				matrix (Tuple): calc_chord_delta_matrixと同じ形式の和音間距離行列
+
+		"""
+		profile = self.profile
+
+		#ピヴォット候補は調ごとに1度だけ求めておき、各セルではChordを生成せずに整数と表の参照だけで算出する
+		pivots_a = self.chord_cal.get_pivotlists(chord_id_a)
+		pivots_b = self.chord_cal.get_pivotlists(chord_id_b)
+
+		#ベーシックスペース距離は24×24通りを一括で算出する
+		if profile is None:
+			basicspace_table = BasicspaceKernel.delta_table(chord_id_a, chord_id_b)
+		else:
+			basicspace_table = profile.timed("basicspace_table", BasicspaceKernel.delta_table, chord_id_a, chord_id_b)
+
+		return tuple(self._compute_row(j, pivots_a[j], pivots_b, basicspace_table[j]) for j in range(len(KEY_LIST)))
+
+	def compute_row(self, chord_id_a, key_index, chord_id_b):
+		"""和音間距離行列の1行（遷移元の1つの調×遷移先の24調）を、キャッシュ・保存先・語彙の表を使わずに算出する
+
+			計測する場合、内訳は"basicspace_row"・"region"・"chord"の構成要素として集計する（compute_matrixと同様）。
+
+			Args:
+				chord_id_a (int): 遷移元のコードID
+				key_index (int): 遷移元の調のKEY_LISTでの番号
+				chord_id_b (int): 遷移先のコードID
+
+			Returns:
+				row (Tuple): compute_matrixの結果のkey_index行目と同じ24個の(和音間距離, コード距離, 調間距離, ベーシックスペース距離)
+
+		"""
+		profile = self.profile
+		pivot_a = self.chord_cal.get_pivotlists(chord_id_a)[key_index]
+		pivots_b = self.chord_cal.get_pivotlists(chord_id_b)
+
+		#ベーシックスペース距離は遷移先の24調分を一括で算出する
+		if profile is None:
+			basicspace_row = BasicspaceKernel.delta_row(chord_id_a, key_index, chord_id_b)
+		else:
+			basicspace_row = profile.timed("basicspace_row", BasicspaceKernel.delta_row, chord_id_a, key_index, chord_id_b)
+		return self._compute_row(key_index, pivot_a, pivots_b, basicspace_row)
+
+	def _compute_row(self, key_index, pivot_a, pivots_b, basicspace_row):
+		"""遷移元の1つの調について、ピヴォット候補とベーシックスペース距離から和音間距離行列の1行を組み立てる
+
+			Args:
+				key_index (int): 遷移元の調のKEY_LISTでの番号
+				pivot_a (Tuple): 遷移元のその調でのピヴォット候補
+				pivots_b (Tuple): 遷移先の24調それぞれでのピヴォット候補
+				basicspace_row (List): 遷移先の24調それぞれとのベーシックスペース距離
+
+			Returns:
+				row (Tuple): 24個の(和音間距離, コード距離, 調間距離, ベーシックスペース距離)
+
+		"""
+		profile = self.profile
+		chord_distance = ChordCalculator.chord_distance
+		key_a = KEY_LIST[key_index]
+		#調間距離はコードによらないので、24調×24調の表をそのまま使う
+		if profile is None:
+			region_row = REGION_MATRIX[key_index]
+		else:
+			region_row = profile.timed("region", REGION_MATRIX.__getitem__, key_index)
+		row = []
+		for k, key_b in enumerate(KEY_LIST):
+			delta_basicspace = basicspace_row[k]
+			delta_region = region_row[k]
+			if profile is None:
+				delta_chord = chord_distance(pivot_a, key_a, pivots_b[k], key_b)
+			else:
+				delta_chord = profile.timed("chord", chord_distance, pivot_a, key_a, pivots_b[k], key_b)
+				profile.count_pivot_flags(pivot_a, pivots_b[k])
+			row.append((delta_basicspace + delta_region + delta_chord, delta_chord, delta_region, delta_basicspace))
+		return tuple(row)
+
+	def calc_chord_delta_row(self, chord_a, key_a, chord_b):
+		"""遷移元の1つの調について、遷移先の24調との和音間距離を内訳付きでまとめて算出する
+
+			コードID対の和音間距離行列がキャッシュにあればその行を返し、語彙の表か保存先にあれば行列を取り出してキャッシュに登録する。
+			いずれにも無ければこの1行だけを算出し、（コードID対, 調）をキーとして有限サイズのキャッシュにメモ化する。
+			同じコード対の24行が揃ったら行列としてキャッシュ（と保存先）に登録する。
+
+			Args:
+				chord_a (int or str): 遷移元のコードID又はコードネーム
+				key_a (Tuple): 遷移元の調（調のルート, 長調/短調フラグ）
+				chord_b (int or str): 遷移先のコードID又はコードネーム
+
+			Returns:
+				row (Tuple): row[k]はchord_bをKEY_LIST[k]で解釈した時の(和音間距離, コード距離, 調間距離, ベーシックスペース距離)
+
+		"""
+		chord_id_a = ChordTokenizer.to_id(chord_a)
+		chord_id_b = ChordTokenizer.to_id(chord_b)
+		key_index = KEY_INDEX[key_a]
+		matrix = Delta_Chord_calculator._matrix_cache.get((chord_id_a, chord_id_b))
+		if matrix is not None:
+			return matrix[key_index]
+		tensor = Delta_Chord_calculator._tensor
+		if tensor is not None and tensor.contains(chord_id_a) and tensor.contains(chord_id_b):
+			return self.calc_chord_delta_matrix(chord_id_a, chord_id_b)[key_index]
+
+		rows = Delta_Chord_calculator._row_cache
+		key = (chord_id_a, chord_id_b, key_index)
+		row = rows.get(key)
+		if row is not None:
+			#キャッシュにヒットしたら最近使用したものとして末尾に移動する
+			rows.move_to_end(key)
+			return row
+
+		#保存先の行列は1行（BLOB）で読み込める（無かったコード対は保存先が覚えているので問い合わせは1度だけ）
+		store = Delta_Chord_calculator._store
+		if store is not None:
+			matrix = store.get_matrix(ChordTokenizer.get_name(chord_id_a), ChordTokenizer.get_name(chord_id_b))
+			if matrix is not None:
+				self.cache_matrix((chord_id_a, chord_id_b), matrix)
+				return matrix[key_index]
+
+		profile = self.profile
+		if profile is not None:
+			row_start = time.perf_counter()
+		row = self.compute_row(chord_id_a, key_index, chord_id_b)
+		if profile is not None:
+			profile.add("row", time.perf_counter() - row_start)
+
+		rows[key] = row
+		if len(rows) > self.ROW_CACHE_SIZE:
+			rows.popitem(last=False)
+		if all((chord_id_a, chord_id_b, j) in rows for j in range(len(KEY_LIST))):
+			#全ての調の行が揃ったら行列として登録し、行のキャッシュからは取り除く
+			matrix = tuple(rows.pop((chord_id_a, chord_id_b, j)) for j in range(len(KEY_LIST)))
+			self.cache_matrix((chord_id_a, chord_id_b), matrix)
+			if store is not None:
+				store.put_matrix(ChordTokenizer.get_name(chord_id_a), ChordTokenizer.get_name(chord_id_b), matrix)
+		return row
+
+	def calc_chord_delta_cell(self, chord_a, key_a, chord_b, key_b):
+		"""1組の調の和音間距離を内訳付きで算出する
+
+			語彙の表にあれば表から取り出し、無ければcalc_chord_delta_rowで求めた行
+			（キャッシュ・保存先の行列の行、又は算出してメモ化した行）から取り出す。
+
+			Args:
+				chord_a (int or str): 遷移元のコードID又はコードネーム
+				key_a (Tuple): 遷移元の調（調のルート, 長調/短調フラグ）
+				chord_b (int or str): 遷移先のコードID又はコードネーム
+				key_b (Tuple): 遷移先の調（調のルート, 長調/短調フラグ）
+
+			Returns:
+				cell (Tuple): (和音間距離, コード距離, 調間距離, ベーシックスペース距離)
+
+		"""
+		chord_id_a = ChordTokenizer.to_id(chord_a)
+		chord_id_b = ChordTokenizer.to_id(chord_b)
+		tensor = Delta_Chord_calculator._tensor
+		if tensor is not None:
+			cell = tensor.get_cell(chord_id_a, key_a, chord_id_b, key_b)
+			if cell is not None:
+				return cell
+		return self.calc_chord_delta_row(chord_id_a, key_a, chord_id_b)[KEY_INDEX[key_b]]
+
+	@classmethod
+	def cache_matrix(cls, key, matrix):
+		"""和音間距離行列をキャッシュに登録する
+
+			上限を超えたら最も古いものを捨てる
+
+			Args:
+				key (Tuple): コードID対
+				matrix (Tuple): 和音間距離行列
+
+		"""
+		cache = cls._matrix_cache
+		cache[key] = matrix
+		cache.move_to_end(key)
+		if len(cache) > cls.MATRIX_CACHE_SIZE:
+			cache.popitem(last=False)
+
+	@classmethod
+	def set_store(cls, store):
+		"""和音間距離とピヴォット候補の保存先を設定する
+
+			キャッシュに無い和音間距離行列は保存先から読み込み、保存先にも無ければ算出して保存先に書き込む。
+			保存先はChordCalculatorのピヴォット候補にも設定される。
+
+			Args:
+				store (DistanceStore): 保存先（Noneなら保存先を使わない）
+
+		"""
+		cls._store = store
+		ChordCalculator.set_store(store)
+
+	@classmethod
+	def set_tensor(cls, tensor):
+		"""語彙の和音間距離の表を設定する
+
+			語彙に含まれるコード対の和音間距離は、算出せずに表から取り出す。
+
+			Args:
+				tensor (DistanceTensor): 語彙の和音間距離の表（Noneなら表を使わない）
+
+		"""
+		cls._tensor = tensor
+
+	@classmethod
+	def get_tensor(cls):
+		"""語彙の和音間距離の表を返す
+
+			Returns:
+				tensor (DistanceTensor): 語彙の和音間距離の表（設定されていなければNone）
+
+		"""
+		return cls._tensor
+
+	@classmethod
+	def get_store(cls):
+		"""和音間距離の保存先を返す
+
+			Returns:
+				store (DistanceStore): 保存先（設定されていなければNone）
+
+		"""
+		return cls._store
+
+	@classmethod
+	def calc_matrices_parallel(cls, pairs, workers, profile=None):
+		"""複数のコード対の和音間距離行列を、プロセスプールで並列に算出する
+
+			キャッシュ・語彙の表に無いコード対（重複を除く）だけをワーカーに分けて算出し、
+			キャッシュ（と保存先）に登録する。各行列の算出は互いに独立なので、結果は1つずつ順に算出した場合と同じになる。
+			算出するコード対が1つ以下なら何もしない（呼び出し側で順に算出する）。
+
+			プロセスプールはプロセス数ごとに作り、shutdown_executorを呼ぶまで使い回す。
+
+			profileを渡すと、1つずつ順に算出した場合と同じく、算出したコード対を"matrix"の構成要素（ワーカーでの算出時間）と
+			キャッシュのミスとして、同じコード対の2回目以降をキャッシュのヒットとして集計する。
+
+			Args:
+				pairs (List): （遷移元のコードID又はコードネーム, 遷移先のコードID又はコードネーム）のリスト
+				workers (Int): プロセス数
+				profile (DeltaProfile): 算出処理の内訳の集計先（Noneなら集計しない）
+
+			Returns:
+				matrices (Dict): コードID対 -> 算出した和音間距離行列（キャッシュの大きさによらず、算出した全てのコード対を含む）
+
+		"""
+		counts = {}	#算出するコード対 -> 出現回数（挿入順を保つ）
+		for chord_a, chord_b in pairs:
+			key = (ChordTokenizer.to_id(chord_a), ChordTokenizer.to_id(chord_b))
+			if key in counts:
+				counts[key] += 1
+				continue
+			if key in cls._matrix_cache:
+				continue
+			if cls._tensor is not None and cls._tensor.contains(key[0]) and cls._tensor.contains(key[1]):
+				continue
+			counts[key] = 1
+		if len(counts) <= 1:
+			return {}
+
+		keys = list(counts)
+		names = [(ChordTokenizer.get_name(key[0]), ChordTokenizer.get_name(key[1])) for key in keys]
+		chunksize = max(1, len(names) // (workers * 4))
+		matrices = {}
+		for key, name, (matrix, elapsed) in zip(keys, names, cls.get_executor(workers).map(_calc_matrix_task, names, chunksize=chunksize)):
+			matrices[key] = matrix
+			cls.cache_matrix(key, matrix)
+			if cls._store is not None:
+				cls._store.put_matrix(name[0], name[1], matrix)
+			if profile is not None:
+				profile.add("matrix", elapsed)
+				profile.matrix_misses += 1
+				profile.matrix_hits += counts[key] - 1
+		return matrices
+
+	@classmethod
+	def get_executor(cls, workers):
+		"""和音間距離行列を並列に算出するプロセスプールを返す
+
+			Args:
+				workers (Int): プロセス数（前回と異なれば作り直す）
+
+			Returns:
+				executor (ProcessPoolExecutor): プロセスプール
+
+		"""
+		if cls._executor is None or cls._executor_workers != workers:
+			cls.shutdown_executor()
+			from concurrent.futures import ProcessPoolExecutor
+			cls._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_matrix_worker)
+			cls._executor_workers = workers
+		return cls._executor
+
+	@classmethod
+	def shutdown_executor(cls):
+		"""和音間距離行列を並列に算出するプロセスプールを終了する
+
+		"""
+		if cls._executor is not None:
+			cls._executor.shutdown()
+			cls._executor = None
+			cls._executor_workers = None
+
+	@classmethod
+	def prefetch_matrices(cls, pairs):
+		"""保存先からコード対の和音間距離行列をまとめて読み込み、キャッシュに登録する
+
+			キャッシュにあるコード対は読み込まない。保存先が設定されていなければ何もしない。
+
+			Args:
+				pairs (List): （遷移元のコードID又はコードネーム, 遷移先のコードID又はコードネーム）のリスト
+
+		"""
+		store = cls._store
+		if store is None:
+			return
+		keys = {}
+		for chord_a, chord_b in pairs:
+			key = (ChordTokenizer.to_id(chord_a), ChordTokenizer.to_id(chord_b))
+			if key not in cls._matrix_cache:
+				keys[(ChordTokenizer.get_name(key[0]), ChordTokenizer.get_name(key[1]))] = key
+		for names, matrix in store.get_matrices(list(keys)).items():
+			cls.cache_matrix(keys[names], matrix)
+
+	def get_stats(self):
+		"""算出処理の内訳の集計結果を返す
+
+			Returns:
+				stats (Dict): DeltaProfile.snapshotの結果（計測していない場合はNone）
+
+		"""
+		if self.profile is None:
+			return None
+		return self.profile.snapshot()
+
+	def reset_stats(self):
+		"""算出処理の内訳の集計を0に戻す
+
+		"""
+		if self.profile is not None:
+			self.profile.reset()
+
+	@classmethod
+	def clear_matrix_cache(cls):
+		"""和音間距離行列（と行）のキャッシュを消去する
+
+		"""
+		Delta_Chord_calculator._matrix_cache.clear()
+		Delta_Chord_calculator._row_cache.clear()
+
 	def get_last_delta_chord(self):
 		"""コード間距離のゲッタ（アクセサ）
 
@@ -0,0 +1,360 @@
+"""Distance_store.py
+
+	和音間距離とピヴォット候補をSQLiteのファイルに保存し、プロセスや実行をまたいで再利用するモジュール
+
+	* Author: Naohiko Yamaguchi
+	* Copyright (c) 2024 Naohiko Yamaguchi,IPUT in Tokyo, Japan.
+	* License: New BSD License
+
+	Note:
+		コードIDはプロセスごとに振られるので、ファイルには正規化したコードネームをキーとして保存する。
+
+"""
+
+# 事前に必要な外部モジュールをインポートする
+import contextlib
+import hashlib
+import os
+import sqlite3
+import struct
+from Chord import KEY_LIST
+from Basicspace_kernel import BasicspaceKernel
+from Chord_calculator import ChordCalculator, MAJOR_CHORDCIRCLES, MINOR_CHORDCIRCLES
+from Region_calculator import REGION_MATRIX
+
+class DistanceStore:
+	"""DistanceStoreクラス
+
+		和音間距離行列を（コードネーム, コードネーム, バージョン）ごとに1行のBLOBとして、
+		ピヴォット候補を（コードネーム, 調）ごとにSQLiteのファイルへ保存する。
+
+		* 書き込みはバッファに溜めておき、batch_size行を超えた時かflush・closeの時に1つのトランザクションでまとめて書き出す
+		* 読み込みはコード対の和音間距離行列を1行で、コードの24調分のピヴォット候補をまとめて1度に行う
+		* ファイルはWALモードで開くので、複数のプロセスが同じファイルを同時に読み書きできる。
+		  値は同じキーに対して常に同じなので、先に書き込まれた行を残す（INSERT OR IGNORE）
+		* 距離の算出規則のバージョン（get_version）がファイルに記録されたものと異なる場合は、開いた時に保存済みの値を全て捨てる
+
+		接続はプロセスごとに開き直すので、fork後の子プロセスでもそのまま使える。
+
+		Args:
+			path (str): 保存先のファイルのパス
+			batch_size (Int): 溜めておく書き込みの行数の上限
+			timeout (float): 他のプロセスの書き込みを待つ時間の上限[秒]
+
+		Attributes:
+			path (str): 保存先のファイルのパス
+			batch_size (Int): 溜めておく書き込みの行数の上限
+			timeout (float): 他のプロセスの書き込みを待つ時間の上限[秒]
+			version (str): 距離の算出規則のバージョン
+			hits (Int): 保存済みの値が見つかった読み込みの回数
+			misses (Int): 保存済みの値が見つからなかった読み込みの回数
+			writes (Int): ファイルに書き出した行数
+
+	"""
+
+	RULES_VERSION = 1
+	"""RULES_VERSION
+
+		距離の算出規則のバージョン番号（算出規則を変えたら増やす）
+
+	"""
+
+	RULE_TABLES = (KEY_LIST, BasicspaceKernel.KEY_LEVELS, MAJOR_CHORDCIRCLES, MINOR_CHORDCIRCLES, REGION_MATRIX, ChordCalculator.CHORD_DISTANCE_UNMEASURABLE)
+	"""RULE_TABLES
+
+		距離の算出規則を定める表。内容のハッシュ値をバージョンに含めるので、表を書き換えれば保存済みの値は捨てられる。
+		表以外の算出手順を変えた場合はRULES_VERSIONを増やすこと。
+
+	"""
+
+	MATRIX_FORMAT = "<" + str(len(KEY_LIST) * len(KEY_LIST) * 2) + "h"
+	"""MATRIX_FORMAT
+
+		和音間距離行列のBLOBの形式（struct）。24調×24調の各セルのコード距離とベーシックスペース距離を16ビット整数で並べる。
+		調間距離はREGION_MATRIXから、和音間距離は3つの和から復元する（Distance_tensorと同じ）。
+
+	"""
+
+	_shared = {}	#（パス, プロセスID） -> DistanceStore
+
+	def __init__(self, path, batch_size=256, timeout=30.0):
+		if batch_size < 1:
+			raise ValueError("batch_size must be 1 or more")
+		self.path = path
+		self.batch_size = batch_size
+		self.timeout = timeout
+		self.version = self.get_version()
+		self.hits = 0
+		self.misses = 0
+		self.writes = 0
+		self._connection = None
+		self._pid = None
+		self._pending_matrices = []	#書き出していない和音間距離行列の行
+		self._pending_pivots = []	#書き出していないピヴォット候補の行
+		self._missing = set()	#保存されていなかったコードネーム対（flushのたびに捨てて問い合わせ直す）
+
+	@classmethod
+	def shared(cls, path):
+		"""プロセス内で共有するDistanceStoreを返す
+
+			同じパスに対しては、プロセスごとに1つのインスタンス（接続）を使い回す。
+
+			Args:
+				path (str): 保存先のファイルのパス
+
+			Returns:
+				store (DistanceStore): パスに対応するインスタンス
+
+		"""
+		key = (os.path.abspath(path), os.getpid())
+		store = cls._shared.get(key)
+		if store is None:
+			store = cls(path)
+			cls._shared[key] = store
+		return store
+
+	@classmethod
+	def get_version(cls):
+		"""距離の算出規則のバージョンを返す
+
+			Returns:
+				version (str): RULES_VERSIONとRULE_TABLESの内容のハッシュ値を組み合わせた文字列
+
+		"""
+		digest = hashlib.sha256(repr(cls.RULE_TABLES).encode("utf-8"))
+		return f"{cls.RULES_VERSION}-{digest.hexdigest()[:16]}"
+
+	def get_matrices(self, pairs):
+		"""複数のコードネーム対の和音間距離行列をまとめて読み込む
+
+			Args:
+				pairs (List): （遷移元のコードネーム, 遷移先のコードネーム）のリスト
+
+			Returns:
+				matrices (Dict): コードネーム対 -> 和音間距離行列（Delta_Chord_calculator.calc_chord_delta_matrixと同じ形式）。
+					保存されていないコードネーム対は含まない
+
+		"""
+		pairs = [pair for pair in dict.fromkeys(pairs) if pair not in self._missing]
+		if len(pairs) == 0:
+			return {}
+		connection = self._connect()
+		matrices = {}
+		#SQLの変数の数の上限を超えないように分けて問い合わせる
+		for start in range(0, len(pairs), 400):
+			chunk = pairs[start:start + 400]
+			query = "SELECT chord_a, chord_b, matrix FROM matrices WHERE version = ? AND (chord_a, chord_b) IN (VALUES " + ",".join(["(?, ?)"] * len(chunk)) + ")"
+			for chord_a, chord_b, blob in connection.execute(query, [self.version] + [name for pair in chunk for name in pair]):
+				matrices[(chord_a, chord_b)] = self.decode_matrix(blob)
+
+		for pair in pairs:
+			if pair in matrices:
+				self.hits += 1
+			else:
+				self._missing.add(pair)
+				self.misses += 1
+		return matrices
+
+	def get_matrix(self, chord_a, chord_b):
+		"""コードネーム対の和音間距離行列を読み込む
+
+			Args:
+				chord_a (str): 遷移元のコードネーム
+				chord_b (str): 遷移先のコードネーム
+
+			Returns:
+				matrix (Tuple): 和音間距離行列（保存されていなければNone）
+
+		"""
+		return self.get_matrices([(chord_a, chord_b)]).get((chord_a, chord_b))
+
+	def put_matrix(self, chord_a, chord_b, matrix):
+		"""コードネーム対の和音間距離行列を書き込む（バッファに溜める）
+
+			Args:
+				chord_a (str): 遷移元のコードネーム
+				chord_b (str): 遷移先のコードネーム
+				matrix (Tuple): 和音間距離行列
+
+		"""
+		self._pending_matrices.append((chord_a, chord_b, self.version, self.encode_matrix(matrix)))
+		self._missing.discard((chord_a, chord_b))
+		self._flush_if_full()
+
+	@classmethod
+	def encode_matrix(cls, matrix):
+		"""和音間距離行列をBLOBに変換する
+
+			Args:
+				matrix (Tuple): 和音間距離行列
+
+			Returns:
+				blob (bytes): MATRIX_FORMATの形式のバイト列
+
+		"""
+		return struct.pack(cls.MATRIX_FORMAT, *[value for row in matrix for cell in row for value in (cell[1], cell[3])])
+
+	@classmethod
+	def decode_matrix(cls, blob):
+		"""BLOBを和音間距離行列に戻す
+
+			Args:
+				blob (bytes): MATRIX_FORMATの形式のバイト列
+
+			Returns:
+				matrix (Tuple): 和音間距離行列（Delta_Chord_calculator.calc_chord_delta_matrixと同じ形式）
+
+		"""
+		values = struct.unpack(cls.MATRIX_FORMAT, blob)
+		matrix = []
+		for j, region_row in enumerate(REGION_MATRIX):
+			base = j * len(KEY_LIST) * 2
+			row = []
+			for k, delta_region in enumerate(region_row):
+				delta_chord = values[base + 2 * k]
+				delta_basicspace = values[base + 2 * k + 1]
+				row.append((delta_basicspace + delta_region + delta_chord, delta_chord, delta_region, delta_basicspace))
+			matrix.append(tuple(row))
+		return tuple(matrix)
+
+	def get_pivots(self, chordname):
+		"""コードの24調分のピヴォット候補をまとめて読み込む
+
+			Args:
+				chordname (str): コードネーム
+
+			Returns:
+				pivots (Dict): 調（調のルート, 長調/短調フラグ） -> ピヴォット候補（ChordCalculator.pickup_pivotlistと同じ形式）
+
+		"""
+		pivots = {}
+		for root, minor, names, need_pivot in self._connect().execute("SELECT root, minor, pivot, need_pivot FROM pivots WHERE chord = ?", (chordname,)):
+			pivots[(root, bool(minor))] = (tuple(names.split(",")), bool(need_pivot))
+		if len(pivots) > 0:
+			self.hits += 1
+		else:
+			self.misses += 1
+		return pivots
+
+	def put_pivot(self, chordname, key, pivot):
+		"""1つの調のピヴォット候補を書き込む（バッファに溜める）
+
+			Args:
+				chordname (str): コードネーム
+				key (Tuple): 調（調のルート, 長調/短調フラグ）
+				pivot (Tuple): ピヴォット候補（ChordCalculator.pickup_pivotlistと同じ形式）
+
+		"""
+		self._pending_pivots.append((chordname, key[0], int(key[1]), ",".join(pivot[0]), int(pivot[1])))
+		self._flush_if_full()
+
+	def flush(self):
+		"""溜めておいた書き込みを1つのトランザクションでファイルに書き出す
+
+			他のプロセスが書き込んだ値も読めるように、保存されていなかったコードネーム対の記録も捨てる。
+
+		"""
+		self._missing.clear()
+		if len(self._pending_matrices) == 0 and len(self._pending_pivots) == 0:
+			return
+		connection = self._connect()
+		matrices, self._pending_matrices = self._pending_matrices, []
+		pivots, self._pending_pivots = self._pending_pivots, []
+		with self._transaction(connection):
+			connection.executemany("INSERT OR IGNORE INTO matrices VALUES (?, ?, ?, ?)", matrices)
+			connection.executemany("INSERT OR IGNORE INTO pivots VALUES (?, ?, ?, ?, ?)", pivots)
+		self.writes += len(matrices) + len(pivots)
+
+	def clear(self):
+		"""保存済みの値と溜めておいた書き込みを全て捨てる
+
+		"""
+		self._pending_matrices = []
+		self._pending_pivots = []
+		self._missing.clear()
+		connection = self._connect()
+		with self._transaction(connection):
+			connection.execute("DELETE FROM matrices")
+			connection.execute("DELETE FROM pivots")
+
+	def get_stats(self):
+		"""読み書きの集計を返す
+
+			Returns:
+				stats (Dict): 読み込みのヒット数・ミス数、書き出した行数、書き出していない行数
+
+		"""
+		return {"hits": self.hits, "misses": self.misses, "writes": self.writes, "pending": len(self._pending_matrices) + len(self._pending_pivots)}
+
+	def close(self):
+		"""溜めておいた書き込みを書き出して接続を閉じる
+
+		"""
+		if self._connection is not None and self._pid == os.getpid():
+			self.flush()
+			self._connection.close()
+		self._connection = None
+		self._pid = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def _flush_if_full(self):
+		"""溜めておいた書き込みがbatch_size行を超えたら書き出す
+
+		"""
+		if len(self._pending_matrices) + len(self._pending_pivots) >= self.batch_size:
+			self.flush()
+
+	def _connect(self):
+		"""このプロセスの接続を返す（無ければ開いて、表の作成とバージョンの確認を行う）
+
+		"""
+		if self._connection is not None and self._pid == os.getpid():
+			return self._connection
+		#fork前のプロセスの接続は使わない（溜めておいた書き込みは値が同じなのでそのまま書き出してよい）
+		connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+		connection.execute("PRAGMA journal_mode=WAL")
+		connection.execute("PRAGMA synchronous=NORMAL")
+		#表の作成とバージョンの確認は、他のプロセスと重ならないように書き込みロックを取ってから行う
+		try:
+			with self._transaction(connection):
+				self._prepare(connection)
+		except BaseException:
+			connection.close()
+			raise
+		self._connection = connection
+		self._pid = os.getpid()
+		return connection
+
+	def _prepare(self, connection):
+		"""表を作成し、記録されたバージョンが異なれば保存済みの値を捨てる
+
+		"""
+		connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+		connection.execute("CREATE TABLE IF NOT EXISTS matrices (chord_a TEXT, chord_b TEXT, version TEXT, matrix BLOB, PRIMARY KEY (chord_a, chord_b, version)) WITHOUT ROWID")
+		connection.execute("CREATE TABLE IF NOT EXISTS pivots (chord TEXT, root INTEGER, minor INTEGER, pivot TEXT, need_pivot INTEGER, PRIMARY KEY (chord, root, minor)) WITHOUT ROWID")
+		row = connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+		if row is None or row[0] != self.version:
+			connection.execute("DELETE FROM matrices")
+			connection.execute("DELETE FROM pivots")
+			connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+
+	@staticmethod
+	@contextlib.contextmanager
+	def _transaction(connection):
+		"""書き込みのトランザクション
+
+			始めに書き込みロックを取る（BEGIN IMMEDIATE）ので、他のプロセスが書き込み中であればtimeoutまで待つ。
+
+		"""
+		connection.execute("BEGIN IMMEDIATE")
+		try:
+			yield connection
+		except BaseException:
+			connection.execute("ROLLBACK")
+			raise
+		connection.execute("COMMIT")
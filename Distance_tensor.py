@@ -0,0 +1,283 @@
+"""Distance_tensor.py
+
+	固定したコードの語彙について、全ての（コード, 調）×（コード, 調）の和音間距離をあらかじめ算出してファイルに書き出し、
+	実行時にはそのファイルをメモリマップして参照するモジュール
+
+	* Author: Naohiko Yamaguchi
+	* Copyright (c) 2024 Naohiko Yamaguchi,IPUT in Tokyo, Japan.
+	* License: New BSD License
+
+	Note:
+		表の作成は"python Distance_tensor.py 語彙ファイル 出力ファイル"で行う（語彙ファイルは1行に1つのコードネーム）。
+
+"""
+
+# 事前に必要な外部モジュールをインポートする
+import json
+import mmap
+import os
+import struct
+import sys
+from Chord import KEY_LIST, KEY_INDEX
+from Chord_tokenizer import ChordTokenizer
+from Region_calculator import REGION_MATRIX
+
+class DistanceTensor:
+	"""DistanceTensorクラス
+
+		語彙のコード数をVとして、(V, V, 24, 24, 2)の符号なし8ビット整数の配列をファイルから読み取り専用でメモリマップする。
+		[a, b, j, k]の2要素は、語彙のa番目のコードをKEY_LIST[j]、b番目のコードをKEY_LIST[k]で解釈した時の
+		（コード距離, ベーシックスペース距離）。調間距離はコードによらないのでREGION_MATRIXから求め、ファイルには含めない。
+
+		ファイルはOSのページキャッシュを通して共有されるので、同じファイルを開いた全てのプロセスが同じメモリを参照し、
+		読み込みや事前計算の待ち時間もない。
+
+		ファイルの形式は、MAGIC・ヘッダの長さ（4バイト）・ヘッダ（JSON）・配列で、配列はALIGNMENTバイト境界から始まる。
+		ヘッダには語彙と距離の算出規則のバージョン（DistanceStore.get_version）を記録し、
+		バージョンが異なるファイルを開こうとした場合はValueErrorを送出する。
+
+		Args:
+			path (str): 表のファイルのパス
+
+		Attributes:
+			path (str): 表のファイルのパス
+			vocabulary (List): 語彙（正規化したコードネーム）
+			version (str): 表を作成した時の距離の算出規則のバージョン
+
+	"""
+
+	MAGIC = b"TPSDELTA"
+	"""MAGIC
+
+		表のファイルの先頭の8バイト
+
+	"""
+
+	ALIGNMENT = 64
+	"""ALIGNMENT
+
+		配列の先頭の位置を揃えるバイト数
+
+	"""
+
+	COMPONENTS = ["chord", "basicspace"]
+	"""COMPONENTS
+
+		配列の最終軸に並べる和音間距離の内訳
+
+	"""
+
+	_shared = {}	#パス -> DistanceTensor
+
+	def __init__(self, path):
+		self.path = path
+		with open(path, "rb") as f:
+			self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		try:
+			if self._mmap[:len(self.MAGIC)] != self.MAGIC:
+				raise ValueError("Not a distance tensor file: " + str(path))
+			(header_length,) = struct.unpack_from("<I", self._mmap, len(self.MAGIC))
+			header_start = len(self.MAGIC) + 4
+			header = json.loads(self._mmap[header_start:header_start + header_length].decode("utf-8"))
+			from Distance_store import DistanceStore
+			if header["version"] != DistanceStore.get_version():
+				raise ValueError("Distance tensor was built with other distance rules: " + str(path))
+		except BaseException:
+			self._mmap.close()
+			raise
+		self.vocabulary = header["vocabulary"]
+		self.version = header["version"]
+		self._offset = header["offset"]
+		self._index = {ChordTokenizer.intern(name): i for i, name in enumerate(self.vocabulary)}	#コードID -> 語彙の番号
+		self._pair_size = len(KEY_LIST) * len(KEY_LIST) * len(self.COMPONENTS)
+
+	@classmethod
+	def shared(cls, path):
+		"""プロセス内で共有するDistanceTensorを返す
+
+			Args:
+				path (str): 表のファイルのパス
+
+			Returns:
+				tensor (DistanceTensor): パスに対応するインスタンス
+
+		"""
+		key = os.path.abspath(path)
+		tensor = cls._shared.get(key)
+		if tensor is None:
+			tensor = cls(path)
+			cls._shared[key] = tensor
+		return tensor
+
+	@classmethod
+	def build(cls, path, chordnames):
+		"""語彙の全てのコード対の和音間距離行列を算出して表のファイルに書き出す
+
+			書き出しは一時ファイルに行い、最後に置き換えるので、書き出し中のファイルを他のプロセスが開くことはない。
+
+			Args:
+				path (str): 表のファイルのパス
+				chordnames (List): 語彙（コードネームのリスト。正規化して重複を除く）
+
+			Returns:
+				vocabulary (List): 表に書き出した語彙（正規化したコードネーム）
+
+		"""
+		from Delta_chord_calculator import Delta_Chord_calculator
+		from Distance_store import DistanceStore
+		chordids = list(dict.fromkeys(ChordTokenizer.intern(chordname) for chordname in chordnames))
+		vocabulary = [ChordTokenizer.get_name(chordid) for chordid in chordids]
+		header = {"version": DistanceStore.get_version(), "vocabulary": vocabulary, "components": cls.COMPONENTS, "dtype": "uint8", "offset": 0}
+		#ヘッダの長さは配列の先頭の位置の桁数で変わるので、位置が定まるまで繰り返す
+		while True:
+			encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+			offset = -(-(len(cls.MAGIC) + 4 + len(encoded)) // cls.ALIGNMENT) * cls.ALIGNMENT
+			if offset == header["offset"]:
+				break
+			header["offset"] = offset
+
+		tps_cal = Delta_Chord_calculator()
+		temporary = path + ".tmp"
+		try:
+			with open(temporary, "wb") as f:
+				f.write(cls.MAGIC)
+				f.write(struct.pack("<I", len(encoded)))
+				f.write(encoded)
+				f.write(b"\0" * (offset - len(cls.MAGIC) - 4 - len(encoded)))
+				for chordid_a in chordids:
+					for chordid_b in chordids:
+						matrix = tps_cal.calc_chord_delta_matrix(chordid_a, chordid_b)
+						#コード距離とベーシックスペース距離を8ビットに詰める（収まらなければ表を作れない）
+						values = [value for row in matrix for cell in row for value in (cell[1], cell[3])]
+						if min(values) < 0 or max(values) > 255:
+							raise ValueError("Distance does not fit in 8 bits: " + vocabulary[chordids.index(chordid_a)] + " -> " + vocabulary[chordids.index(chordid_b)])
+						f.write(bytes(values))
+			os.replace(temporary, path)
+		finally:
+			if os.path.exists(temporary):
+				os.remove(temporary)
+		return vocabulary
+
+	def contains(self, chord):
+		"""コードが語彙に含まれるか判定する
+
+			Args:
+				chord (int or str): コードID又はコードネーム
+
+			Returns:
+				contained (Bool): 語彙に含まれればTrue
+
+		"""
+		return ChordTokenizer.to_id(chord) in self._index
+
+	def get_matrix(self, chord_a, chord_b):
+		"""コード対の和音間距離行列を返す
+
+			Args:
+				chord_a (int or str): 遷移元のコードID又はコードネーム
+				chord_b (int or str): 遷移先のコードID又はコードネーム
+
+			Returns:
+				matrix (Tuple): Delta_Chord_calculator.calc_chord_delta_matrixと同じ形式の行列（語彙に無いコードを含めばNone）
+
+		"""
+		index_a = self._index.get(ChordTokenizer.to_id(chord_a))
+		index_b = self._index.get(ChordTokenizer.to_id(chord_b))
+		if index_a is None or index_b is None:
+			return None
+		start = self._offset + (index_a * len(self.vocabulary) + index_b) * self._pair_size
+		values = self._mmap[start:start + self._pair_size]
+		matrix = []
+		for j, region_row in enumerate(REGION_MATRIX):
+			row = []
+			base = j * len(KEY_LIST) * 2
+			for k, delta_region in enumerate(region_row):
+				delta_chord = values[base + 2 * k]
+				delta_basicspace = values[base + 2 * k + 1]
+				row.append((delta_basicspace + delta_region + delta_chord, delta_chord, delta_region, delta_basicspace))
+			matrix.append(tuple(row))
+		return tuple(matrix)
+
+	def get_cell(self, chord_a, key_a, chord_b, key_b):
+		"""1組の調の和音間距離を内訳付きで返す
+
+			Args:
+				chord_a (int or str): 遷移元のコードID又はコードネーム
+				key_a (Tuple): 遷移元の調（調のルート, 長調/短調フラグ）
+				chord_b (int or str): 遷移先のコードID又はコードネーム
+				key_b (Tuple): 遷移先の調（調のルート, 長調/短調フラグ）
+
+			Returns:
+				cell (Tuple): (和音間距離, コード距離, 調間距離, ベーシックスペース距離)（語彙に無いコードを含めばNone）
+
+		"""
+		index_a = self._index.get(ChordTokenizer.to_id(chord_a))
+		index_b = self._index.get(ChordTokenizer.to_id(chord_b))
+		if index_a is None or index_b is None:
+			return None
+		j = KEY_INDEX[key_a]
+		k = KEY_INDEX[key_b]
+		start = self._offset + (index_a * len(self.vocabulary) + index_b) * self._pair_size + (j * len(KEY_LIST) + k) * 2
+		delta_chord = self._mmap[start]
+		delta_basicspace = self._mmap[start + 1]
+		delta_region = REGION_MATRIX[j][k]
+		return (delta_basicspace + delta_region + delta_chord, delta_chord, delta_region, delta_basicspace)
+
+	def get_array(self):
+		"""表全体を配列として返す
+
+			NumPyがインストールされていなければNoneを返す。
+
+			Returns:
+				array (ndarray): (V, V, 24, 24, 2)の読み取り専用のNumPy配列（ファイルをメモリマップしたもの）
+
+		"""
+		from Basicspace_kernel import load_numpy
+		np = load_numpy()
+		if np is None:
+			return None
+		shape = (len(self.vocabulary), len(self.vocabulary), len(KEY_LIST), len(KEY_LIST), len(self.COMPONENTS))
+		return np.frombuffer(self._mmap, dtype=np.uint8, count=int(np.prod(shape)), offset=self._offset).reshape(shape)
+
+	def close(self):
+		"""メモリマップを閉じる
+
+			get_arrayで得た配列を参照している間は閉じられない（BufferErrorを送出する）。
+
+		"""
+		self._mmap.close()
+		for key in [key for key, tensor in DistanceTensor._shared.items() if tensor is self]:
+			del DistanceTensor._shared[key]
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+def main(argv=None):
+	"""コマンドラインから表のファイルを作成する
+
+		Args:
+			argv (List): コマンドライン引数（Noneならsys.argv[1:]）
+
+		Returns:
+			status (Int): 終了コード
+
+	"""
+	import argparse
+	parser = argparse.ArgumentParser(description="固定したコードの語彙の和音間距離の表を作成する")
+	parser.add_argument("vocabulary", help="語彙ファイルのパス（1行に1つのコードネーム）")
+	parser.add_argument("output", help="書き出す表のファイルのパス")
+	args = parser.parse_args(argv)
+
+	with open(args.vocabulary, encoding="utf-8") as f:
+		chordnames = [line.strip() for line in f if line.strip() != ""]
+	vocabulary = DistanceTensor.build(args.output, chordnames)
+	print(f"{len(vocabulary)} chords, {os.path.getsize(args.output)} bytes: {args.output}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
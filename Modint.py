@@ -17,6 +17,9 @@ class Modint:
 			value (Int): 値
 			mod (Int): 法
 	"""
+
+	__slots__ = ("value", "mod")
+
 	def __init__(self, val, mod):
 		self.mod = mod	# 法の設定
 		self.set(val)  # 値の設定
@@ -6,11 +6,38 @@
 	* Copyright (c) 2024 Naohiko Yamaguchi,IPUT in Tokyo, Japan.
 	* License: New BSD License
 
+	Note:
+		importしただけでは分析は行わない。デモ（"Fly me to the moon"冒頭部分の分析）は
+		"python Music.py"で実行する（使い方は"python Music.py --help"を参照）。
+		和音間距離の算出モジュール（Delta_chord_calculator以下）とNumPyは、初めて分析する時に読み込む。
+
 """
 
 # 事前に必要な外部モジュールをインポートする
-from Chord import Chord
-from Delta_chord_calculator import Delta_Chord_calculator
+#（和音間距離の算出モジュールとconcurrent.futuresは、import Musicを軽くするため使用する時に読み込む）
+import heapq
+import os
+import sys
+import time
+from collections import deque
+from Chord import Chord, KEY_LIST
+from Chord_tokenizer import ChordTokenizer
+from Analysis_log import AnalysisLog
+
+DEMO_CHORDSHEET = "A m 7,D m 7,G 7,C maj7,F maj7,B m 7 -5,E 7,A m 7,A 7,D m 7,G 7,C maj7,A 7,D m 7,G 7,C maj7,B m 7 -5,E 7"
+"""DEMO_CHORDSHEET
+
+	デモで分析するコードネーム列（"Fly me to the moon"冒頭部分）
+
+"""
+
+IMPORT_TIME_BUDGET = 0.03
+"""IMPORT_TIME_BUDGET
+
+	import Musicにかかる時間の目安[秒]（Pythonの起動時間を除く、Music以下のモジュールの読み込み時間）。
+	"python Music.py --import-time"で計測し、超えていれば終了コード1を返す。
+
+"""
 
 class Node:
 	"""Nodeクラス
@@ -36,6 +63,8 @@ class Node:
 	
 	"""
 
+	__slots__ = ("name", "children", "children_costs", "pointer", "g", "h", "f", "has_g", "has_f")
+
 	# コンストラクタ
 	def __init__(self, name, h):
 		self.name = name			#ノード名（引数で指定）
@@ -163,6 +192,16 @@ class Node:
 		self.children.append(child)
 		self.children_costs[child] = cost
 
+	def set_cost(self, child, cost):
+		"""指定した子ノードへの経路コスト（ノード間距離）を設定する
+
+			Args:
+				child (Node): 子ノード
+				cost (Int): 子ノードへの経路コスト（ノード間距離）
+
+		"""
+		self.children_costs[child] = cost
+
 	def get_children(self):
 		"""children(子ノードリスト)のゲッタ（アクセサ）
 
@@ -214,6 +253,11 @@ class Search:
 			node (List): ノード群を格納したリスト
 			goal (Node): グラフの終点ノードを示す参照
 			start (Node): グラフの始点ノードを示す参照
+			node_ids (Dict): ノードからノードIDを引く辞書
+			cost_provider (function): コストを省略した枝のコストを求める関数 cost_provider(parent_id, child_id)
+			provider_calls (Int): cost_providerを呼び出した回数
+			child_provider (function): 展開したノードから出る枝を求める関数 child_provider(parent_id)
+			expanded (Set): child_providerで枝を求めたノード
 	
 	"""
 
@@ -221,6 +265,11 @@ class Search:
 		self.nodes = []		#ノードリスト
 		self.goal = None	#終点ノード
 		self.start = None	#始点ノード
+		self.node_ids = {}	#ノード -> ノードID
+		self.cost_provider = None	#枝のコストを求める関数
+		self.provider_calls = 0		#cost_providerの呼び出し回数
+		self.child_provider = None	#展開したノードから出る枝を求める関数
+		self.expanded = set()		#child_providerで枝を求めたノード
 		
 
 	def new_node(self, name, heuristic):
@@ -237,19 +286,21 @@ class Search:
 
 		"""
 		new_node = Node(name, heuristic)
+		self.node_ids[new_node] = len(self.nodes)
 		self.nodes.append(new_node)
 		return len(self.nodes) - 1
 
 
-	def new_branch(self, parent_id, child_id, cost):
+	def new_branch(self, parent_id, child_id, cost=None):
 		"""ノード間に枝を張る
 
 			指定した子ノード間に経路（枝）を作成する
+			コストを省略した枝は、探索中に親ノードを展開した時にcost_providerでコストを求める。
 			
 			Args:
 				parent_id (Int): 親ノードのノードID
 				child_id (Int): 子ノードのノードID
-				cost (Int): 枝のコスト（距離）
+				cost (Int): 枝のコスト（距離）。省略時はNone
 
 			Returns:
 				length (Int): ノード数
@@ -257,6 +308,63 @@ class Search:
 		"""
 		self.nodes[parent_id].add_child(self.nodes[child_id], cost)
 
+	def set_cost_provider(self, provider):
+		"""枝のコストを求める関数を登録する
+
+			コストを省略して作成した枝のコストは、探索中に初めて必要になった時にこの関数で求め、
+			以後は枝のコストとして記録したものを使う（メモ化）。
+			
+			Args:
+				provider (function): 親ノードID・子ノードIDを受け取ってコストを返す関数
+
+		"""
+		self.cost_provider = provider
+
+	def set_child_provider(self, provider):
+		"""展開したノードから出る枝を求める関数を登録する
+
+			探索中にノードを初めて展開した時にこの関数で子ノードとコストを求めて枝を張る。
+			枝を事前に張っておく必要が無いので、展開されないノードの枝は作成もされない。
+			
+			Args:
+				provider (function): 親ノードIDを受け取って（子ノードID, コスト）のリストを返す関数
+
+		"""
+		self.child_provider = provider
+
+	def expand(self, node):
+		"""child_providerで求めた枝をノードに張る（ノードごとに1度だけ）
+
+			Args:
+				node (Node): 展開するノード
+
+		"""
+		if self.child_provider is None or node in self.expanded:
+			return
+		self.expanded.add(node)
+		for child_id, cost in self.child_provider(self.node_ids[node]):
+			node.add_child(self.nodes[child_id], cost)
+
+	def get_cost(self, parent, child):
+		"""枝のコストを取得する
+
+			枝のコストが省略されていた場合はcost_providerで求めて記録する
+			
+			Args:
+				parent (Node): 親ノード
+				child (Node): 子ノード
+
+			Returns:
+				cost (Int): 枝のコスト（距離）
+
+		"""
+		cost = parent.get_cost(child)
+		if cost is None:
+			self.provider_calls += 1
+			cost = self.cost_provider(self.node_ids[parent], self.node_ids[child])
+			parent.set_cost(child, cost)
+		return cost
+
 	# 状態空間の始点ノードと終点ノードを登録
 	# == 引数
 	# [start_id] 始点ノードとするノードのID
@@ -285,14 +393,33 @@ class Search:
 		result = ""
 
 		while now.get_pointer() is not None:
-			result = now.__str__() + " <- " + result
+			result = " <- " + now.__str__() + result
 			now = now.get_pointer()
 
 		if now == self.start:
-			result = now.__str__() + "\n *Route search was successful.*"
+			result = now.__str__() + result + "\n *Route search was successful.*"
 		else:
 			result += "*Route search failed."
 		return result
+
+	def get_route(self):
+		"""探索した最短路を返す
+
+			終点ノードから親ノードへのポインタをたどり、始点ノードから終点ノードまでのノード列を返す。
+			探索に失敗している場合は空のリストを返す。
+
+			Returns:
+				route (List): 始点ノードから終点ノードまでのノードのリスト
+
+		"""
+		route = []
+		now = self.goal
+		while now is not None:
+			route.insert(0, now)
+			now = now.get_pointer()
+		if len(route) == 0 or route[0] != self.start:
+			return []
+		return route
 	
 	
 	def aStar(self):
@@ -304,119 +431,514 @@ class Search:
 			
 			グラフ中の各ノードに求めた最短距離を格納する。
 			
+			Note:
+				チェック予定のノード(open)は優先度付きキュー（ヒープ）で管理し、
+				open・closedに含まれるか否かは辞書・集合で判定する。
+				評価値が更新されたノードは新しいキーでキューに積み直し、古い要素は取り出した時に読み捨てる。
+				
+				評価値が同じノードは、従来の実装（毎ステップ安定ソートするリスト）と同じ順序で展開する。
+				すなわち、あるステップで評価値が更新されたノードは、それ以前からopenにあるノードの後、
+				そのステップで新たに追加されたノードの前に並び、更新されたノード同士は更新前の順序を保つ。
+				このため、得られる経路と各ノードのg・fの値は従来の実装と一致する。
+			
 			Returns:
 				success (Bool): 探索成功したか否か
 
 		"""
-		open = []
-		open.append(self.start)
+		open = []			#チェック予定のノードのヒープ（キー, 追加番号, ノード）
+		open_keys = {}		#openにあるノード -> 現在のキー
+		closed = set()		#チェックの終わったノード
 		
 		self.start.set_g(0)
 		self.start.set_f(0)
 		
-		closed = []
+		#キーは（評価値, 追加・更新したステップ, 種別(0:更新 1:追加), 追加番号又は更新前のキー）
+		count = 0
+		key = (0, 0, 1, count)
+		open_keys[self.start] = key
+		heapq.heappush(open, (key, count, self.start))
+		
 		success = False
 		step = 0
 		
 		while True:
-			#ステップ数の表示とカウントアップ
-			#print("STEP:" + str(step) + "\n")
+			#ステップ数のカウントアップ
 			step += 1
 			
-			#これからチェックするノードのリスト
-			#print(" OPEN:" + str(open) + "\n")
-			#チェックの終わったノードのリスト
-			#print(" closed:" + str(closed) + "\n"
+			#キューの先頭から、評価値が更新される前の古い要素を読み捨てる
+			while len(open) > 0 and open_keys.get(open[0][2]) != open[0][0]:
+				heapq.heappop(open)
 			
 			if len(open) == 0:
 				#もう調べるべきノードが存在しない場合falseを返して終わり
 				success = False
 				break
-			else:
-				#調べるべきノードが存在する場合
-				#次に調べるノードをopenからnodeへ移す
-				node = open[0]
-				del open[0]
+			
+			#調べるべきノードが存在する場合
+			#次に調べるノードをopenからnodeへ移す
+			node = heapq.heappop(open)[2]
+			del open_keys[node]
+			
+			if node == self.goal:
+				success = True
+				break
+			
+			#nodeがまだゴールじゃない
+			#チェックの終わったノードにnodeを追加
+			closed.add(node)
+			
+			#nodeの子ノードを展開
+			self.expand(node)
+			for m in node.get_children():
+				#nodeまでの評価値とnode->mのコストを足したものを
+				#gmnとする
+				gmn = int(node.get_g()) + int(self.get_cost(node, m))
+				fmn = gmn + m.get_h()
 				
-				if node == self.goal:
-					success = True
-					break
-				else:
-					#nodeがまだゴールじゃない
-					#nodeの子ノードを展開
-					children = node.get_children()
-					
-					#チェックの終わったノードリストにnodeを追加
-					closed.append(node)
+				if m in open_keys:
+					#もしも、子ノードがopenに存在するならば
+					if gmn < m.get_g():
+						#今求めた評価値が、計算済みのコストより小さいなら
+						#評価値を更新
+						m.set_g(gmn)
+						#親ノードを更新
+						m.set_pointer(node)
 					
-					for i, cnode in enumerate(children):
-						#子ノードのi番目をmに移す
-						m = cnode
-						
-						#nodeまでの評価値とnode->mのコストを足したものを
-						#gmnとする
-						
-						gmn = int(node.get_g()) + int(node.get_cost(m))
+					if fmn < m.get_f():
+						#子ノードがチェック予定にあって評価値がfmnより低いなら
+						#評価値をfmnにする
+						m.set_f(fmn)
 						
-						if m not in open and m not in closed:
-							#もしも、子ノードがopenにもclosedにも存在しないなら
-							#（つまり未チェックかつチェック予定にも存在しないなら）
-							#mのコストとしてgmnを入れる
-							m.set_g(gmn)
+						#更新前のキーを引き継いでキューに積み直す
+						count += 1
+						key = (fmn, step, 0, open_keys[m])
+						open_keys[m] = key
+						heapq.heappush(open, (key, count, m))
 						
-						if m in open:
-							#もしも、子ノードがopenに存在するならば
-							if gmn < (m.get_g()):
-								#今求めた評価値が、計算済みのコストより小さいなら
-								#評価値を更新
-								m.set_g(gmn)
-								#親ノードを更新
-								m.set_pointer(node)
-							
-						
-						fmn = gmn + m.get_h()
+						#親ノードを更新
+						m.set_pointer(node)
+				
+				elif m in closed:
+					if fmn < m.get_f():
+						#親ノードを更新
+						m.set_pointer(node)
 						
-						if m not in open and m not in closed:
-							#もしも、子ノードがopenにもclosedにも存在しないなら
-							#（つまり未チェックかつチェック予定にも存在しないなら）
-							#親ノードを更新
-							m.set_pointer(node)
-							
-							m.set_f(fmn)
-							open.append(m)
-							
-						if m in open and fmn < m.get_f():
-							#子ノードがチェック予定にあって評価値がfmnより低いなら
-							#評価値をfmnにする
-							m.set_f(fmn)
-							
-							#チェック予定に追加
-							open.append(m)
-							
-							#親ノードを更新
-							m.set_pointer(node)
+						#評価値をfmnにする
+						m.set_g(gmn)
+						m.set_f(fmn)
 						
-						if m in closed and fmn < m.get_f():
-							#親ノードを更新
-							m.set_pointer(node)
-							
-							#評価値をfmnにする
-							m.set_f(fmn)
-							
-							#closedにある最初のmを削除
-							closed.remove(closed.index(m))
-							
-							#チェック予定に追加
-							open.append(m)
-			
-			open.sort(key=lambda x: x.get_f())
+						#closedから削除してチェック予定に追加
+						closed.remove(m)
+						count += 1
+						key = (fmn, step, 1, count)
+						open_keys[m] = key
+						heapq.heappush(open, (key, count, m))
+				
+				else:
+					#もしも、子ノードがopenにもclosedにも存在しないなら
+					#（つまり未チェックかつチェック予定にも存在しないなら）
+					#mのコストとしてgmnを入れ、親ノードを更新
+					m.set_g(gmn)
+					m.set_pointer(node)
+					
+					m.set_f(fmn)
+					
+					#チェック予定に追加
+					count += 1
+					key = (fmn, step, 1, count)
+					open_keys[m] = key
+					heapq.heappush(open, (key, count, m))
+		
 		return success
 
 
+class Trellis:
+	"""Trellisクラス
+
+		START・和音ごとの候補ノードの層・ENDからなる層状グラフ（トレリス）を構成し、
+		動的計画法（ビタビアルゴリズム）による最短路探索を行うクラス。
+		STARTから1層目、最終層からENDへの枝のコストは0とする。
+		層の数をN、1層あたりの候補数をMとすると、探索はO(N・M・M)で終わる。
+
+		Attributes:
+			layers (List): 層ごとのノード名のリスト
+			costs (List): costs[i][j][k]はi層目のj番目のノードからi+1層目のk番目のノードへの枝のコスト
+			g (List): g[i][k]はSTARTからi層目のk番目のノードまでの最短距離
+			pointer (List): pointer[i][k]はi層目のk番目のノードの最短路上の親ノードの番号（1層目はNone）
+			keys (List): keys[i][k]はviterbiでのi層目のk番目のノードの展開順のキー
+			route (List): 最短路上の各層のノード番号
+			cost (Int): 最短路の合計コスト
+			cost_provider (function): コスト行列を設定していない層間の枝のコストを、出発側のノードごとに1行分求める関数 cost_provider(layer_id, j)
+			active (List): beamで各層に残したノード番号のリスト（展開順）
+			beam_stats (Dict): 直前のbeamでの枝刈りの集計（viterbiで探索した場合はNone）
+
+	"""
+
+	def __init__(self):
+		self.layers = []	#層ごとのノード名リスト
+		self.costs = []		#層間の枝のコスト行列
+		self.g = []			#各ノードまでの最短距離
+		self.pointer = []	#各ノードの親ノード番号
+		self.keys = []		#各ノードの展開順のキー
+		self.route = []		#最短路
+		self.cost = None	#最短路の合計コスト
+		self.cost_provider = None	#枝のコストを求める関数
+		self.active = []	#beamで残したノード番号
+		self.beam_stats = None	#beamの枝刈りの集計
+
+	def new_layer(self, names):
+		"""グラフに層を追加する
+
+			Args:
+				names (List): 層を構成するノード名のリスト
+
+			Returns:
+				layer_id (Int): 追加した層の番号
+
+		"""
+		self.layers.append(list(names))
+		return len(self.layers) - 1
+
+	def set_costs(self, layer_id, costs):
+		"""層間の枝のコストを設定する
+
+			layer_id層目とlayer_id+1層目の間の全ての枝のコストを行列で設定する
+
+			Args:
+				layer_id (Int): 枝の出発側の層の番号
+				costs (List): costs[j][k]はlayer_id層目のj番目からlayer_id+1層目のk番目への枝のコスト
+
+		"""
+		while len(self.costs) <= layer_id:
+			self.costs.append(None)
+		self.costs[layer_id] = costs
+
+	def set_cost_provider(self, provider):
+		"""枝のコストを求める関数を登録する
+
+			beamでは、set_costsでコスト行列を設定していない層間の枝のコストを、
+			残したノードから出る枝についてだけこの関数で求める。
+
+			Args:
+				provider (function): 層の番号・出発側のノード番号を受け取って、到着側の全てのノードへの枝のコストのリストを返す関数
+
+		"""
+		self.cost_provider = provider
+
+	def viterbi(self):
+		"""ビタビアルゴリズムによる最短路探索
+
+			層ごとにSTARTからの最短距離と親ノードを求め、ENDから親ノードをたどって最短路を得る。
+			
+			同じ距離になる親ノードが複数ある場合は、Search.aStarと同じものを選ぶ。
+			aStarはコストが同じノードを「発見・更新された順」に展開し、最初に展開された親ノードを採用するので、
+			この展開順を層ごとに順位付けのキー（コスト, 親の展開順位, 種別, 子の番号又は更新前のキー）として再現する。
+
+			Returns:
+				success (Bool): 探索成功したか否か
+
+		"""
+		self.g = []
+		self.pointer = []
+		self.keys = []
+		self.route = []
+		self.cost = None
+
+		if not self.has_costs():
+			return False
+
+		#1層目はSTARTからコスト0（STARTの展開で番号順に発見される）
+		g_now = [0] * len(self.layers[0])
+		keys = [(0, 0, 1, k) for k in range(len(self.layers[0]))]
+		self.g.append(g_now)
+		self.pointer.append([None] * len(self.layers[0]))
+		self.keys.append(keys)
+
+		for i in range(len(self.layers) - 1):
+			g_now, pointer_next, keys = self.forward(g_now, keys, self.costs[i])
+			self.g.append(g_now)
+			self.pointer.append(pointer_next)
+			self.keys.append(keys)
+
+		#最終層からENDへ（コスト0）：最初に展開される最終層のノードがENDの親になる
+		last = min(range(len(g_now)), key=lambda j: keys[j])
+		self.cost = g_now[last]
+
+		#ENDから親ノードをたどる
+		self.route = [last]
+		for i in range(len(self.layers) - 1, 0, -1):
+			self.route.insert(0, self.pointer[i][self.route[0]])
+
+		return True
+
+	def has_costs(self):
+		"""全ての層間の枝のコスト行列が設定されているか判定する
+
+			Returns:
+				complete (Bool): 層が1つ以上あり、全ての層間のコスト行列が設定されていればTrue
+
+		"""
+		return len(self.layers) > 0 and len(self.costs) >= len(self.layers) - 1 and None not in self.costs[:len(self.layers) - 1]
+
+	def kbest(self, k):
+		"""合計コストの小さい順にk本の経路を列挙する（遅延型のk-bestビタビ）
+
+			viterbiで求めた各ノードまでの最短路を出発点に、各ノードについて「i番目に短い経路」を
+			必要になった時に1本ずつ求める（Recursive Enumeration Algorithm）。
+			ノードごとに親ノード側の候補をヒープで管理し、次の経路は親ノードの次の経路から作るので、
+			計算量はviterbi 1回分に、列挙する経路の数×層の数に比例する分を加えたものになる。
+			
+			1本目はviterbiの最短路と一致する。コストが同じ経路は、親ノードの展開順が早いものを先に列挙する。
+			全ての層間のコスト行列が必要なので、beamやコストを設定していない層間がある場合は使えない。
+
+			Args:
+				k (Int): 列挙する経路の数
+
+			Returns:
+				paths (List): （合計コスト, 各層のノード番号のリスト）のリスト（コストの小さい順。経路がk本に満たなければ全て）
+
+		"""
+		if k < 1:
+			raise ValueError("k must be 1 or more")
+		if len(self.keys) != len(self.layers) and not self.viterbi():
+			return []
+
+		last = len(self.layers) - 1
+		#各層のノードの展開順位（同じコストの候補の順位付けに使う）
+		rank = []
+		for keys in self.keys:
+			order = sorted(range(len(keys)), key=lambda j: keys[j])
+			position = [0] * len(keys)
+			for r, j in enumerate(order):
+				position[j] = r
+			rank.append(position)
+
+		#paths[i][v]はi層目のv番目のノードまでの経路を短い順に並べたもの。各経路は（コスト, 親ノード番号, 親ノードでの順位）
+		#1本目は最短路（viterbiの結果）なので、全てのノードに最初から登録しておく
+		paths = [[[(g, pointer, 0)] for g, pointer in zip(self.g[i], self.pointer[i])] for i in range(len(self.layers))]
+		heaps = [[None] * len(layer) for layer in self.layers]
+
+		def extend(i, v):
+			"""i層目のv番目のノードまでの経路を1本追加する（追加できなければFalse）"""
+			#次の経路を作るのに必要な親ノードの経路を、まだ求めていないものまで下の層へたどる
+			chain = []
+			while i > 0:
+				chain.append((i, v))
+				_, u, r = paths[i][v][-1]
+				if len(paths[i - 1][u]) > r + 1:
+					break
+				i, v = i - 1, u
+			extended = False
+			for i, v in reversed(chain):
+				heap = heaps[i][v]
+				costs = self.costs[i - 1]
+				if heap is None:
+					#最短路の親ノード以外の親ノードの最短路を候補にする
+					pointer = paths[i][v][0][1]
+					heap = [(self.g[i - 1][u] + costs[u][v], rank[i - 1][u], 0, u) for u in range(len(self.layers[i - 1])) if u != pointer]
+					heapq.heapify(heap)
+					heaps[i][v] = heap
+				#直前に採用した候補の親ノードの、次の経路を候補に加える
+				_, u, r = paths[i][v][-1]
+				if len(paths[i - 1][u]) > r + 1:
+					heapq.heappush(heap, (paths[i - 1][u][r + 1][0] + costs[u][v], rank[i - 1][u], r + 1, u))
+				extended = len(heap) > 0
+				if extended:
+					cost, _, r, u = heapq.heappop(heap)
+					paths[i][v].append((cost, u, r))
+			return extended
+
+		#ENDの親ノードの候補（最終層からENDへの枝のコストは0）
+		end_heap = [(self.g[last][v], rank[last][v], 0, v) for v in range(len(self.layers[last]))]
+		heapq.heapify(end_heap)
+		result = []
+		while len(result) < k and len(end_heap) > 0:
+			cost, _, r, v = heapq.heappop(end_heap)
+			#ENDから親ノードとその順位をたどる
+			route = [v]
+			now = r
+			for i in range(last, 0, -1):
+				_, u, now = paths[i][route[-1]][now]
+				route.append(u)
+			route.reverse()
+			result.append((cost, route))
+			if len(paths[last][v]) > r + 1 or extend(last, v):
+				heapq.heappush(end_heap, (paths[last][v][r + 1][0], rank[last][v], r + 1, v))
+		return result
+
+	def beam(self, width):
+		"""ビームサーチによる近似最短路探索
+
+			viterbiと同じ手順で層ごとに最短距離を求めるが、2層目以降では展開順（最短距離の小さい順）の先頭からwidth個のノードだけを残し、
+			残さなかったノードから出る枝のコストは求めない。
+			（1層目のノードはSTARTからの距離がすべて0で優劣がつかないので、すべて残す）
+			このため得られる経路は最短路とは限らない。widthが層のノード数以上であればviterbiと同じ結果になる。
+
+			Args:
+				width (Int): 層ごとに残すノードの数
+
+			Returns:
+				success (Bool): 探索成功したか否か
+
+		"""
+		if width < 1:
+			raise ValueError("width must be 1 or more")
+		self.g = []
+		self.pointer = []
+		self.keys = []
+		self.route = []
+		self.cost = None
+		self.active = []
+		self.beam_stats = None
+
+		if len(self.layers) == 0:
+			return False
+		for i in range(len(self.layers) - 1):
+			if (i >= len(self.costs) or self.costs[i] is None) and self.cost_provider is None:
+				return False
+
+		#1層目はSTARTからコスト0（viterbiと同じ）
+		g_now = [0] * len(self.layers[0])
+		keys = [(0, 0, 1, k) for k in range(len(self.layers[0]))]
+		self.g.append(g_now)
+		self.pointer.append([None] * len(self.layers[0]))
+
+		evaluated = 0
+		for i in range(len(self.layers)):
+			#展開順の先頭からwidth個のノードを残す
+			active = sorted(range(len(g_now)), key=lambda j: keys[j])
+			if i > 0:
+				active = active[:width]
+			self.active.append(active)
+			if i == len(self.layers) - 1:
+				break
+
+			#残したノードから出る枝のコストだけを求める
+			if i < len(self.costs) and self.costs[i] is not None:
+				costs = [self.costs[i][j] for j in active]
+			else:
+				costs = [self.cost_provider(i, j) for j in active]
+			evaluated += len(active) * len(self.layers[i + 1])
+
+			#残したノードだけで1層分進め、親ノード番号を層の中の番号に戻す
+			g_now, pointer_next, keys = self.forward([g_now[j] for j in active], [keys[j] for j in active], costs)
+			self.g.append(g_now)
+			self.pointer.append([active[p] for p in pointer_next])
+
+		#最終層からENDへ（コスト0）：最初に展開される最終層のノードがENDの親になる
+		last = self.active[-1][0]
+		self.cost = g_now[last]
+
+		#ENDから親ノードをたどる
+		self.route = [last]
+		for i in range(len(self.layers) - 1, 0, -1):
+			self.route.insert(0, self.pointer[i][self.route[0]])
+
+		#枝刈り率は、全ての枝のうちコストを求めずに済んだ枝の割合
+		nodes = sum(len(layer) for layer in self.layers)
+		kept = sum(len(active) for active in self.active)
+		edges = sum(len(self.layers[i]) * len(self.layers[i + 1]) for i in range(len(self.layers) - 1))
+		self.beam_stats = {
+			"width": width,
+			"nodes": nodes,
+			"pruned_nodes": nodes - kept,
+			"edges": edges,
+			"evaluated_edges": evaluated,
+			"pruning_ratio": 1 - evaluated / edges if edges > 0 else 0.0,
+		}
+		return True
+
+	@staticmethod
+	def forward(g_now, keys, costs):
+		"""1層分の最短距離と親ノードを求める
+
+			ある層の各ノードまでの最短距離と展開順のキーから、次の層の各ノードまでの最短距離・親ノード・キーを求める。
+
+			Args:
+				g_now (List): 層の各ノードまでの最短距離
+				keys (List): 層の各ノードの展開順のキー
+				costs (List): costs[j][k]は層のj番目のノードから次の層のk番目のノードへの枝のコスト
+
+			Returns:
+				result (Tuple): (次の層の最短距離のリスト, 親ノード番号のリスト, キーのリスト)
+
+		"""
+		#層のノードを展開順に並べる
+		order = sorted(range(len(g_now)), key=lambda j: keys[j])
+		g_next = [None] * len(costs[0])
+		pointer_next = [None] * len(costs[0])
+		keys_next = [None] * len(costs[0])
+		for rank, j in enumerate(order):
+			for k in range(len(g_next)):
+				gmn = g_now[j] + costs[j][k]
+				if g_next[k] is None:
+					#初めて発見された
+					g_next[k] = gmn
+					pointer_next[k] = j
+					keys_next[k] = (gmn, rank, 1, k)
+				elif gmn < g_next[k]:
+					#より短い経路が見つかった
+					g_next[k] = gmn
+					pointer_next[k] = j
+					keys_next[k] = (gmn, rank, 0, keys_next[k])
+		return g_next, pointer_next, keys_next
+
+	@staticmethod
+	def backward(h_next, costs):
+		"""1層分のENDまでの最短距離と子ノードを求める
+
+			次の層の各ノードからENDまでの最短距離から、ある層の各ノードからENDまでの最短距離と、最短路上の子ノードを求める。
+			同じ距離になる子ノードが複数ある場合は、番号の小さいものを選ぶ。
+
+			Args:
+				h_next (List): 次の層の各ノードからENDまでの最短距離
+				costs (List): costs[j][k]は層のj番目のノードから次の層のk番目のノードへの枝のコスト
+
+			Returns:
+				result (Tuple): (層の各ノードからENDまでの最短距離のリスト, 子ノード番号のリスト)
+
+		"""
+		h_now = []
+		child = []
+		for row in costs:
+			best = None
+			for k, h in enumerate(h_next):
+				hmn = row[k] + h
+				if best is None or hmn < best:
+					best = hmn
+					best_k = k
+			h_now.append(best)
+			child.append(best_k)
+		return h_now, child
+
+	def get_route(self):
+		"""探索した最短路を返す
+
+			Returns:
+				route (List): 最短路上の各層のノード名のリスト（START・ENDは含まない）
+
+		"""
+		return [self.layers[i][j] for i, j in enumerate(self.route)]
+
+	def __str__(self):
+		"""クラスの文字列化処理
+		
+			最短路をSearchクラスと同じ形式で文字列表示する
+
+		"""
+		if self.cost is None:
+			return "*Route search failed."
+		result = "START(h:0)(g:0)(f:0)"
+		for i, j in enumerate(self.route):
+			result += f" <- {self.layers[i][j]}(h:0)(g:{self.g[i][j]})(f:{self.g[i][j]})"
+		result += f" <- END(h:0)(g:{self.cost})(f:{self.cost})"
+		return result + "\n *Route search was successful.*"
+
+
 # Music
 # =プロパティ
 # [chordlist] 和音クラス格納行列(Array)
-# [chordgraph] 和音探索グラフ(Search)
+# [chordgraph] 和音探索グラフ(Search又はTrellis)
 # = 動作
 # TPSの呼び出し元．
 class Music:
@@ -424,15 +946,80 @@ class Music:
 
 	音楽（コード列）を表現し、和音間距離の遷移を分析するクラス
 			
+	Args:
+		engine (str): 最短路探索に用いるエンジン（ENGINESのいずれか。省略時は"astar"）
+		lazy (Bool): 枝のコストを探索中に必要になった時に求めるか否か（astarのみ。省略時はFalse）
+		logpath (str): 分析過程を追記するログファイルのパス（Noneならログを残さない。省略時は"Test_log.txt"）
+		loglevel (str): ログの詳細度（AnalysisLog.LEVELSのいずれか。全ての枝を書き出すと分析より整形に時間がかかるので、省略時は"summary"）
+		log (AnalysisLog): 分析過程の書き出し先（指定した場合はlogpath, loglevelより優先し、closeは呼び出し側が行う）
+		profile (Bool): 和音間距離の算出処理の内訳を計測するか否か（省略時はFalse）
+		beam (Int): ビームサーチで層ごとに残す解釈の数（viterbiのみ。Noneなら厳密に探索する。省略時はNone）
+		store (str or DistanceStore): 和音間距離を保存して実行をまたいで再利用するファイルのパス又はDistanceStore（Noneなら保存しない。省略時はNone）
+		tensor (str or DistanceTensor): 語彙の和音間距離の表のファイルのパス又はDistanceTensor（Noneなら使わない。省略時はNone）
+		workers (Int): 和音間距離行列を並列に算出するプロセス数（Noneなら1つずつ順に算出する。lazy・beamでは使えない。省略時はNone）
+		quiet (Bool): explainで分析結果を画面に表示しないか否か（省略時はFalse）
+	
 	Attributes:
 		chordlist  (List): 和音列を表すリスト
-		chordgraph (Search): 和音列を分析するためのグラフ
+		chordgraph (Search or Trellis): 和音列を分析するためのグラフ
+		engine (str): 最短路探索に用いるエンジン
+		lazy (Bool): 枝のコストを探索中に必要になった時に求めるか否か
+		logpath (str): 分析過程を追記するログファイルのパス
+		loglevel (str): ログの詳細度
+		log (AnalysisLog): 呼び出し側が指定した分析過程の書き出し先（Noneならexplainごとに生成する）
+		profile (Bool): 和音間距離の算出処理の内訳を計測するか否か
+		delta_stats (Dict): 直前のexplainでの和音間距離の算出処理の内訳（計測しない場合はNone）
+		matrices (List): 直前のexplainでのi番目とi+1番目の和音の和音間距離行列のリスト（lazy・beamでは空）
+		beam (Int): ビームサーチで層ごとに残す解釈の数（Noneなら厳密に探索する）
+		beam_stats (Dict): 直前のexplainでの枝刈りの集計（Trellis.beam_stats。ビームサーチでなければNone）
+		store (str or DistanceStore): 和音間距離の保存先
+		tensor (str or DistanceTensor): 語彙の和音間距離の表
+		workers (Int): 和音間距離行列を並列に算出するプロセス数
+		quiet (Bool): explainで分析結果を画面に表示しないか否か
 	
 	"""
 
-	def __init__(self):
+	ENGINES = ["astar", "viterbi"]
+	"""ENGINES
+	
+		選択できる最短路探索エンジン
+		
+		* astar: 一般のグラフ（Search）をA*アルゴリズムで探索する
+		* viterbi: 層状グラフ（Trellis）を動的計画法で探索する。和音数に対して線形時間で終わる
+
+	"""
+
+	def __init__(self, engine="astar", lazy=False, logpath="Test_log.txt", loglevel="summary", log=None, profile=False, beam=None, store=None, tensor=None, workers=None, quiet=False):
+		if engine not in self.ENGINES:
+			raise ValueError("Unknown engine: " + str(engine))
+		if loglevel not in AnalysisLog.LEVELS:
+			raise ValueError("Unknown log level: " + str(loglevel))
+		if lazy and engine != "astar":
+			raise ValueError("Lazy edge costs are only available with the astar engine")
+		if beam is not None and engine != "viterbi":
+			raise ValueError("Beam search is only available with the viterbi engine")
+		if beam is not None and beam < 1:
+			raise ValueError("beam must be 1 or more")
+		if workers is not None and (lazy or beam is not None):
+			raise ValueError("Parallel delta matrices are not available with lazy edge costs or beam search")
+		if workers is not None and workers < 1:
+			raise ValueError("workers must be 1 or more")
 		self.chordlist = []
 		self.chordgraph = None
+		self.engine = engine
+		self.lazy = lazy
+		self.logpath = logpath
+		self.loglevel = loglevel
+		self.log = log
+		self.profile = profile
+		self.delta_stats = None
+		self.matrices = []
+		self.beam = beam
+		self.beam_stats = None
+		self.store = store
+		self.tensor = tensor
+		self.workers = workers
+		self.quiet = quiet
 	
 	# 和声進行の解釈を行う
 	# == 引数
@@ -445,7 +1032,7 @@ class Music:
 		"""和声進行の解釈を行う
 
 			コードネーム列を受け取ってTPS-ExJを用いた和音間距離の分析を行う。
-			最短路（合計和音間距離が最も小さくなる解釈）を求めた後、画面に表示する
+			最短路（合計和音間距離が最も小さくなる解釈）を求めた後、画面に表示する（quietなら表示しない）
 			
 			Args:
 				chordsheet (str): コードネーム列を表すテキスト
@@ -454,9 +1041,11 @@ class Music:
 		"""
 		#@chordlistを初期化
 		self.chordlist = []
+		self.matrices = []
 		
-		#カンマ区切りで渡された和音名列を配列に分割
-		chordlistbuf = chordsheet.split(',')
+		#カンマ区切りで渡された和音名列を配列に分割し、コードIDと正規化したコードネームに変換
+		chordids = [ChordTokenizer.intern(chordname) for chordname in chordsheet.split(',')]
+		chordlistbuf = [ChordTokenizer.get_name(chordid) for chordid in chordids]
 		
 		#全ての調パターンを生成
 		for cd in range(len(chordlistbuf)):
@@ -466,66 +1055,241 @@ class Music:
 				self.chordlist[cd].append([chordlistbuf[cd], rootpc, True])
 		
 		#ここから探索グラフの作成
-		#グラフクラス生成
-		self.chordgraph = Search()
-		
-		#グラフクラスにノードを登録し，ノード番号を記録
-		for i in range(len(self.chordlist)):
-			for j in range(len(self.chordlist[i])):
-				nodename = self.chordlist[i][j][0] + "/" + str(self.chordlist[i][j][1]) + str(self.chordlist[i][j][2])
-				self.chordlist[i][j].append(self.chordgraph.new_node(nodename, 0))
-		
-		#出発ノード・終点ノードを作成
-		startid = self.chordgraph.new_node("START",0)
-		endid = self.chordgraph.new_node("END",0)
-		
-		self.chordgraph.set_start_goal(startid,endid)
-		
-		#1つ目の和音は，すべて出発ノードとコスト0でリンク作成
-		for i in self.chordlist[0]:
-			self.chordgraph.new_branch(startid,i[3],0)
+		if self.engine == "viterbi":
+			#層状グラフクラス生成
+			self.chordgraph = Trellis()
+			
+			#和音ごとに層を登録し，Searchと同じ通し番号をノード番号として記録
+			for i in range(len(self.chordlist)):
+				nodenames = []
+				for j in range(len(self.chordlist[i])):
+					nodenames.append(self.chordlist[i][j][0] + "/" + str(self.chordlist[i][j][1]) + str(self.chordlist[i][j][2]))
+					self.chordlist[i][j].append(i * len(self.chordlist[i]) + j)
+				self.chordgraph.new_layer(nodenames)
+		else:
+			#グラフクラス生成
+			self.chordgraph = Search()
+			
+			#グラフクラスにノードを登録し，ノード番号を記録
+			for i in range(len(self.chordlist)):
+				for j in range(len(self.chordlist[i])):
+					nodename = self.chordlist[i][j][0] + "/" + str(self.chordlist[i][j][1]) + str(self.chordlist[i][j][2])
+					self.chordlist[i][j].append(self.chordgraph.new_node(nodename, 0))
+			
+			#出発ノード・終点ノードを作成
+			startid = self.chordgraph.new_node("START",0)
+			endid = self.chordgraph.new_node("END",0)
+			
+			self.chordgraph.set_start_goal(startid,endid)
+			
+			#1つ目の和音は，すべて出発ノードとコスト0でリンク作成
+			for i in self.chordlist[0]:
+				self.chordgraph.new_branch(startid,i[3],0)
+			
+			
+			#最後の和音は，すべて終点ノードとコスト0でリンク作成
+			for i in self.chordlist[len(self.chordlist) -1]:
+				self.chordgraph.new_branch(i[3],endid,0)
 		
+		#各枝のコストを計算しながらリンクを作成
 		
-		#最後の和音は，すべて終点ノードとコスト0でリンク作成
-		for i in self.chordlist[len(self.chordlist) -1]:
-			self.chordgraph.new_branch(i[3],endid,0)
+		from Delta_chord_calculator import Delta_Chord_calculator
+		#内訳の集計はexplainごとに新しく始める
+		tps_cal = Delta_Chord_calculator(self.profile)
 		
-		#各枝のコストを計算しながらリンクを作成
+		#保存先はexplainの間だけ設定する（パスが指定された場合はプロセス内で接続を使い回す）
+		store = self.store
+		if isinstance(store, str):
+			from Distance_store import DistanceStore
+			store = DistanceStore.shared(store)
+		previous_store = Delta_Chord_calculator.get_store()
+		if store is not None:
+			Delta_Chord_calculator.set_store(store)
 		
-		tps_cal = Delta_Chord_calculator()
+		#語彙の表も同様（表はファイルをメモリマップするので、同じファイルを開いたプロセス間でメモリを共有する）
+		tensor = self.tensor
+		if isinstance(tensor, str):
+			from Distance_tensor import DistanceTensor
+			tensor = DistanceTensor.shared(tensor)
+		previous_tensor = Delta_Chord_calculator.get_tensor()
+		if tensor is not None:
+			Delta_Chord_calculator.set_tensor(tensor)
 		
-		with open("Test_log.txt", 'a') as logfile:
-			logfile.write("\n @@ " + str(chordsheet) + " @@@\n")
-			print("\n@@@ " + str(chordsheet) + " @@@\n")
+		#ログの整形と書き込みはAnalysisLogの書き込みスレッドが行う
+		log = self.log if self.log is not None else AnalysisLog(self.logpath, self.loglevel)
+		try:
+			log.summary("\n @@ " + str(chordsheet) + " @@@\n")
+			if not self.quiet:
+				print("\n@@@ " + str(chordsheet) + " @@@\n")
 		
-			#(@chordlist.length) -1回繰り返し
-			for i in range(len(self.chordlist) - 1):
-				#i番目の和音候補配列の全てから
-				for j in self.chordlist[i]:
-					#i+1番目の和音候補配列の全てへ
-					for k in self.chordlist[i+1]:
-						#Chordクラスの生成
-						x = Chord(j[0])
-						x.set_key(j[1], j[2])
-						
-						y = Chord(k[0])
-						y.set_key(k[1], k[2])
-					
-						distance = tps_cal.calc_chord_delta(x, y)
-						distance_ary = [tps_cal.get_last_delta_chord(), tps_cal.get_last_delta_region(), tps_cal.get_last_delta_basicspace()]
-						
-						#枝作成
-						self.chordgraph.new_branch(j[3], k[3], distance)
+			#保存先にある和音間距離行列は、全ての遷移の分をまとめて読み込んでおく
+			Delta_Chord_calculator.prefetch_matrices(zip(chordids, chordids[1:]))
+			
+			if self.lazy:
+				#枝は探索中に展開したノードからだけ張り、そのノードから出る24本の枝のコストを1行分まとめて求める
+				log_edges = log.is_enabled("full")
+				
+				def provide_children(parent_id):
+					#ノードIDから和音候補を求める（ノードは和音ごとに24個ずつ順に登録され、最後にSTART・ENDが続く）
+					i, a = divmod(parent_id, len(KEY_LIST))
+					if i + 1 >= len(self.chordlist):
+						return []
+					j = self.chordlist[i][a]
+					row = tps_cal.calc_chord_delta_row(chordids[i], (j[1], j[2]), chordids[i+1])
+					if log_edges:
+						for k, cell in zip(self.chordlist[i+1], row):
+							log.edge(j, cell, k)
+					return [(k[3], cell[0]) for k, cell in zip(self.chordlist[i+1], row)]
+				
+				self.chordgraph.set_child_provider(provide_children)
+			elif self.beam is not None:
+				#ビームサーチで残した解釈から出る枝のコストだけを、探索中に解釈ごとに1行分まとめて求める
+				log_edges = log.is_enabled("full")
+				
+				def provide_layer_cost(i, a):
+					j = self.chordlist[i][a]
+					row = tps_cal.calc_chord_delta_row(chordids[i], (j[1], j[2]), chordids[i+1])
+					if log_edges:
+						for k, cell in zip(self.chordlist[i+1], row):
+							log.edge(j, cell, k)
+					return [cell[0] for cell in row]
+				
+				self.chordgraph.set_cost_provider(provide_layer_cost)
+			else:
+				#並列に算出する場合は、キャッシュに無い遷移の行列を先にワーカーでまとめて求めておく
+				parallel = {}
+				if self.workers is not None:
+					parallel = Delta_Chord_calculator.calc_matrices_parallel(zip(chordids, chordids[1:]), self.workers, tps_cal.profile)
+				
+				#(@chordlist.length) -1回繰り返し
+				for i in range(len(self.chordlist) - 1):
+					#i番目とi+1番目の和音の24調×24調の和音間距離行列を求める（同じコード進行はキャッシュから得られる）
+					matrix = parallel.get((chordids[i], chordids[i+1]))
+					if matrix is None:
+						matrix = tps_cal.calc_chord_delta_matrix(chordids[i], chordids[i+1])
+					self.matrices.append(matrix)
+				
+					if self.engine == "viterbi":
+						#層間のコスト行列をまとめて設定
+						self.chordgraph.set_costs(i, [[cell[0] for cell in row] for row in matrix])
+					else:
+						#i番目の和音候補配列の全てから
+						for a, j in enumerate(self.chordlist[i]):
+							#i+1番目の和音候補配列の全てへ
+							for b, k in enumerate(self.chordlist[i+1]):
+								#枝作成
+								self.chordgraph.new_branch(j[3], k[3], matrix[a][b][0])
 					
-						logfile.write(str(j) + "\t" + str(distance) + "(C:" + str(distance_ary[0]) + " R:" + str(distance_ary[1]) + " B:" + str(distance_ary[2]) + ")\t" + str(k) + "\n")
-				logfile.write("\n")
+					#全ての枝の和音間距離の内訳は行列ごとログに渡す
+					log.transition(self.chordlist[i], self.chordlist[i+1], matrix)
 				
 			
-			self.chordgraph.aStar()
+			if self.beam is not None:
+				self.chordgraph.beam(self.beam)
+			elif self.engine == "viterbi":
+				self.chordgraph.viterbi()
+			else:
+				self.chordgraph.aStar()
+			self.beam_stats = self.chordgraph.beam_stats if self.beam is not None else None
 			
-			logfile.write(str(self.chordgraph))
-			print(str(self.chordgraph))
+			result = str(self.chordgraph)
+			log.summary(result)
+			if not self.quiet:
+				print(result)
+			self.delta_stats = tps_cal.get_stats()
+		finally:
+			if tensor is not None:
+				Delta_Chord_calculator.set_tensor(previous_tensor)
+			if store is not None:
+				#新しく算出した和音間距離をまとめて書き出す
+				Delta_Chord_calculator.set_store(previous_store)
+				store.flush()
+			if self.log is None:
+				log.close()
 		
+	def get_interpretation(self):
+		"""最短路となる和声進行の解釈を返す
+
+			explainで求めた最短路に沿って、各和音の解釈（調）を返す。
+			探索に失敗している場合は空のリストを返す。
+
+			Returns:
+				interpretation (List): 和音ごとの[コードネーム, 調のルート, 長調/短調フラグ]のリスト
+
+		"""
+		if self.engine == "viterbi":
+			route = self.chordgraph.route
+		else:
+			#STARTとENDを除き、ノードIDから和音候補の番号を求める
+			route = [self.chordgraph.node_ids[node] % len(KEY_LIST) for node in self.chordgraph.get_route()[1:-1]]
+		return [self.chordlist[i][j][:3] for i, j in enumerate(route)]
+
+	def get_kbest(self, k):
+		"""合計和音間距離の小さい順にk通りの和声進行の解釈を返す
+
+			explainで求めた和音間距離行列の層状グラフから、Trellis.kbestでk本の経路を列挙する。
+			1通り目はget_interpretationと同じ解釈になる。
+			lazy・beamでは全ての枝の和音間距離を求めていないので使えない。
+
+			Args:
+				k (Int): 列挙する解釈の数
+
+			Returns:
+				interpretations (List): （合計和音間距離, 解釈, 枝ごとの内訳）のリスト（合計和音間距離の小さい順）。
+					解釈はget_interpretationと同じ形式、枝ごとの内訳はi番目とi+1番目の和音の間の
+					(和音間距離, コード距離, 調間距離, ベーシックスペース距離)のリスト
+
+		"""
+		if self.lazy or self.beam is not None:
+			raise ValueError("K-best interpretations are not available with lazy edge costs or beam search")
+		if self.engine == "viterbi":
+			trellis = self.chordgraph
+		else:
+			#A*の探索グラフと同じ層状グラフを、記録しておいた和音間距離行列から作る
+			trellis = Trellis()
+			for candidates in self.chordlist:
+				trellis.new_layer([j[0] + "/" + str(j[1]) + str(j[2]) for j in candidates])
+			for i, matrix in enumerate(self.matrices):
+				trellis.set_costs(i, [[cell[0] for cell in row] for row in matrix])
+
+		interpretations = []
+		for cost, route in trellis.kbest(k):
+			interpretation = [self.chordlist[i][j][:3] for i, j in enumerate(route)]
+			edges = [self.matrices[i][route[i]][route[i+1]] for i in range(len(route) - 1)]
+			interpretations.append((cost, interpretation, edges))
+		return interpretations
+
+	def get_delta_stats(self):
+		"""直前のexplainでの和音間距離の算出処理の内訳を返す
+
+			Returns:
+				stats (Dict): Delta_Chord_calculator.get_statsの結果（profile=Falseの場合はNone）
+
+		"""
+		return self.delta_stats
+
+	def get_beam_stats(self):
+		"""直前のexplainでの枝刈りの集計を返す
+
+			Returns:
+				stats (Dict): Trellis.beam_statsの結果（ビームサーチでなければNone）
+
+		"""
+		return self.beam_stats
+
+	def get_cost(self):
+		"""最短路の合計和音間距離を返す
+
+			Returns:
+				cost (Int): 合計和音間距離（探索に失敗している場合はNone）
+
+		"""
+		if self.engine == "viterbi":
+			return self.chordgraph.cost
+		if len(self.chordgraph.get_route()) == 0:
+			return None
+		return self.chordgraph.goal.get_g()
+
 	def __str__(self):
 		"""クラスの文字列化処理
 		
@@ -536,5 +1300,923 @@ class Music:
 
 
 
-test_music = Music()
-test_music.explain("A m 7,D m 7,G 7,C maj7,F maj7,B m 7 -5,E 7,A m 7,A 7,D m 7,G 7,C maj7,A 7,D m 7,G 7,C maj7,B m 7 -5,E 7")
+class MusicStream:
+	"""MusicStreamクラス
+
+	和音を1つずつ受け取りながら和声進行の解釈を行うクラス（固定遅延のビタビアルゴリズム）
+	
+	Music.explainのようにコードネーム列の全体を待たずに、和音を受け取るたびに層状グラフの最新の層だけを伸ばす。
+	最新の和音からlag個以上前の和音は、その時点での最短路に沿って解釈を確定して返す。
+	保持するのは直近lag+1層分の親ノードのみなので、1和音あたりの計算量とメモリ使用量は曲の長さによらない。
+	lagが曲の長さ以上であれば、flush後に得られる解釈はMusic(engine="viterbi")と一致する。
+	
+	Args:
+		lag (Int): 解釈を確定するまでに待つ和音の数
+	
+	Attributes:
+		lag (Int): 解釈を確定するまでに待つ和音の数
+		position (Int): これまでに受け取った和音の数
+		window (collections.deque): 未確定の和音ごとの（通し番号, 正規化したコードネーム, 親ノード番号のリスト）
+		last_chordid (int): 最新の和音のコードID
+		g (List): 最新の和音の各候補までの最短距離
+		keys (List): 最新の和音の各候補の展開順のキー
+	
+	"""
+
+	def __init__(self, lag=4):
+		if lag < 0:
+			raise ValueError("lag must be 0 or more")
+		self.lag = lag
+		from Delta_chord_calculator import Delta_Chord_calculator
+		self.tps_cal = Delta_Chord_calculator()
+		self.reset()
+
+	def reset(self):
+		"""状態を初期化する
+
+			受け取った和音と未確定の解釈をすべて破棄する
+
+		"""
+		self.position = 0
+		self.window = deque()
+		self.last_chordid = None
+		self.g = None
+		self.keys = None
+
+	def push(self, chordname):
+		"""和音を1つ受け取る
+
+			最新の層を追加して最短距離を更新し、lag個以上前になった和音の解釈を確定して返す。
+
+			Args:
+				chordname (str): コードネーム
+
+			Returns:
+				committed (List): 確定した和音ごとの（通し番号, コードネーム, 調のルート, 長調/短調フラグ）のリスト
+
+		"""
+		chordid = ChordTokenizer.intern(chordname)
+		if self.g is None:
+			#最初の和音はSTARTからコスト0
+			self.g = [0] * len(KEY_LIST)
+			self.keys = [(0, 0, 1, k) for k in range(len(KEY_LIST))]
+			pointer = [None] * len(KEY_LIST)
+		else:
+			#直前の和音との和音間距離行列から最新の層の最短距離を求める
+			matrix = self.tps_cal.calc_chord_delta_matrix(self.last_chordid, chordid)
+			costs = [[cell[0] for cell in row] for row in matrix]
+			self.g, pointer, self.keys = Trellis.forward(self.g, self.keys, costs)
+		self.window.append((self.position, ChordTokenizer.get_name(chordid), pointer))
+		self.last_chordid = chordid
+		self.position += 1
+
+		committed = []
+		if len(self.window) > self.lag:
+			committed.append(self.commit())
+		return committed
+
+	def flush(self):
+		"""未確定の和音の解釈をすべて確定する
+
+			曲の終わりに呼び出す。確定した後は状態を初期化する。
+
+			Returns:
+				committed (List): 確定した和音ごとの（通し番号, コードネーム, 調のルート, 長調/短調フラグ）のリスト
+
+		"""
+		committed = []
+		while len(self.window) > 0:
+			committed.append(self.commit())
+		self.reset()
+		return committed
+
+	def commit(self):
+		"""最も古い未確定の和音の解釈を確定する
+
+			最新の層で最初に展開される（最短距離の）ノードから親ノードをたどり、最も古い未確定の和音の候補を求める。
+
+			Returns:
+				committed (Tuple): （通し番号, コードネーム, 調のルート, 長調/短調フラグ）
+
+		"""
+		now = min(range(len(self.keys)), key=lambda k: self.keys[k])
+		for i in range(len(self.window) - 1, 0, -1):
+			now = self.window[i][2][now]
+		position, chordname, _ = self.window.popleft()
+		root, is_minor = KEY_LIST[now]
+		return (position, chordname, root, is_minor)
+
+
+class TransitionNode:
+	"""TransitionNodeクラス
+
+	TransitionTreeの節点。葉は1つの遷移の調×調のコスト表を、内部の節点は子の遷移を続けてたどった時の最短距離の表（min-plus積）を持つ
+
+	Attributes:
+		left (TransitionNode): 前半の遷移の部分木（葉ならNone）
+		right (TransitionNode): 後半の遷移の部分木（葉ならNone）
+		size (Int): 部分木に含まれる遷移の数
+		costs: costs[j][k]は部分木の最初の和音のj番目の候補から最後の和音のk番目の候補までの最短距離
+		split: split[j][k]はその最短路が前半と後半の境目の和音で通る候補の番号（葉ならNone）
+
+	"""
+
+	__slots__ = ("left", "right", "size", "costs", "split")
+
+	def __init__(self, costs=None):
+		self.left = None
+		self.right = None
+		self.size = 1
+		self.costs = costs
+		self.split = None
+
+
+class TransitionTree:
+	"""TransitionTreeクラス
+
+	遷移（隣り合う和音の間の調×調のコスト表）の列を葉に持つ平衡二分木。
+	内部の節点には、子の2つの表のmin-plus積（前半の最初の和音から後半の最後の和音までの最短距離）を保持する。
+
+	1つの遷移の変更・挿入・削除で求め直す積は、葉から根までの節点の数（O(log N)）だけで、
+	根の表の最小値が曲全体の最短距離になる。挿入・削除で偏った部分木は作り直す（重み平衡、償却O(log N)）。
+	NumPyがインストールされていれば積を配列演算で求め、無ければ同じ結果を返す純Python実装で求める。
+
+	Args:
+		costs (List): 遷移ごとの調×調のコスト表のリスト
+
+	Attributes:
+		root (TransitionNode): 根（遷移が無ければNone）
+		products (Int): これまでに求めたmin-plus積の数
+
+	"""
+
+	BALANCE = 0.7
+	"""BALANCE
+
+		部分木の大きさに対する、片方の子の部分木の大きさの上限の比（超えたら部分木を作り直す）
+
+	"""
+
+	def __init__(self, costs=()):
+		from Basicspace_kernel import load_numpy
+		self.np = load_numpy()
+		self.products = 0
+		self.root = self.build([TransitionNode(self.to_table(table)) for table in costs])
+
+	def __len__(self):
+		return 0 if self.root is None else self.root.size
+
+	def to_table(self, costs):
+		"""調×調のコスト表を、積を求める形式（NumPyの配列又はリストのリスト）に変換する
+
+		"""
+		if self.np is not None:
+			return self.np.array(costs, dtype=self.np.int32)
+		return [list(row) for row in costs]
+
+	def multiply(self, node):
+		"""節点の表を2つの子の表のmin-plus積として求め直す（同じ最短距離なら、境目の候補は番号の小さいものを選ぶ）
+
+		"""
+		left = node.left.costs
+		right = node.right.costs
+		if self.np is not None:
+			sums = left[:, :, None] + right[None, :, :]
+			node.split = sums.argmin(axis=1).astype(self.np.int8)
+			node.costs = sums.min(axis=1)
+		else:
+			columns = list(zip(*right))
+			node.costs = []
+			node.split = []
+			for row in left:
+				cost_row = []
+				split_row = []
+				for column in columns:
+					sums = [a + b for a, b in zip(row, column)]
+					minimum = min(sums)
+					cost_row.append(minimum)
+					split_row.append(sums.index(minimum))
+				node.costs.append(cost_row)
+				node.split.append(split_row)
+		node.size = node.left.size + node.right.size
+		self.products += 1
+
+	def build(self, leaves):
+		"""葉の列から平衡した部分木を作る
+
+			Args:
+				leaves (List): 葉（TransitionNode）のリスト
+
+			Returns:
+				node (TransitionNode): 部分木の根（葉が無ければNone）
+
+		"""
+		if len(leaves) == 0:
+			return None
+		if len(leaves) == 1:
+			return leaves[0]
+		middle = len(leaves) // 2
+		node = TransitionNode()
+		node.left = self.build(leaves[:middle])
+		node.right = self.build(leaves[middle:])
+		self.multiply(node)
+		return node
+
+	def path(self, index):
+		"""根からindex番目の遷移の葉までの節点のリストを返す
+
+		"""
+		node = self.root
+		path = [node]
+		while node.left is not None:
+			if index < node.left.size:
+				node = node.left
+			else:
+				index -= node.left.size
+				node = node.right
+			path.append(node)
+		return path
+
+	def update(self, path):
+		"""子が変わった節点の表を、葉に近い方から求め直し、偏った部分木があれば作り直す
+
+			Args:
+				path (List): 子が変わった節点のリスト（根に近い順）
+
+		"""
+		for node in reversed(path):
+			self.multiply(node)
+		#最も根に近い偏った部分木だけを作り直せば、その下の部分木も平衡する
+		for node in path:
+			if node.size > 2 and max(node.left.size, node.right.size) > self.BALANCE * node.size:
+				leaves = []
+				stack = [node]
+				while len(stack) > 0:
+					current = stack.pop()
+					if current.left is None:
+						leaves.append(current)
+					else:
+						stack.append(current.right)
+						stack.append(current.left)
+				rebuilt = self.build(leaves)
+				node.left, node.right, node.costs, node.split = rebuilt.left, rebuilt.right, rebuilt.costs, rebuilt.split
+				break
+
+	def replace(self, changes):
+		"""遷移のコスト表を置き換える（複数の遷移に共通する祖先の表は1度だけ求め直す）
+
+			Args:
+				changes (Dict): 遷移の番号 -> 調×調のコスト表
+
+		"""
+		ancestors = {}
+		for index, costs in changes.items():
+			path = self.path(index)
+			path[-1].costs = self.to_table(costs)
+			for depth, node in enumerate(path[:-1]):
+				ancestors[id(node)] = (depth, node)
+		self.update([node for depth, node in sorted(ancestors.values(), key=lambda item: item[0])])
+
+	def insert(self, index, costs):
+		"""index番目の位置に遷移を挿入する（遷移の数と同じなら末尾に追加する）
+
+		"""
+		leaf = TransitionNode(self.to_table(costs))
+		if self.root is None:
+			self.root = leaf
+			return
+		#挿入する位置の葉（末尾なら最後の葉）を、その葉と新しい葉を子に持つ節点に置き換える
+		path = self.path(min(index, len(self) - 1))
+		node = path[-1]
+		old = TransitionNode(node.costs)
+		node.left, node.right = (leaf, old) if index < len(self) else (old, leaf)
+		self.update(path)
+
+	def delete(self, index):
+		"""index番目の遷移を削除する
+
+		"""
+		path = self.path(index)
+		if len(path) == 1:
+			self.root = None
+			return
+		#削除する葉の親を、もう一方の子で置き換える
+		parent = path[-2]
+		sibling = parent.right if parent.left is path[-1] else parent.left
+		parent.left, parent.right, parent.size, parent.costs, parent.split = sibling.left, sibling.right, sibling.size, sibling.costs, sibling.split
+		self.update(path[:-2])
+
+	def get_best(self):
+		"""曲全体の最短距離と、その最短路の最初と最後の和音の候補の番号を返す
+
+			Returns:
+				best (Tuple): (最短距離, 最初の和音の候補の番号, 最後の和音の候補の番号)（同じ最短距離なら番号の小さいもの）
+
+		"""
+		costs = self.root.costs
+		if self.np is not None:
+			first, last = divmod(int(costs.argmin()), len(KEY_LIST))
+			return (int(costs[first, last]), first, last)
+		return min((cost, first, last) for first, row in enumerate(costs) for last, cost in enumerate(row))
+
+	def trace(self, first, last):
+		"""最初と最後の和音の候補を結ぶ最短路上の、各和音の候補の番号を返す（遷移の数に比例する時間がかかる）
+
+			Args:
+				first (Int): 最初の和音の候補の番号
+				last (Int): 最後の和音の候補の番号
+
+			Returns:
+				route (List): 各和音の候補の番号（遷移の数+1個）
+
+		"""
+		route = [first]
+		stack = [(self.root, first, last)]
+		while len(stack) > 0:
+			node, a, b = stack.pop()
+			if node.left is None:
+				route.append(b)
+			else:
+				m = int(node.split[a][b])
+				stack.append((node.right, m, b))
+				stack.append((node.left, a, m))
+		return route
+
+
+class MusicSession:
+	"""MusicSessionクラス
+
+	コードネーム列を保持し、和音の変更・挿入・削除のたびに最短路（和声進行の解釈）の合計和音間距離を部分的に求め直すクラス（リードシートの編集向け）
+	
+	和音間距離行列と、遷移のコスト表を葉に持つTransitionTree（部分区間ごとの最短距離の表）を保持しておく。
+	1つの和音を変更すると、変わるのはその前後の2つの遷移の和音間距離行列だけなので、
+	その2つだけを求め直し、木の中で2つの葉から根までの表（O(log N)個のmin-plus積）だけを求め直す。
+	このため1回の編集の処理時間は、編集する位置によらず曲の長さの対数程度で増える。
+	最短路（解釈の一覧）は編集のたびには求めず、get_interpretation・get_routeで必要になった時に曲の長さに比例する時間で求めて、次の編集まで保持する。
+	
+	合計和音間距離は常にMusic.explainと一致する。合計和音間距離が同じ解釈が複数ある場合は、Music.explainと異なる解釈を返すことがある
+	（どちらも合計和音間距離は同じ。compare_sessionで確かめられる）。
+	
+	Args:
+		chordsheet (str): 最初のコードネーム列を表すテキスト（Noneなら空）
+	
+	Attributes:
+		chordids (List): 和音ごとのコードID
+		matrices (List): i番目とi+1番目の和音の和音間距離行列のリスト
+		tree (TransitionTree): matricesの和音間距離を葉に持つ木
+		best (Tuple): 最短路の最初と最後の和音の候補の番号（和音が無ければNone）
+		route (List): 最短路上の各和音の候補の番号（get_routeで求めるまではNone）
+		cost (Int): 最短路の合計和音間距離（和音が無ければNone）
+		update_stats (Dict): 直前の更新で求め直した和音間距離行列の数（"matrices"）・min-plus積の数（"products"）・処理時間[秒]（"seconds"）
+	
+	"""
+
+	def __init__(self, chordsheet=None):
+		from Delta_chord_calculator import Delta_Chord_calculator
+		self.tps_cal = Delta_Chord_calculator()
+		self.load(chordsheet)
+
+	def load(self, chordsheet):
+		"""コードネーム列全体を読み込んで最短路の合計和音間距離を求める
+
+			Args:
+				chordsheet (str): コードネーム列を表すテキスト（Noneなら空）
+
+		"""
+		start = time.perf_counter()
+		self.chordids = [] if chordsheet is None else [ChordTokenizer.intern(chordname) for chordname in chordsheet.split(',')]
+		self.matrices = [self.tps_cal.calc_chord_delta_matrix(self.chordids[i], self.chordids[i+1]) for i in range(len(self.chordids) - 1)]
+		self.tree = TransitionTree([self.get_costs(i) for i in range(len(self.matrices))])
+		self.update_stats = {"matrices": len(self.matrices), "products": self.tree.products}
+		self.repair(start)
+
+	def edit(self, position, chordname):
+		"""和音を1つ変更する
+
+			Args:
+				position (Int): 変更する和音の番号
+				chordname (str): 新しいコードネーム
+
+		"""
+		start = time.perf_counter()
+		if not 0 <= position < len(self.chordids):
+			raise IndexError("position out of range")
+		self.chordids[position] = ChordTokenizer.intern(chordname)
+		products = self.tree.products
+		self.update_stats = {"matrices": self.update_matrices(position - 1, position + 1)}
+		self.update_stats["products"] = self.tree.products - products
+		self.repair(start)
+
+	def insert(self, position, chordname):
+		"""和音を1つ挿入する
+
+			Args:
+				position (Int): 挿入する位置（挿入した和音の番号。和音の数と同じなら末尾に追加する）
+				chordname (str): 挿入するコードネーム
+
+		"""
+		start = time.perf_counter()
+		if not 0 <= position <= len(self.chordids):
+			raise IndexError("position out of range")
+		self.chordids.insert(position, ChordTokenizer.intern(chordname))
+		products = self.tree.products
+		count = 0
+		if len(self.chordids) > 1:
+			#挿入した和音の前の遷移（先頭に挿入した場合は後ろの遷移）を追加し、残りの後ろの遷移は求め直す
+			added = max(position - 1, 0)
+			self.matrices.insert(added, self.tps_cal.calc_chord_delta_matrix(self.chordids[added], self.chordids[added+1]))
+			self.tree.insert(added, self.get_costs(added))
+			count = 1 + self.update_matrices(added + 1, position + 1)
+		self.update_stats = {"matrices": count, "products": self.tree.products - products}
+		self.repair(start)
+
+	def delete(self, position):
+		"""和音を1つ削除する
+
+			Args:
+				position (Int): 削除する和音の番号
+
+		"""
+		start = time.perf_counter()
+		if not 0 <= position < len(self.chordids):
+			raise IndexError("position out of range")
+		del self.chordids[position]
+		products = self.tree.products
+		#削除した和音の前後の2つの遷移を、前後の和音を直接結ぶ1つの遷移に置き換える
+		if len(self.matrices) > 0:
+			removed = max(position - 1, 0)
+			del self.matrices[removed]
+			self.tree.delete(removed)
+		self.update_stats = {"matrices": self.update_matrices(position - 1, position)}
+		self.update_stats["products"] = self.tree.products - products
+		self.repair(start)
+
+	def get_costs(self, i):
+		"""i番目の遷移の調×調のコスト表（和音間距離）を返す
+
+		"""
+		return [[cell[0] for cell in row] for row in self.matrices[i]]
+
+	def update_matrices(self, first, last):
+		"""first番目からlast番目までの和音の間の遷移の和音間距離行列を求め直し、木の葉を置き換える
+
+			Args:
+				first (Int): 最初の和音の番号（範囲外の部分は無視する）
+				last (Int): 最後の和音の番号（範囲外の部分は無視する）
+
+			Returns:
+				count (Int): 求め直した和音間距離行列の数
+
+		"""
+		changes = {}
+		for i in range(max(first, 0), min(last, len(self.chordids) - 1)):
+			self.matrices[i] = self.tps_cal.calc_chord_delta_matrix(self.chordids[i], self.chordids[i+1])
+			changes[i] = self.get_costs(i)
+		if len(changes) > 0:
+			self.tree.replace(changes)
+		return len(changes)
+
+	def repair(self, start=None):
+		"""木の根の表から、最短路の合計和音間距離と最初と最後の和音の候補を求め直す
+
+			最短路はたどらずに、最初と最後の和音の候補（best）だけを記録する（get_routeで求める）。
+
+			Args:
+				start (float): 更新を始めた時刻（update_statsの処理時間に使う。Noneなら今）
+
+		"""
+		if start is None:
+			start = time.perf_counter()
+		self.route = None
+		if len(self.chordids) == 0:
+			self.best = None
+			self.cost = None
+		elif len(self.chordids) == 1:
+			#遷移が無ければ、どの候補も合計和音間距離は0
+			self.best = (0, 0)
+			self.cost = 0
+		else:
+			self.cost, first, last = self.tree.get_best()
+			self.best = (first, last)
+		self.update_stats["seconds"] = time.perf_counter() - start
+
+	def get_route(self):
+		"""最短路上の各和音の候補の番号を返す
+
+			最初と最後の和音の候補から、木の各節点で境目の候補をたどって求め、次の編集まで保持する。
+
+			Returns:
+				route (List): 最短路上の各和音の候補の番号（和音が無ければ空のリスト）
+
+		"""
+		if self.route is None:
+			if self.best is None:
+				self.route = []
+			elif len(self.chordids) == 1:
+				self.route = [self.best[0]]
+			else:
+				self.route = self.tree.trace(*self.best)
+		return self.route
+
+	def get_chordsheet(self):
+		"""現在のコードネーム列を返す
+
+			Returns:
+				chordsheet (str): コードネーム列を表すテキスト（正規化したコードネームのカンマ区切り）
+
+		"""
+		return ",".join(ChordTokenizer.get_name(chordid) for chordid in self.chordids)
+
+	def get_interpretation(self):
+		"""最短路となる和声進行の解釈を返す
+
+			Returns:
+				interpretation (List): 和音ごとの[コードネーム, 調のルート, 長調/短調フラグ]のリスト（Music.get_interpretationと同じ形式）
+
+		"""
+		return [[ChordTokenizer.get_name(self.chordids[i]), KEY_LIST[k][0], KEY_LIST[k][1]] for i, k in enumerate(self.get_route())]
+
+	def get_cost(self):
+		"""最短路の合計和音間距離を返す
+
+			Returns:
+				cost (Int): 合計和音間距離（和音が無ければNone）
+
+		"""
+		return self.cost
+
+	def get_update_stats(self):
+		"""直前の更新で求め直した量を返す
+
+			Returns:
+				stats (Dict): update_statsの内容
+
+		"""
+		return self.update_stats
+
+
+def _explain_sheet(task):
+	"""プロセスプールのワーカーで1つのコードネーム列を分析する
+
+		和音間距離のキャッシュはクラス属性なので、同じワーカーが処理する後続の和音列でもそのまま使われる。
+
+		Args:
+			task (Tuple): （コードネーム列, 最短路探索エンジン, 和音間距離の保存先のパス, 語彙の和音間距離の表のパス）
+
+		Returns:
+			result (Tuple): （解釈, 合計和音間距離, ワーカーのプロセスID, 処理時間[秒], 和音数）
+
+	"""
+	chordsheet, engine, store, tensor = task
+	start = time.perf_counter()
+	music = Music(engine, logpath=None, store=store, tensor=tensor, quiet=True)
+	music.explain(chordsheet)
+	return (music.get_interpretation(), music.get_cost(), os.getpid(), time.perf_counter() - start, len(music.chordlist))
+
+
+class MusicCorpus:
+	"""MusicCorpusクラス
+
+	多数のコードネーム列（リードシートのコーパス）を、プロセスプールで並列に分析するクラス
+	
+	コードネーム列はchunksize個ずつまとめてワーカーに渡される。
+	ワーカーのプロセスはcloseするまで使い回すので、各ワーカーの和音間距離のキャッシュは分析をまたいで保たれる。
+	
+	Args:
+		workers (Int): ワーカーのプロセス数（Noneならコア数）
+		chunksize (Int): 1度にワーカーへ渡すコードネーム列の数
+		engine (str): 最短路探索に用いるエンジン（Music.ENGINESのいずれか）
+		store (str): ワーカーが共有する和音間距離の保存先のパス（Noneなら保存しない）
+		tensor (str): ワーカーが共有する語彙の和音間距離の表のパス（Noneなら使わない）
+	
+	Attributes:
+		workers (Int): ワーカーのプロセス数
+		chunksize (Int): 1度にワーカーへ渡すコードネーム列の数
+		engine (str): 最短路探索に用いるエンジン
+		store (str): ワーカーが共有する和音間距離の保存先のパス
+		tensor (str): ワーカーが共有する語彙の和音間距離の表のパス
+		stats (Dict): 直近のexplain_allにおけるワーカー（プロセスID）ごとの処理統計
+		elapsed (float): 直近のexplain_allの経過時間[秒]
+	
+	"""
+
+	def __init__(self, workers=None, chunksize=8, engine="astar", store=None, tensor=None):
+		if engine not in Music.ENGINES:
+			raise ValueError("Unknown engine: " + str(engine))
+		self.workers = workers
+		self.chunksize = chunksize
+		self.engine = engine
+		self.store = store
+		self.tensor = tensor
+		self.stats = {}
+		self.elapsed = None
+		self.executor = None
+
+	def explain_all(self, chordsheets):
+		"""複数のコードネーム列を並列に分析する
+
+			Args:
+				chordsheets (List): コードネーム列を表すテキストのリスト
+
+			Returns:
+				results (List): 入力と同じ順序の（解釈, 合計和音間距離）のリスト
+
+		"""
+		if self.executor is None:
+			from concurrent.futures import ProcessPoolExecutor
+			self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+		start = time.perf_counter()
+		results = []
+		self.stats = {}
+		tasks = [(chordsheet, self.engine, self.store, self.tensor) for chordsheet in chordsheets]
+		for interpretation, cost, pid, seconds, chords in self.executor.map(_explain_sheet, tasks, chunksize=self.chunksize):
+			results.append((interpretation, cost))
+
+			#ワーカーごとの処理統計を集計する
+			stat = self.stats.setdefault(pid, {"sheets": 0, "chords": 0, "seconds": 0.0})
+			stat["sheets"] += 1
+			stat["chords"] += chords
+			stat["seconds"] += seconds
+		self.elapsed = time.perf_counter() - start
+
+		for stat in self.stats.values():
+			stat["sheets_per_sec"] = stat["sheets"] / stat["seconds"] if stat["seconds"] > 0 else 0.0
+			stat["chords_per_sec"] = stat["chords"] / stat["seconds"] if stat["seconds"] > 0 else 0.0
+		return results
+
+	def get_stats(self):
+		"""直近のexplain_allの処理統計を返す
+
+			Returns:
+				stats (Dict): ワーカー（プロセスID）ごとの処理した和音列数・和音数・処理時間[秒]・処理速度
+
+		"""
+		return self.stats
+
+	def close(self):
+		"""ワーカーのプロセスを終了する
+
+		"""
+		if self.executor is not None:
+			self.executor.shutdown()
+			self.executor = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+def compare_beam(chordsheet, width):
+	"""ビームサーチと厳密な探索（viterbi）で同じコードネーム列を分析し、結果を比較する
+
+		ビームサーチは和音間距離行列をキャッシュしないので、先にビームサーチ、次に厳密な探索の順で分析する。
+		（それ以前に同じコード進行の行列がキャッシュされていれば、どちらの処理時間も短くなる）
+
+		Args:
+			chordsheet (str): コードネーム列を表すテキスト
+			width (Int): ビームサーチで層ごとに残す解釈の数
+
+		Returns:
+			result (Dict): Trellis.beam_statsの内容に加えて、
+				それぞれの合計和音間距離（beam_cost, exact_cost）、その差（gap）と比（relative_gap）、
+				解釈が一致した和音の割合（agreement）、処理時間[秒]（beam_seconds, exact_seconds）
+
+	"""
+	results = {}
+	for name, beam in (("beam", width), ("exact", None)):
+		music = Music("viterbi", logpath=None, beam=beam, quiet=True)
+		start = time.perf_counter()
+		music.explain(chordsheet)
+		results[name] = (music, time.perf_counter() - start)
+	approx, beam_seconds = results["beam"]
+	exact, exact_seconds = results["exact"]
+
+	result = dict(approx.get_beam_stats())
+	result["beam_cost"] = approx.get_cost()
+	result["exact_cost"] = exact.get_cost()
+	result["gap"] = result["beam_cost"] - result["exact_cost"]
+	result["relative_gap"] = result["gap"] / result["exact_cost"] if result["exact_cost"] > 0 else 0.0
+	pairs = list(zip(approx.get_interpretation(), exact.get_interpretation()))
+	result["agreement"] = sum(1 for a, b in pairs if a == b) / len(pairs)
+	result["beam_seconds"] = beam_seconds
+	result["exact_seconds"] = exact_seconds
+	return result
+
+
+def compare_session(chordsheet, edits=100, engine="viterbi", seed=0):
+	"""MusicSessionでコードネーム列を編集しながら、編集のたびにMusic.explainで分析し直した結果と比較する（自己診断）
+
+		コードネーム列に含まれるコードで変更・挿入・削除を乱数で選んで行う。
+		合計和音間距離が一致し、セッションの解釈の和音間距離の和がその合計に等しければ、解釈が異なっても正しい（同じ合計の別の解釈）とみなす。
+
+		Args:
+			chordsheet (str): 最初のコードネーム列を表すテキスト
+			edits (Int): 編集の回数
+			engine (str): 比較に用いるMusic.explainの探索エンジン
+			seed (Int): 編集を選ぶ乱数の種
+
+		Returns:
+			result (Dict): 編集の回数（edits）、合計和音間距離が一致しなかった回数（cost_mismatches）、
+				解釈の和音間距離の和が合計と一致しなかった回数（route_mismatches）、
+				合計は一致して解釈だけが異なった回数（ties）、処理時間[秒]（session_seconds, explain_seconds）
+
+	"""
+	import random
+	rng = random.Random(seed)
+	vocabulary = sorted(set(chordsheet.split(',')))
+	session = MusicSession(chordsheet)
+	result = {"edits": edits, "cost_mismatches": 0, "route_mismatches": 0, "ties": 0, "session_seconds": 0.0, "explain_seconds": 0.0}
+	for _ in range(edits):
+		length = len(session.chordids)
+		operation = rng.random()
+		start = time.perf_counter()
+		#削除は和音が3つ以上ある時だけ行うので、和音が無くなることはない
+		if operation < 0.6 or length <= 2:
+			session.edit(rng.randrange(length), rng.choice(vocabulary))
+		elif operation < 0.8:
+			session.insert(rng.randrange(length + 1), rng.choice(vocabulary))
+		else:
+			session.delete(rng.randrange(length))
+		route = session.get_route()
+		result["session_seconds"] += time.perf_counter() - start
+
+		music = Music(engine, logpath=None, quiet=True)
+		start = time.perf_counter()
+		music.explain(session.get_chordsheet())
+		result["explain_seconds"] += time.perf_counter() - start
+		route_cost = sum(session.matrices[i][route[i]][route[i+1]][0] for i in range(len(route) - 1))
+		if session.get_cost() != music.get_cost():
+			result["cost_mismatches"] += 1
+		elif route_cost != session.get_cost() or len(route) != len(session.chordids):
+			result["route_mismatches"] += 1
+		elif session.get_interpretation() != music.get_interpretation():
+			result["ties"] += 1
+	return result
+
+
+def compare_modes(chordsheet, engine="astar", store=None, tensor=None, workers=2, session_edits=20):
+	"""和音間距離の求め方を変えて同じコードネーム列を分析し、1プロセスで順に求めたMusic.explainの結果と比較する（自己診断）
+
+		各モードの分析の前に和音間距離行列とピヴォット候補のキャッシュを消去するので、それぞれの経路で和音間距離を求めて比較する。
+
+		* workers: 和音間距離行列をworkers個のプロセスで並列に算出する
+		* store: 保存先に書き込む分析（cold）と、保存先から読み込む分析（warm）
+		* tensor: 語彙の和音間距離の表を使う分析
+		* session: MusicSessionで読み込んだ結果と、compare_sessionでsession_edits回編集した結果
+
+		Args:
+			chordsheet (str): コードネーム列を表すテキスト
+			engine (str): 最短路探索エンジン（Music.ENGINESのいずれか）
+			store (str): 和音間距離の保存先のパス（Noneなら一時ファイルを使う）
+			tensor (str): 語彙の和音間距離の表のパス（Noneならコードネーム列の語彙から一時ファイルに作る）
+			workers (Int): workersのモードで使うプロセス数
+			session_edits (Int): sessionのモードで編集する回数
+
+		Returns:
+			result (Dict): モード名 -> {"cost": 合計和音間距離, "match": 基準と一致したか否か, "seconds": 処理時間[秒]}。
+				"reference"は基準（1プロセスで順に求めたMusic.explain）。sessionには編集の比較結果（"edits"）も加える
+
+	"""
+	import tempfile
+	from Delta_chord_calculator import Delta_Chord_calculator
+	from Chord_calculator import ChordCalculator
+	from Distance_store import DistanceStore
+	from Distance_tensor import DistanceTensor
+
+	def explain(**options):
+		Delta_Chord_calculator.clear_matrix_cache()
+		ChordCalculator.clear_pivot_cache()
+		music = Music(engine, logpath=None, quiet=True, **options)
+		start = time.perf_counter()
+		music.explain(chordsheet)
+		return (music.get_interpretation(), music.get_cost(), time.perf_counter() - start)
+
+	reference = explain()
+	result = {"reference": {"cost": reference[1], "match": True, "seconds": reference[2]}}
+
+	def record(mode, output):
+		interpretation, cost, seconds = output
+		result[mode] = {"cost": cost, "match": interpretation == reference[0] and cost == reference[1], "seconds": seconds}
+
+	record("workers", explain(workers=workers))
+	with tempfile.TemporaryDirectory() as directory:
+		with DistanceStore(store if store is not None else os.path.join(directory, "distances.db")) as distance_store:
+			record("store.cold", explain(store=distance_store))
+			record("store.warm", explain(store=distance_store))
+		if tensor is None:
+			tensor = os.path.join(directory, "distances.tensor")
+			DistanceTensor.build(tensor, chordsheet.split(','))
+		with DistanceTensor(tensor) as distance_tensor:
+			record("tensor", explain(tensor=distance_tensor))
+
+	start = time.perf_counter()
+	session = MusicSession(chordsheet)
+	route = session.get_route()
+	seconds = time.perf_counter() - start
+	route_cost = sum(session.matrices[i][route[i]][route[i+1]][0] for i in range(len(route) - 1))
+	edits = compare_session(chordsheet, session_edits, engine)
+	match = session.get_cost() == reference[1] and route_cost == reference[1] and edits["cost_mismatches"] == 0 and edits["route_mismatches"] == 0
+	result["session"] = {"cost": session.get_cost(), "match": match, "seconds": seconds, "edits": edits}
+	return result
+
+
+def measure_import_time(module="Music"):
+	"""新しいPythonプロセスでモジュールのimportにかかる時間を計測する
+
+		"python -X importtime"の出力から、指定したモジュール以下の読み込みにかかった時間を取り出す。
+
+		Args:
+			module (str): 計測するモジュール名
+
+		Returns:
+			seconds (Float): importにかかった時間[秒]
+
+	"""
+	import subprocess
+	result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+	for line in result.stderr.splitlines():
+		fields = line.split("|")
+		if len(fields) == 3 and fields[2].strip() == module:
+			return int(fields[1]) / 1e6
+	raise RuntimeError("Import time of " + module + " was not reported")
+
+
+def main(argv=None):
+	"""コマンドラインからコードネーム列を分析する
+
+		コードネーム列を省略した場合はDEMO_CHORDSHEETを分析する。
+
+		Args:
+			argv (List): コマンドライン引数（Noneならsys.argv[1:]）
+
+		Returns:
+			status (Int): 終了コード（分析又は計測に失敗した場合は1）
+
+	"""
+	import argparse
+	parser = argparse.ArgumentParser(description="TPSによる和声進行の解釈")
+	parser.add_argument("chordsheet", nargs="?", default=DEMO_CHORDSHEET, help="カンマ区切りのコードネーム列（省略時は\"Fly me to the moon\"冒頭部分）")
+	parser.add_argument("--engine", choices=Music.ENGINES, default="astar", help="最短路探索エンジン")
+	parser.add_argument("--lazy", action="store_true", help="枝のコストを探索中に必要になった時に求める（astarのみ）")
+	parser.add_argument("--log", default="Test_log.txt", help="分析過程を追記するログファイルのパス")
+	parser.add_argument("--loglevel", choices=AnalysisLog.LEVELS, default="summary", help="ログの詳細度")
+	parser.add_argument("--profile", action="store_true", help="和音間距離の算出処理の内訳を計測して表示する")
+	parser.add_argument("--beam", type=int, default=None, metavar="K", help="層ごとにK個の解釈だけを残すビームサーチで探索する（viterbiのみ）")
+	parser.add_argument("--compare-exact", action="store_true", help="--beamの結果を厳密な探索と比較して表示する")
+	parser.add_argument("--store", default=None, metavar="PATH", help="和音間距離を保存して実行をまたいで再利用するSQLiteファイルのパス")
+	parser.add_argument("--tensor", default=None, metavar="PATH", help="語彙の和音間距離の表のファイルのパス（Distance_tensor.pyで作成）")
+	parser.add_argument("--workers", type=int, default=None, metavar="N", help="和音間距離行列をN個のプロセスで並列に算出する")
+	parser.add_argument("--kbest", type=int, default=None, metavar="K", help="合計和音間距離の小さい順にK通りの解釈を表示する")
+	parser.add_argument("--compare-session", type=int, default=None, metavar="EDITS", help="MusicSessionでEDITS回編集し、編集のたびにexplainの結果と比較して表示する")
+	parser.add_argument("--verify", action="store_true", help="並列算出・保存先・語彙の表・MusicSessionの結果を、1プロセスで順に求めた結果と比較して表示する")
+	parser.add_argument("--import-time", action="store_true", help="import Musicにかかる時間を計測してIMPORT_TIME_BUDGETと比較する")
+	args = parser.parse_args(argv)
+
+	if args.import_time:
+		seconds = measure_import_time()
+		print(f"import Music: {seconds * 1000:.1f} ms (budget {IMPORT_TIME_BUDGET * 1000:.1f} ms)")
+		return 0 if seconds <= IMPORT_TIME_BUDGET else 1
+
+	if args.beam is not None and args.engine != "viterbi":
+		parser.error("--beam requires --engine viterbi")
+	if args.compare_exact and args.beam is None:
+		parser.error("--compare-exact requires --beam")
+	if args.kbest is not None and (args.lazy or args.beam is not None):
+		parser.error("--kbest cannot be combined with --lazy or --beam")
+	if args.workers is not None and (args.lazy or args.beam is not None):
+		parser.error("--workers cannot be combined with --lazy or --beam")
+	if args.verify and (args.lazy or args.beam is not None):
+		parser.error("--verify cannot be combined with --lazy or --beam")
+
+	music = Music(args.engine, args.lazy, args.log, args.loglevel, profile=args.profile, beam=args.beam, store=args.store, tensor=args.tensor, workers=args.workers)
+	music.explain(args.chordsheet)
+	if args.profile:
+		import json
+		print(json.dumps(music.get_delta_stats(), indent=1))
+	if args.beam is not None:
+		import json
+		stats = compare_beam(args.chordsheet, args.beam) if args.compare_exact else music.get_beam_stats()
+		print(json.dumps(stats, indent=1))
+	if args.kbest is not None:
+		for rank, (cost, interpretation, edges) in enumerate(music.get_kbest(args.kbest), 1):
+			print(f"#{rank} ({cost}): " + " -> ".join(f"{name}/{root}{is_minor}" for name, root, is_minor in interpretation))
+	if args.compare_session is not None:
+		import json
+		stats = compare_session(args.chordsheet, args.compare_session, args.engine)
+		print(json.dumps(stats, indent=1))
+		if stats["cost_mismatches"] > 0 or stats["route_mismatches"] > 0:
+			return 1
+	if args.verify:
+		import json
+		modes = compare_modes(args.chordsheet, args.engine, args.store, args.tensor, args.workers if args.workers is not None else 2)
+		print(json.dumps(modes, indent=1))
+		if not all(mode["match"] for mode in modes.values()):
+			return 1
+	return 0 if music.get_cost() is not None else 1
+
+
+if __name__ == "__main__":
+	sys.exit(main())
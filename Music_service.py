@@ -0,0 +1,675 @@
+"""Music_service.py
+
+	Music.explainを常駐するローカルのサービスとして提供するモジュール（asyncio）
+
+	* Author: Naohiko Yamaguchi
+	* Copyright (c) 2024 Naohiko Yamaguchi,IPUT in Tokyo, Japan.
+	* License: New BSD License
+
+	Note:
+		"python Music_service.py serve --socket /tmp/tps.sock"（又は"--port 8765"）でサービスを起動し、
+		"python Music_service.py load --socket /tmp/tps.sock"で負荷をかけてレイテンシを計測する
+		（"python Music_service.py load --local"なら同じプロセス内にサービスを起動して計測する）。
+		プロトコルは1行に1つのJSONで、1つの接続で複数の要求を続けて送れる。応答は完了した順に返るので、要求のidで対応付ける。
+
+		* 要求: {"id": 任意の値, "chordsheet": "A m 7,D m 7,G 7"}、{"id": 任意の値, "op": "stats"}
+		* 応答: {"id": 要求のid, "interpretation": 解釈, "cost": 合計和音間距離, "latency": レイテンシの内訳}、
+		  {"id": 要求のid, "stats": MusicService.get_stats()}、{"id": 要求のid, "error": エラーメッセージ}
+
+"""
+
+# 事前に必要な外部モジュールをインポートする
+import asyncio
+import contextlib
+import json
+import sys
+import time
+from Music import Music, DEMO_CHORDSHEET
+
+LINE_LIMIT = 1 << 20
+"""LINE_LIMIT
+
+	要求・応答の1行の長さの上限[バイト]
+
+"""
+
+def _explain_batch(task):
+	"""executorで1つのバッチのコードネーム列を順に分析する
+
+		和音間距離のキャッシュはクラス属性なので、executorのスレッドやプロセスが続く限り温まったまま使われる。
+
+		Args:
+			task (Tuple): （コードネーム列のリスト, 最短路探索エンジン, 和音間距離の保存先, 語彙の和音間距離の表）
+
+		Returns:
+			results (List): 入力と同じ順序の（解釈, 合計和音間距離, 処理時間[秒], エラーメッセージ又はNone）
+
+	"""
+	chordsheets, engine, store, tensor = task
+	results = []
+	#分析結果は画面に表示しない（標準出力を差し替えると、他のスレッドの出力まで捨ててしまう）
+	music = Music(engine, logpath=None, store=store, tensor=tensor, quiet=True)
+	for chordsheet in chordsheets:
+		start = time.perf_counter()
+		try:
+			music.explain(chordsheet)
+			results.append((music.get_interpretation(), music.get_cost(), time.perf_counter() - start, None))
+		except Exception as e:
+			results.append((None, None, time.perf_counter() - start, f"{type(e).__name__}: {e}"))
+	return results
+
+def _warm_worker(engine, store, tensor):
+	"""executorのスレッド又はプロセスで和音間距離の算出モジュールを読み込み、キャッシュを温める
+
+		Args:
+			engine (str): 最短路探索エンジン
+			store (str): 和音間距離の保存先のパス
+			tensor (str): 語彙の和音間距離の表のパス
+
+	"""
+	_explain_batch(([DEMO_CHORDSHEET], engine, store, tensor))
+
+def _percentiles(values):
+	"""レイテンシの分布を要約する
+
+		Args:
+			values (List): レイテンシ[秒]のリスト
+
+		Returns:
+			summary (Dict): "mean", "p50", "p95", "p99", "max"（valuesが空なら全てNone）
+
+	"""
+	if len(values) == 0:
+		return {"mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+	ordered = sorted(values)
+	def rank(q):
+		return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+	return {"mean": sum(ordered) / len(ordered), "p50": rank(0.5), "p95": rank(0.95), "p99": rank(0.99), "max": ordered[-1]}
+
+
+class MusicService:
+	"""MusicServiceクラス
+
+		Music.explainをUnixドメインソケット又はlocalhostのTCPで提供する、asyncioのサービス。
+
+		* 同時に届いた要求はbatch_delay秒（又はbatch_size個）までまとめて1つのバッチとし、executorで1度に分析する。
+		  バッチの中の同じコードネーム列は1度だけ分析する
+		* 分析はexecutor（既定はスレッド1つ）で行うので、分析中もイベントループは要求を受け付け続け、次のバッチに溜める
+		* 和音間距離のキャッシュはexecutorのスレッド（又はプロセス）に保たれ、起動時にはデモのコードネーム列で温めておく
+		* 応答には要求ごとのレイテンシの内訳（待ち時間・分析時間・合計・バッチの大きさ）を含める
+
+		既定のスレッド1つのexecutorでは、和音間距離のキャッシュはサービスのプロセスで1つだけ共有される。
+		processesを指定すると、バッチをプロセスプールの各ワーカーに分けて並列に分析する（キャッシュはワーカーごと）。
+
+		Args:
+			path (str): Unixドメインソケットのパス（Noneならhost:portで待ち受ける）
+			host (str): 待ち受けるホスト（pathを指定しない場合）
+			port (Int): 待ち受けるポート（0なら空いているポート）
+			engine (str): 最短路探索に用いるエンジン（Music.ENGINESのいずれか）
+			store (str): 和音間距離の保存先のパス（Noneなら保存しない）
+			tensor (str): 語彙の和音間距離の表のパス（Noneなら使わない）
+			batch_size (Int): 1つのバッチにまとめる要求の数の上限
+			batch_delay (float): 最初の要求が届いてから、同じバッチにまとめる要求を待つ時間[秒]
+			processes (Int): executorをプロセスプールにする場合のプロセス数（Noneならスレッド1つ）
+			warmup (Bool): 起動時にキャッシュを温めるか否か
+			max_queue (Int): 分析待ちの要求の数と、1つの接続で応答待ちの要求の数の上限
+				（超えると、空くまで次の要求を読まずに待たせる。0なら上限なし）
+
+		Attributes:
+			path (str): Unixドメインソケットのパス
+			host (str): 待ち受けるホスト
+			port (Int): 待ち受けているポート（startの後は実際のポート）
+			engine (str): 最短路探索に用いるエンジン
+			store (str): 和音間距離の保存先のパス
+			tensor (str): 語彙の和音間距離の表のパス
+			batch_size (Int): 1つのバッチにまとめる要求の数の上限
+			batch_delay (float): 同じバッチにまとめる要求を待つ時間[秒]
+			processes (Int): プロセスプールのプロセス数（Noneならスレッド1つ）
+			warmup (Bool): 起動時にキャッシュを温めるか否か
+			max_queue (Int): 分析待ちの要求の数の上限
+
+	"""
+
+	LATENCY_WINDOW = 10000
+	"""LATENCY_WINDOW
+
+		get_statsでレイテンシの分布を求める、直近の要求の数
+
+	"""
+
+	def __init__(self, path=None, host="127.0.0.1", port=8765, engine="astar", store=None, tensor=None, batch_size=32, batch_delay=0.002, processes=None, warmup=True, max_queue=1024):
+		if engine not in Music.ENGINES:
+			raise ValueError("Unknown engine: " + str(engine))
+		if batch_size < 1:
+			raise ValueError("batch_size must be 1 or more")
+		if batch_delay < 0:
+			raise ValueError("batch_delay must be 0 or more")
+		if processes is not None and processes < 1:
+			raise ValueError("processes must be 1 or more")
+		if max_queue < 0:
+			raise ValueError("max_queue must be 0 or more")
+		self.path = path
+		self.host = host
+		self.port = port
+		self.engine = engine
+		self.store = store
+		self.tensor = tensor
+		self.batch_size = batch_size
+		self.batch_delay = batch_delay
+		self.processes = processes
+		self.warmup = warmup
+		self.max_queue = max_queue
+		self._server = None
+		self._executor = None
+		self._queue = None
+		self._batcher = None
+		self._connections = {}	#接続を処理するタスク -> 要求を読み取るタスク
+		self._reset_stats()
+
+	def _reset_stats(self):
+		"""集計を0に戻す
+
+		"""
+		self._requests = 0
+		self._errors = 0
+		self._batches = 0
+		self._batched_requests = 0
+		self._max_batch = 0
+		self._shared = 0
+		self._queue_latency = []
+		self._compute_latency = []
+		self._total_latency = []
+
+	async def start(self):
+		"""executorを用意してキャッシュを温め、要求の受け付けを始める
+
+		"""
+		loop = asyncio.get_running_loop()
+		if self.processes is None:
+			from concurrent.futures import ThreadPoolExecutor
+			self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="MusicService")
+			if self.warmup:
+				await loop.run_in_executor(self._executor, _warm_worker, self.engine, self.store, self.tensor)
+		else:
+			from concurrent.futures import ProcessPoolExecutor
+			initializer = _warm_worker if self.warmup else None
+			self._executor = ProcessPoolExecutor(max_workers=self.processes, initializer=initializer, initargs=(self.engine, self.store, self.tensor))
+
+		self._queue = asyncio.Queue(maxsize=self.max_queue)
+		self._batcher = asyncio.create_task(self._run_batcher())
+		if self.path is not None:
+			self._server = await asyncio.start_unix_server(self._handle, path=self.path, limit=LINE_LIMIT)
+		else:
+			self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=LINE_LIMIT)
+			self.port = self._server.sockets[0].getsockname()[1]
+
+	async def serve_forever(self):
+		"""closeされるまで要求を受け付け続ける
+
+		"""
+		if self._server is None:
+			await self.start()
+		await self._server.serve_forever()
+
+	async def close(self):
+		"""要求の受け付けを止め、executorを終了する
+
+			新しい接続と要求の読み取りを止め、受け付け済みの要求にすべて応答してから接続を閉じて終了する。
+
+		"""
+		if self._server is not None:
+			self._server.close()
+		#各接続の読み取りを止めると、接続は受け付け済みの要求に応答してから閉じられる
+		for receiving in self._connections.values():
+			receiving.cancel()
+		if len(self._connections) > 0:
+			await asyncio.gather(*self._connections, return_exceptions=True)
+		if self._server is not None:
+			await self._server.wait_closed()
+			self._server = None
+		if self._batcher is not None:
+			await self._queue.join()
+			self._batcher.cancel()
+			with contextlib.suppress(asyncio.CancelledError):
+				await self._batcher
+			self._batcher = None
+		if self._executor is not None:
+			self._executor.shutdown()
+			self._executor = None
+
+	async def __aenter__(self):
+		await self.start()
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, traceback):
+		await self.close()
+
+	async def explain(self, chordsheet):
+		"""コードネーム列を分析する（同じプロセスから呼び出す場合の入口）
+
+			要求をバッチのキューに積み（キューが一杯なら空くまで待つ）、分析が終わるまで待つ。
+
+			Args:
+				chordsheet (str): コードネーム列を表すテキスト
+
+			Returns:
+				response (Dict): "interpretation", "cost", "latency"（失敗した場合は"error"）
+
+		"""
+		if self._queue is None:
+			raise RuntimeError("MusicService is not started")
+		future = asyncio.get_running_loop().create_future()
+		self._requests += 1
+		await self._queue.put((chordsheet, future, time.perf_counter()))
+		return await future
+
+	def get_stats(self):
+		"""要求とバッチの集計を返す
+
+			Returns:
+				stats (Dict): 要求数・エラー数・バッチ数・平均/最大のバッチの大きさ・バッチ内で分析を共有した要求数と、
+					直近LATENCY_WINDOW個の要求のレイテンシの分布（"queue_seconds", "compute_seconds", "total_seconds"）
+
+		"""
+		return {
+			"requests": self._requests,
+			"errors": self._errors,
+			"batches": self._batches,
+			"mean_batch_size": self._batched_requests / self._batches if self._batches > 0 else 0.0,
+			"max_batch_size": self._max_batch,
+			"shared": self._shared,
+			"queue_seconds": _percentiles(self._queue_latency),
+			"compute_seconds": _percentiles(self._compute_latency),
+			"total_seconds": _percentiles(self._total_latency),
+		}
+
+	async def _run_batcher(self):
+		"""キューから要求をまとめて取り出し、バッチごとに分析する
+
+			1つのバッチの分析中に届いた要求は、次のバッチにまとめられる。
+
+		"""
+		loop = asyncio.get_running_loop()
+		while True:
+			items = [await self._queue.get()]
+			deadline = loop.time() + self.batch_delay
+			while len(items) < self.batch_size:
+				timeout = deadline - loop.time()
+				try:
+					if timeout <= 0:
+						items.append(self._queue.get_nowait())
+					else:
+						items.append(await asyncio.wait_for(self._queue.get(), timeout))
+				except (asyncio.QueueEmpty, asyncio.TimeoutError):
+					break
+			try:
+				await self._run_batch(items)
+			except Exception as e:
+				for _, future, _ in items:
+					if not future.done():
+						future.set_exception(e)
+			finally:
+				for _ in items:
+					self._queue.task_done()
+
+	async def _run_batch(self, items):
+		"""1つのバッチをexecutorで分析し、要求ごとの応答を返す
+
+			Args:
+				items (List): （コードネーム列, 応答を返すFuture, 要求が届いた時刻）のリスト
+
+		"""
+		loop = asyncio.get_running_loop()
+		dispatched = time.perf_counter()
+		unique = list(dict.fromkeys(chordsheet for chordsheet, _, _ in items))
+		if self.processes is None:
+			chunks = [unique]
+		else:
+			#プロセスプールでは同じ数ずつに分けて、各ワーカーで並列に分析する
+			size = -(-len(unique) // self.processes)
+			chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+		outputs = await asyncio.gather(*[loop.run_in_executor(self._executor, _explain_batch, (chunk, self.engine, self.store, self.tensor)) for chunk in chunks])
+		results = {chordsheet: result for chunk, output in zip(chunks, outputs) for chordsheet, result in zip(chunk, output)}
+
+		self._batches += 1
+		self._batched_requests += len(items)
+		self._max_batch = max(self._max_batch, len(items))
+		self._shared += len(items) - len(unique)
+		done = time.perf_counter()
+		for chordsheet, future, arrived in items:
+			interpretation, cost, seconds, error = results[chordsheet]
+			latency = {"queue_seconds": dispatched - arrived, "compute_seconds": seconds, "total_seconds": done - arrived, "batch_size": len(items)}
+			for window, value in ((self._queue_latency, latency["queue_seconds"]), (self._compute_latency, seconds), (self._total_latency, latency["total_seconds"])):
+				window.append(value)
+				if len(window) > self.LATENCY_WINDOW:
+					del window[:len(window) - self.LATENCY_WINDOW]
+			if error is not None:
+				self._errors += 1
+				response = {"error": error, "latency": latency}
+			else:
+				response = {"interpretation": interpretation, "cost": cost, "latency": latency}
+			if not future.done():
+				future.set_result(response)
+
+	async def _handle(self, reader, writer):
+		"""1つの接続の要求を読み取り、完了した順に応答を書き込む
+
+			応答待ちの要求がmax_queueに達したら、どれかに応答するまで次の要求を読まない
+			（読まれなかった要求はソケットのバッファに溜まり、クライアントの送信を待たせる）。
+
+		"""
+		lock = asyncio.Lock()
+		tasks = set()
+		slots = asyncio.Semaphore(self.max_queue) if self.max_queue > 0 else None
+
+		async def respond(request):
+			try:
+				if not isinstance(request, dict):
+					response = {"error": "Request must be a JSON object"}
+				elif request.get("op", "explain") == "stats":
+					response = {"stats": self.get_stats()}
+				elif request.get("op", "explain") != "explain" or not isinstance(request.get("chordsheet"), str):
+					response = {"error": "Unknown request"}
+				else:
+					try:
+						response = await self.explain(request["chordsheet"])
+					except Exception as e:
+						response = {"error": f"{type(e).__name__}: {e}"}
+				if isinstance(request, dict) and "id" in request:
+					response["id"] = request["id"]
+				async with lock:
+					writer.write((json.dumps(response) + "\n").encode("utf-8"))
+					await writer.drain()
+			finally:
+				if slots is not None:
+					slots.release()
+
+		async def receive():
+			try:
+				while True:
+					if slots is not None:
+						await slots.acquire()
+					line = await reader.readline()
+					if not line:
+						break
+					try:
+						request = json.loads(line)
+					except ValueError:
+						request = None
+					task = asyncio.create_task(respond(request))
+					tasks.add(task)
+					task.add_done_callback(tasks.discard)
+			except (ConnectionError, ValueError):
+				pass
+
+		receiving = asyncio.create_task(receive())
+		self._connections[asyncio.current_task()] = receiving
+		try:
+			await asyncio.wait([receiving])
+			#接続が閉じられても（closeで読み取りを止めても）、受け付け済みの要求には応答してから閉じる
+			if len(tasks) > 0:
+				await asyncio.gather(*tasks, return_exceptions=True)
+		finally:
+			receiving.cancel()
+			self._connections.pop(asyncio.current_task(), None)
+			writer.close()
+			with contextlib.suppress(ConnectionError):
+				await writer.wait_closed()
+
+
+class MusicServiceClient:
+	"""MusicServiceClientクラス
+
+		MusicServiceに接続して要求を送る、asyncioのクライアント。
+		1つの接続で複数の要求を同時に送ることができ、応答はidで要求に対応付ける。
+
+		Args:
+			path (str): Unixドメインソケットのパス（Noneならhost:portに接続する）
+			host (str): 接続するホスト
+			port (Int): 接続するポート
+
+		Attributes:
+			path (str): Unixドメインソケットのパス
+			host (str): 接続するホスト
+			port (Int): 接続するポート
+
+	"""
+
+	def __init__(self, path=None, host="127.0.0.1", port=8765):
+		self.path = path
+		self.host = host
+		self.port = port
+		self._reader = None
+		self._writer = None
+		self._receiver = None
+		self._pending = {}	#要求のid -> 応答を返すFuture
+		self._next_id = 0
+		self._lock = None
+
+	async def connect(self):
+		"""サービスに接続する
+
+		"""
+		if self.path is not None:
+			self._reader, self._writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+		else:
+			self._reader, self._writer = await asyncio.open_connection(self.host, self.port, limit=LINE_LIMIT)
+		self._lock = asyncio.Lock()
+		self._receiver = asyncio.create_task(self._receive())
+
+	async def close(self):
+		"""接続を閉じる
+
+		"""
+		if self._writer is not None:
+			self._writer.close()
+			with contextlib.suppress(ConnectionError):
+				await self._writer.wait_closed()
+			self._writer = None
+		if self._receiver is not None:
+			with contextlib.suppress(asyncio.CancelledError):
+				await self._receiver
+			self._receiver = None
+
+	async def __aenter__(self):
+		await self.connect()
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, traceback):
+		await self.close()
+
+	async def explain(self, chordsheet):
+		"""コードネーム列の分析を要求する
+
+			Args:
+				chordsheet (str): コードネーム列を表すテキスト
+
+			Returns:
+				response (Dict): サービスの応答（"interpretation", "cost", "latency"又は"error"）。
+					"latency"にはクライアントから見た往復時間（"client_seconds"）を加える
+
+		"""
+		start = time.perf_counter()
+		response = await self._request({"chordsheet": chordsheet})
+		if "latency" in response:
+			response["latency"]["client_seconds"] = time.perf_counter() - start
+		return response
+
+	async def stats(self):
+		"""サービスの集計を要求する
+
+			Returns:
+				stats (Dict): MusicService.get_statsの結果
+
+		"""
+		return (await self._request({"op": "stats"}))["stats"]
+
+	async def _request(self, request):
+		"""要求を送って応答を待つ
+
+		"""
+		if self._writer is None:
+			raise RuntimeError("MusicServiceClient is not connected")
+		self._next_id += 1
+		request["id"] = self._next_id
+		future = asyncio.get_running_loop().create_future()
+		self._pending[request["id"]] = future
+		async with self._lock:
+			self._writer.write((json.dumps(request) + "\n").encode("utf-8"))
+			await self._writer.drain()
+		return await future
+
+	async def _receive(self):
+		"""応答を読み取り、idが一致する要求に返す
+
+			接続が切れたら、応答を待っている全ての要求にConnectionErrorを送出する。
+
+		"""
+		try:
+			while True:
+				line = await self._reader.readline()
+				if not line:
+					break
+				response = json.loads(line)
+				future = self._pending.pop(response.pop("id", None), None)
+				if future is not None and not future.done():
+					future.set_result(response)
+		except (ConnectionError, ValueError):
+			pass
+		finally:
+			for future in self._pending.values():
+				if not future.done():
+					future.set_exception(ConnectionError("Connection to MusicService was closed"))
+			self._pending.clear()
+
+
+async def generate_load(client, chordsheets, requests=200, concurrency=16):
+	"""クライアントから並行して要求を送り、スループットとレイテンシを計測する（負荷生成器）
+
+		concurrency個の要求を常に送信中に保ち、chordsheetsを順に繰り返してrequests個の要求を送る。
+
+		Args:
+			client (MusicServiceClient): 接続済みのクライアント
+			chordsheets (List): 要求に使うコードネーム列のリスト
+			requests (Int): 送る要求の総数
+			concurrency (Int): 同時に送信中にしておく要求の数
+
+		Returns:
+			report (Dict): 要求数・エラー数・経過時間[秒]・1秒あたりの要求数と、
+				クライアントから見たレイテンシ（"client_seconds"）とサービスの内訳（"queue_seconds", "compute_seconds", "total_seconds"）の分布、
+				平均のバッチの大きさ
+
+	"""
+	if len(chordsheets) == 0:
+		raise ValueError("chordsheets must not be empty")
+	latencies = {"client_seconds": [], "queue_seconds": [], "compute_seconds": [], "total_seconds": []}
+	batch_sizes = []
+	errors = 0
+	counter = iter(range(requests))
+
+	async def worker():
+		nonlocal errors
+		for i in counter:
+			response = await client.explain(chordsheets[i % len(chordsheets)])
+			if "error" in response:
+				errors += 1
+			latency = response.get("latency")
+			if latency is not None:
+				for name, values in latencies.items():
+					values.append(latency[name])
+				batch_sizes.append(latency["batch_size"])
+
+	start = time.perf_counter()
+	await asyncio.gather(*[worker() for _ in range(concurrency)])
+	elapsed = time.perf_counter() - start
+	report = {"requests": requests, "errors": errors, "seconds": elapsed, "requests_per_sec": requests / elapsed if elapsed > 0 else 0.0}
+	for name, values in latencies.items():
+		report[name] = _percentiles(values)
+	report["mean_batch_size"] = sum(batch_sizes) / len(batch_sizes) if len(batch_sizes) > 0 else 0.0
+	return report
+
+
+async def _serve(args):
+	"""コマンドラインの"serve"を実行する
+
+	"""
+	service = MusicService(args.socket, args.host, args.port, args.engine, args.store, args.tensor, args.batch_size, args.batch_delay, args.processes, not args.no_warmup, args.max_queue)
+	await service.start()
+	print(f"MusicService listening on {service.path if service.path is not None else f'{service.host}:{service.port}'}", flush=True)
+	try:
+		await service.serve_forever()
+	finally:
+		await service.close()
+
+async def _load(args):
+	"""コマンドラインの"load"を実行する
+
+	"""
+	if args.sheets is not None:
+		with open(args.sheets, encoding="utf-8") as f:
+			chordsheets = [line.strip() for line in f if line.strip() != ""]
+	else:
+		#デモのコードネーム列と、その途中から始まる列（長さの異なる要求）
+		chordnames = DEMO_CHORDSHEET.split(",")
+		chordsheets = [",".join(chordnames[i:]) for i in range(0, len(chordnames) - 1, 4)]
+
+	service = None
+	if args.local:
+		#同じプロセス内に空いているポートでサービスを起動する
+		service = MusicService(None, "127.0.0.1", 0, args.engine, args.store, args.tensor, args.batch_size, args.batch_delay, args.processes, not args.no_warmup, args.max_queue)
+		await service.start()
+		client = MusicServiceClient(None, service.host, service.port)
+	else:
+		client = MusicServiceClient(args.socket, args.host, args.port)
+	try:
+		async with client:
+			report = await generate_load(client, chordsheets, args.requests, args.concurrency)
+			report["service"] = await client.stats()
+	finally:
+		if service is not None:
+			await service.close()
+	print(json.dumps(report, indent=1))
+	return report
+
+def main(argv=None):
+	"""コマンドラインからサービスの起動又は負荷の生成を行う
+
+		Args:
+			argv (List): コマンドライン引数（Noneならsys.argv[1:]）
+
+		Returns:
+			status (Int): 終了コード（負荷の生成でエラーの応答があった場合は1）
+
+	"""
+	import argparse
+	parser = argparse.ArgumentParser(description="TPSによる和声進行の解釈をローカルのサービスとして提供する")
+	parser.add_argument("command", choices=["serve", "load"], help="serve: サービスを起動する, load: サービスに負荷をかけてレイテンシを計測する")
+	parser.add_argument("--socket", default=None, metavar="PATH", help="Unixドメインソケットのパス（省略時はhost:port）")
+	parser.add_argument("--host", default="127.0.0.1", help="待ち受ける（接続する）ホスト")
+	parser.add_argument("--port", type=int, default=8765, help="待ち受ける（接続する）ポート")
+	parser.add_argument("--engine", choices=Music.ENGINES, default="astar", help="最短路探索エンジン")
+	parser.add_argument("--store", default=None, metavar="PATH", help="和音間距離の保存先のSQLiteファイルのパス")
+	parser.add_argument("--tensor", default=None, metavar="PATH", help="語彙の和音間距離の表のファイルのパス")
+	parser.add_argument("--batch-size", type=int, default=32, help="1つのバッチにまとめる要求の数の上限")
+	parser.add_argument("--batch-delay", type=float, default=0.002, help="同じバッチにまとめる要求を待つ時間[秒]")
+	parser.add_argument("--processes", type=int, default=None, help="分析に使うプロセス数（省略時はスレッド1つ）")
+	parser.add_argument("--max-queue", type=int, default=1024, help="分析待ちの要求の数の上限（0なら上限なし）")
+	parser.add_argument("--no-warmup", action="store_true", help="起動時にキャッシュを温めない")
+	parser.add_argument("--local", action="store_true", help="loadで、同じプロセス内に起動したサービスに負荷をかける")
+	parser.add_argument("--requests", type=int, default=200, help="loadで送る要求の総数")
+	parser.add_argument("--concurrency", type=int, default=16, help="loadで同時に送信中にしておく要求の数")
+	parser.add_argument("--sheets", default=None, metavar="PATH", help="loadで使うコードネーム列のファイル（1行に1つ。省略時はデモ）")
+	args = parser.parse_args(argv)
+	if args.local and args.command != "load":
+		parser.error("--local requires load")
+
+	if args.command == "serve":
+		with contextlib.suppress(KeyboardInterrupt):
+			asyncio.run(_serve(args))
+		return 0
+	report = asyncio.run(_load(args))
+	return 0 if report["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+	sys.exit(main())
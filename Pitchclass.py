@@ -8,6 +8,32 @@
 
 """
 
+PITCHCLASS_NAMES = ("C", "C#/Db", "D", "D#/Eb", "E", "F", "F#/Gb", "G", "G#/Ab", "A", "A#/Bb", "B")
+"""PITCHCLASS_NAMES
+
+	ピッチクラス番号（0～11）順の英語音名
+
+"""
+
+PITCHCLASS_NAMES_SHORT = ("C", "Db", "D", "Eb", "E", "F", "Gb", "G", "Ab", "A", "Bb", "B")
+"""PITCHCLASS_NAMES_SHORT
+
+	ピッチクラス番号（0～11）順の短縮版の英語音名
+
+"""
+
+PITCHCLASS_VALUES = {
+	"C": 0, "C#": 1, "DB": 1, "D": 2, "D#": 3, "EB": 3,
+	"E": 4, "F": 5, "F#": 6, "GB": 6, "G": 7, "G#": 8, "AB": 8,
+	"A": 9, "A#": 10, "BB": 10, "B": 11
+}
+"""PITCHCLASS_VALUES
+
+	英語音名（大文字）からピッチクラス番号を引く辞書。
+	ピッチクラスの計算だけが必要な処理は、Pitchclassを生成せずにこの表と整数の剰余演算を使う。
+
+"""
+
 
 class Pitchclass:
 	"""Pitchclass:クラス
@@ -17,6 +43,9 @@ class Pitchclass:
 		Attributes:
 			value (modint): 値 数字又は音名で指定
 	"""
+
+	__slots__ = ("value",)
+
 	def __init__(self, val):
 		# 初期化
 		self.value = None
@@ -47,8 +76,7 @@ class Pitchclass:
 			Returns:
 				name (Str): 英語音名
 		"""
-		names = ["C", "C#/Db", "D", "D#/Eb", "E", "F", "F#/Gb", "G", "G#/Ab", "A", "A#/Bb", "B"]
-		return names[self.value] if self.value in range(12) else None
+		return PITCHCLASS_NAMES[self.value] if self.value in range(12) else None
 
 	def get_name_short(self):
 		"""value（ピッチクラス番号）から生成した短縮版の英語音名を返す
@@ -62,8 +90,7 @@ class Pitchclass:
 				name (Str): 英語音名
 		"""
 		# 英語音名を返す（短縮版）
-		names_short = ["C", "Db", "D", "Eb", "E", "F", "Gb", "G", "Ab", "A", "Bb", "B"]
-		return names_short[self.value] if self.value in range(12) else None
+		return PITCHCLASS_NAMES_SHORT[self.value] if self.value in range(12) else None
 
 	def set(self, val):
 		"""value（ピッチクラス番号）のセッタ（アクセサ）
@@ -79,13 +106,8 @@ class Pitchclass:
 				raise ValueError("Integer value must be between 0 and 11.")
 		elif isinstance(val, str):
 			val = val.upper()
-			names_to_values = {
-				"C": 0, "C#": 1, "DB": 1, "D": 2, "D#": 3, "EB": 3,
-				"E": 4, "F": 5, "F#": 6, "GB": 6, "G": 7, "G#": 8, "AB": 8,
-				"A": 9, "A#": 10, "BB": 10, "B": 11
-			}
-			if val in names_to_values:
-				self.value = names_to_values[val]
+			if val in PITCHCLASS_VALUES:
+				self.value = PITCHCLASS_VALUES[val]
 			else:
 				raise ValueError("Invalid string value for pitch class.")
 		else:
@@ -8,10 +8,38 @@
 
 """
 # 事前に必要な外部モジュールをインポートする
-from Chord import Chord
+from Chord import Chord, KEY_LIST, KEY_INDEX
 from Basicspace import Basicspace
 from Pitchclass import Pitchclass
-from Modint import Modint
+from Basicspace_kernel import load_numpy
+
+REGION_TABLE = (
+	(0, 5, 2, 3, 4, 1, 6, 1, 4, 3, 2, 5),
+	(5, 0, 5, 2, 3, 4, 1, 6, 1, 4, 3, 2),
+	(2, 5, 0, 5, 2, 3, 4, 1, 6, 1, 4, 3),
+	(3, 2, 5, 0, 5, 2, 3, 4, 1, 6, 1, 4),
+	(4, 3, 2, 5, 0, 5, 2, 3, 4, 1, 6, 1),
+	(1, 4, 3, 2, 5, 0, 5, 2, 3, 4, 1, 6),
+	(6, 1, 4, 3, 2, 5, 0, 5, 2, 3, 4, 1),
+	(1, 6, 1, 4, 3, 2, 5, 0, 5, 2, 3, 4),
+	(4, 1, 6, 1, 4, 3, 2, 5, 0, 5, 2, 3),
+	(3, 4, 1, 6, 1, 4, 3, 2, 5, 0, 5, 2),
+	(2, 3, 4, 1, 6, 1, 4, 3, 2, 5, 0, 5),
+	(5, 2, 3, 4, 1, 6, 1, 4, 3, 2, 5, 0)
+)
+"""REGION_TABLE
+
+	長調同士の調間距離（調のルートのピッチクラス×調のルートのピッチクラス）
+
+"""
+
+REGION_MATRIX = tuple(tuple(REGION_TABLE[(root_a + (3 if minor_a else 0)) % 12][(root_b + (3 if minor_b else 0)) % 12] for root_b, minor_b in KEY_LIST) for root_a, minor_a in KEY_LIST)
+"""REGION_MATRIX
+
+	24調×24調の調間距離（KEY_LISTの順）。短調は平行長調（+3半音）に読み替えてREGION_TABLEを引いたもの。
+	調間距離はコードによらないので、和音間距離行列の調間距離の成分はこの表そのものになる。
+
+"""
 
 class RegionCalculator:
 	"""ChordCalculatorクラス
@@ -25,6 +53,10 @@ class RegionCalculator:
 
 	"""
 
+	__slots__ = ("chord_a", "chord_b", "delta")
+
+	_region_array = None	#REGION_MATRIXのNumPy配列（全インスタンスで共有）
+
 	def __init__(self):
 		self.chord_a = None
 		self.chord_b = None
@@ -46,36 +78,30 @@ class RegionCalculator:
 
 		self.chord_a = chord_a
 		self.chord_b = chord_b
-		
-		
-		key_chord_a = Modint(chord_a.get_root(), 12)
-		key_chord_b = Modint(chord_b.get_root(), 12)
-
-		if chord_a.get_minorflag():
-			key_chord_a.add(3)
-
-		if chord_b.get_minorflag():
-			key_chord_b.add(3)
-
-		region_table = [
-			[0, 5, 2, 3, 4, 1, 6, 1, 4, 3, 2, 5],
-			[5, 0, 5, 2, 3, 4, 1, 6, 1, 4, 3, 2],
-			[2, 5, 0, 5, 2, 3, 4, 1, 6, 1, 4, 3],
-			[3, 2, 5, 0, 5, 2, 3, 4, 1, 6, 1, 4],
-			[4, 3, 2, 5, 0, 5, 2, 3, 4, 1, 6, 1],
-			[1, 4, 3, 2, 5, 0, 5, 2, 3, 4, 1, 6],
-			[6, 1, 4, 3, 2, 5, 0, 5, 2, 3, 4, 1],
-			[1, 6, 1, 4, 3, 2, 5, 0, 5, 2, 3, 4],
-			[4, 1, 6, 1, 4, 3, 2, 5, 0, 5, 2, 3],
-			[3, 4, 1, 6, 1, 4, 3, 2, 5, 0, 5, 2],
-			[2, 3, 4, 1, 6, 1, 4, 3, 2, 5, 0, 5],
-			[5, 2, 3, 4, 1, 6, 1, 4, 3, 2, 5, 0]
-		]
-
-		self.delta = region_table[key_chord_a.get()][key_chord_b.get()]
+
+		#短調は平行長調（+3半音）に読み替えた表をあらかじめ作ってあるので、調の組から1度引くだけ
+		self.delta = REGION_MATRIX[KEY_INDEX[(chord_a.get_root(), chord_a.get_minorflag())]][KEY_INDEX[(chord_b.get_root(), chord_b.get_minorflag())]]
 
 		return self.delta
 
+	@classmethod
+	def get_region_matrix(cls):
+		"""24調×24調の調間距離を配列として返す
+
+			NumPyがインストールされていれば(24, 24)の読み取り専用のNumPy配列、されていなければREGION_MATRIXを返す
+
+			Returns:
+				matrix (ndarray or Tuple): matrix[j][k]はKEY_LIST[j]からKEY_LIST[k]への調間距離
+
+		"""
+		if cls._region_array is None:
+			np = load_numpy()
+			if np is None:
+				return REGION_MATRIX
+			cls._region_array = np.array(REGION_MATRIX, dtype=np.int64)
+			cls._region_array.setflags(write=False)
+		return cls._region_array
+
 	def get_last_delta(self):
 		"""調間距離のゲッタ（アクセサ）
 
@@ -93,6 +119,6 @@ class RegionCalculator:
 			文字列表示する
 
 		"""
-		return f"Region({self.chord_a.get_key_name()} , {self.chord_b.get_key_name()}) = {self.delta}"
+		return f"Region({self.chord_a.get_keyname()} , {self.chord_b.get_keyname()}) = {self.delta}"
 
 